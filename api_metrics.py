@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+API Metrics - What each run spends on the RingCentral API
+Every call made through BudgetedPlatform is counted by endpoint group and
+HTTP status, with its latency and payload size, and every second spent
+waiting for rate-limit budget or backing off is added up. At the end of
+a run the totals are written as:
+- a Prometheus textfile-collector file (exports/metrics/ringcentral_reports.prom)
+- one line appended to exports/metrics/run_summary.jsonl
+
+Usage:
+    python api_metrics.py            # Recent runs from run_summary.jsonl
+    python api_metrics.py 30         # The last 30 runs
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+
+METRICS_DIR = os.getenv('METRICS_DIR', 'exports/metrics')
+METRICS_TEXTFILE = os.getenv('METRICS_TEXTFILE', os.path.join(METRICS_DIR, 'ringcentral_reports.prom'))
+RUN_SUMMARY_FILE = os.path.join(METRICS_DIR, 'run_summary.jsonl')
+
+# Request latency histogram buckets (seconds)
+LATENCY_BUCKETS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+def payload_size(response):
+    """Bytes on the wire for an SDK ApiResponse (Content-Length, else the body size)"""
+    try:
+        raw = response.response()
+        length = raw.headers.get('Content-Length')
+        if str(length or '').isdigit():
+            return int(length)
+        return len(raw.content or b'')
+    except Exception:
+        return 0
+
+def response_status(response):
+    """HTTP status of an SDK ApiResponse (200 when unavailable)"""
+    try:
+        return response.response().status_code
+    except Exception:
+        return 200
+
+def labels(**values):
+    """Prometheus label set, e.g. {group="call-log",status="200"}"""
+    escaped = {k: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for k, v in values.items()}
+    return '{' + ','.join(f'{k}="{v}"' for k, v in escaped.items()) + '}'
+
+def _empty_group():
+    return {'requests': 0, 'errors': 0, 'rate_limited': 0, 'seconds': 0.0, 'bytes': 0, 'wait_seconds': 0.0, 'statuses': {}}
+
+class ApiMetrics:
+    """Thread-safe request and wait counters for one run"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            # (account, group, status) -> {'count', 'seconds', 'bytes', 'buckets'}
+            self.requests = {}
+            # (account, group, reason) -> seconds
+            self.waits = {}
+    
+    def record_request(self, group, status, seconds, size=0, account=''):
+        with self._lock:
+            entry = self.requests.setdefault((account, group, str(status)), {
+                'count': 0, 'seconds': 0.0, 'bytes': 0, 'buckets': [0] * len(LATENCY_BUCKETS)
+            })
+            entry['count'] += 1
+            entry['seconds'] += seconds
+            entry['bytes'] += size
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    entry['buckets'][i] += 1
+    
+    def record_wait(self, group, reason, seconds, account=''):
+        """reason: 'rate_budget' (pacing / 429 block) or 'backoff' (retry delay)"""
+        with self._lock:
+            key = (account, group, reason)
+            self.waits[key] = self.waits.get(key, 0.0) + seconds
+    
+    def summary(self):
+        """Totals for the run summary, by endpoint group"""
+        with self._lock:
+            groups = {}
+            for (account, group, status), entry in self.requests.items():
+                totals = groups.setdefault(group, _empty_group())
+                totals['requests'] += entry['count']
+                totals['seconds'] += entry['seconds']
+                totals['bytes'] += entry['bytes']
+                totals['statuses'][status] = totals['statuses'].get(status, 0) + entry['count']
+                if status == '429':
+                    totals['rate_limited'] += entry['count']
+                elif not status.startswith('2'):
+                    totals['errors'] += entry['count']
+            for (account, group, reason), seconds in self.waits.items():
+                totals = groups.setdefault(group, _empty_group())
+                totals['wait_seconds'] += seconds
+            
+            return {
+                'requests': sum(g['requests'] for g in groups.values()),
+                'rate_limited': sum(g['rate_limited'] for g in groups.values()),
+                'errors': sum(g['errors'] for g in groups.values()),
+                'bytes': sum(g['bytes'] for g in groups.values()),
+                'request_seconds': round(sum(g['seconds'] for g in groups.values()), 3),
+                'wait_seconds': round(sum(g['wait_seconds'] for g in groups.values()), 3),
+                'groups': groups
+            }
+    
+    def prometheus_text(self, extra=None):
+        """The metrics in Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            requests = sorted(self.requests.items())
+            waits = sorted(self.waits.items())
+        
+        lines += ['# HELP ringcentral_api_last_run_requests RingCentral API requests made by the last run',
+                  '# TYPE ringcentral_api_last_run_requests gauge']
+        for (account, group, status), entry in requests:
+            lines.append(f"ringcentral_api_last_run_requests{labels(account=account, group=group, status=status)} {entry['count']}")
+        
+        lines += ['# HELP ringcentral_api_last_run_response_bytes Response payload bytes received by the last run',
+                  '# TYPE ringcentral_api_last_run_response_bytes gauge']
+        for (account, group, status), entry in requests:
+            lines.append(f"ringcentral_api_last_run_response_bytes{labels(account=account, group=group, status=status)} {entry['bytes']}")
+        
+        lines += ['# HELP ringcentral_api_last_run_request_duration_seconds RingCentral API request latency in the last run',
+                  '# TYPE ringcentral_api_last_run_request_duration_seconds histogram']
+        merged = {}
+        for (account, group, status), entry in requests:
+            totals = merged.setdefault((account, group), {'count': 0, 'seconds': 0.0, 'buckets': [0] * len(LATENCY_BUCKETS)})
+            totals['count'] += entry['count']
+            totals['seconds'] += entry['seconds']
+            totals['buckets'] = [a + b for a, b in zip(totals['buckets'], entry['buckets'])]
+        for (account, group), totals in sorted(merged.items()):
+            for bound, count in zip(LATENCY_BUCKETS, totals['buckets']):
+                lines.append(f"ringcentral_api_last_run_request_duration_seconds_bucket{labels(account=account, group=group, le=bound)} {count}")
+            lines.append(f"ringcentral_api_last_run_request_duration_seconds_bucket{labels(account=account, group=group, le='+Inf')} {totals['count']}")
+            lines.append(f"ringcentral_api_last_run_request_duration_seconds_sum{labels(account=account, group=group)} {totals['seconds']:.3f}")
+            lines.append(f"ringcentral_api_last_run_request_duration_seconds_count{labels(account=account, group=group)} {totals['count']}")
+        
+        lines += ['# HELP ringcentral_api_last_run_wait_seconds Seconds the last run spent waiting for rate-limit budget or retry backoff',
+                  '# TYPE ringcentral_api_last_run_wait_seconds gauge']
+        for (account, group, reason), seconds in waits:
+            lines.append(f"ringcentral_api_last_run_wait_seconds{labels(account=account, group=group, reason=reason)} {seconds:.3f}")
+        
+        for name, (help_text, value) in sorted((extra or {}).items()):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+        
+        return '\n'.join(lines) + '\n'
+
+# The metrics for this process's run
+RUN_METRICS = ApiMetrics()
+
+def export_run_metrics(date_str, success, partial_reasons=None, metrics=None, extra=None):
+    """Write the textfile-collector file and append this run to run_summary.jsonl"""
+    metrics = metrics or RUN_METRICS
+    finished = time.time()
+    summary = metrics.summary()
+    
+    gauges = {
+        'ringcentral_report_last_run_timestamp_seconds': ('When the last report run finished', f"{finished:.0f}"),
+        'ringcentral_report_last_run_duration_seconds': ('How long the last report run took', f"{finished - metrics.started:.1f}"),
+        'ringcentral_report_last_run_success': ('1 if the last report run completed', 1 if success else 0),
+        'ringcentral_report_last_run_partial': ('1 if the last report was built from incomplete data', 1 if partial_reasons else 0),
+    }
+    
+    os.makedirs(os.path.dirname(METRICS_TEXTFILE) or '.', exist_ok=True)
+    # node_exporter may read at any moment - write to a temp file and rename
+    tmp_path = f"{METRICS_TEXTFILE}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(metrics.prometheus_text(gauges))
+    os.replace(tmp_path, METRICS_TEXTFILE)
+    
+    entry = {
+        'date': date_str,
+        'started_at': round(metrics.started, 3),
+        'finished_at': round(finished, 3),
+        'seconds': round(finished - metrics.started, 3),
+        'success': success,
+        'partial': list(partial_reasons or []),
+    }
+    entry.update(extra or {})
+    entry.update(summary)
+    os.makedirs(os.path.dirname(RUN_SUMMARY_FILE) or '.', exist_ok=True)
+    with open(RUN_SUMMARY_FILE, 'a') as f:
+        f.write(json.dumps(entry, sort_keys=True) + '\n')
+    
+    print(f"📈 API usage: {summary['requests']} requests, {summary['rate_limited']} rate-limited, "
+          f"{summary['bytes'] / 1024:.0f} KB, {summary['wait_seconds']:.0f}s waiting")
+    return entry
+
+def load_run_summaries(limit=None):
+    if not os.path.exists(RUN_SUMMARY_FILE):
+        return []
+    runs = []
+    with open(RUN_SUMMARY_FILE, 'r') as f:
+        for line in f:
+            try:
+                runs.append(json.loads(line))
+            except ValueError:
+                continue
+    return runs[-limit:] if limit else runs
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    runs = load_run_summaries(int(args[0]) if args else 10)
+    if not runs:
+        print(f"📭 No runs recorded in {RUN_SUMMARY_FILE}")
+        return
+    
+    print("📈 RINGCENTRAL API USAGE PER RUN")
+    print("=" * 60)
+    print(f"   {'Report date':<12}{'Requests':>9}{'429s':>6}{'Errors':>7}{'KB':>8}{'Waiting':>9}{'Total':>8}")
+    for run in runs:
+        status = '' if run.get('success') else '  ❌'
+        status += '  ⚠️ partial' if run.get('partial') else ''
+        print(f"   {run['date']:<12}{run['requests']:>9}{run['rate_limited']:>6}{run['errors']:>7}"
+              f"{run['bytes'] / 1024:>8.0f}{run['wait_seconds']:>8.0f}s{run['seconds']:>7.0f}s{status}")
+
+if __name__ == "__main__":
+    main()
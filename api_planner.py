@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+API Planner - Predict how many RingCentral requests a run needs and how long it takes
+Uses the record counts seen on earlier runs (per day), the extension count
+and the usage-plan limits of each endpoint group to lay out every request a
+run will make, then simulates them against the rate limits.
+
+Usage:
+    python api_planner.py 2025-11-20                 # One day
+    python api_planner.py 2025-11-01 2025-11-30      # A backfill range
+
+generate_and_send_reports.py, generate_specific_date_report.py,
+pipeline.py, improved_call_logs.py and analyze_fax_senders.py accept
+--dry-run to print the plan for their date instead of fetching.
+"""
+
+import os
+import sys
+import json
+import math
+import tempfile
+import threading
+import statistics
+from datetime import datetime, timedelta
+
+from rate_budget import DEFAULT_RATE_LIMITS, ENDPOINT_GROUPS
+
+STATS_FILE = 'exports/.cache/api_stats.json'
+
+# Used until real runs have been observed
+DEFAULT_RECORDS_PER_DAY = 200
+DEFAULT_EXTENSIONS = 100
+DEFAULT_LATENCY_SECONDS = 1.0
+
+# Mirrors fetch_fax_call_log(): 100-record pages, then twelve 2-hour
+# windows when the day has fewer than 400 records
+CALL_LOG_PAGE_SIZE = 100
+CALL_LOG_WINDOWS = 12
+CALL_LOG_WINDOW_THRESHOLD = 400
+EXTENSION_PAGE_SIZE = 1000
+# Mirrors fax_attribution.py: main fax line faxes are looked up 30 message
+# ids per request; planned as if every fax were on the main line, uncached
+MESSAGE_BATCH_SIZE = 30
+
+USAGE_GROUPS = {group: usage_group for _, group, usage_group in ENDPOINT_GROUPS}
+
+# The pipeline's directory and fax_fetch steps record observations from
+# parallel threads; each update is a read-modify-write of STATS_FILE
+_stats_lock = threading.Lock()
+
+def load_stats():
+    if not os.path.exists(STATS_FILE):
+        return {'days': {}, 'extensions': None, 'latency': None}
+    try:
+        with open(STATS_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'days': {}, 'extensions': None, 'latency': None}
+
+def _save_stats(stats):
+    directory = os.path.dirname(STATS_FILE)
+    os.makedirs(directory, exist_ok=True)
+    # A temp file of its own, so concurrent writers never replace each other's
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.api_stats.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(stats, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, STATS_FILE)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def record_observations(date_str=None, records=None, extensions=None, platform=None):
+    """Remember what a real run saw, so later plans get more accurate"""
+    with _stats_lock:
+        stats = load_stats()
+        if date_str and records is not None:
+            stats['days'][date_str] = records
+        if extensions is not None:
+            stats['extensions'] = extensions
+        if platform is not None and getattr(platform, 'requests', 0):
+            observed = platform.request_seconds / platform.requests
+            # Smooth so one slow run does not swing every future estimate
+            stats['latency'] = observed if not stats.get('latency') else 0.7 * stats['latency'] + 0.3 * observed
+        _save_stats(stats)
+
+def estimate_records(date_str, stats):
+    """(records, source) for a day: observed, same-weekday median, overall median, or default"""
+    days = stats.get('days', {})
+    if date_str in days:
+        return days[date_str], 'observed'
+    
+    weekday = datetime.strptime(date_str, "%Y-%m-%d").weekday()
+    same_weekday = [n for d, n in days.items() if datetime.strptime(d, "%Y-%m-%d").weekday() == weekday]
+    if same_weekday:
+        return int(statistics.median(same_weekday)), 'weekday median'
+    if days:
+        return int(statistics.median(days.values())), 'median'
+    return DEFAULT_RECORDS_PER_DAY, 'default'
+
+def day_requests(records, extensions):
+    """Requests one pipeline run for a day makes (login first, then one entry per fetch step)"""
+    call_log_pages = max(1, math.ceil(records / CALL_LOG_PAGE_SIZE))
+    call_log_windows = CALL_LOG_WINDOWS if records < CALL_LOG_WINDOW_THRESHOLD else 0
+    return [
+        ('auth', 1),
+        ('extension', max(1, math.ceil(extensions / EXTENSION_PAGE_SIZE))),
+        # Cached for a day by phone_index.py; planned as if it had expired
+        ('phone-number', 1),
+        ('analytics', 1),
+        ('call-log', call_log_pages + call_log_windows),
+        ('message-store', math.ceil(records / MESSAGE_BATCH_SIZE)),
+    ]
+
+def simulate(requests, limits=None, latency=DEFAULT_LATENCY_SECONDS, concurrent=False, start=0.0, next_allowed=None):
+    """Clock (seconds) after sending `requests` ([(endpoint_group, count)])
+    
+    Each usage group is paced the way RateBudget paces it: evenly, one
+    request every window/limit seconds. With concurrent=True every entry
+    is its own sequence of requests and they run side by side, like the
+    pipeline's directory / analytics / fax_fetch steps. Pass the same
+    next_allowed dict to carry pacing over from earlier requests.
+    """
+    limits = limits or DEFAULT_RATE_LIMITS
+    next_allowed = {} if next_allowed is None else next_allowed
+    
+    streams = [[group] * count for group, count in requests] if concurrent else [[group for group, count in requests for _ in range(count)]]
+    clocks = [start] * len(streams)
+    
+    while any(streams):
+        # Whichever stream is furthest behind sends its next request
+        index = min((i for i, stream in enumerate(streams) if stream), key=lambda i: clocks[i])
+        usage_group = USAGE_GROUPS.get(streams[index].pop(0), 'light')
+        interval = limits[usage_group]['window'] / limits[usage_group]['requests']
+        clocks[index] = max(clocks[index], next_allowed.get(usage_group, 0.0))
+        next_allowed[usage_group] = clocks[index] + interval
+        clocks[index] += latency
+    return max(clocks) if clocks else start
+
+def simulate_day(requests, limits=None, latency=DEFAULT_LATENCY_SECONDS, start=0.0, next_allowed=None):
+    """Clock after one pipeline run: login, the fetch steps concurrently, then fax attribution"""
+    next_allowed = {} if next_allowed is None else next_allowed
+    auth = [(group, count) for group, count in requests if group == 'auth']
+    # fax_attribution needs the fetched call log
+    lookups = [(group, count) for group, count in requests if group == 'message-store']
+    fetches = [(group, count) for group, count in requests if group not in ('auth', 'message-store')]
+    clock = simulate(auth, limits, latency, start=start, next_allowed=next_allowed)
+    clock = simulate(fetches, limits, latency, concurrent=True, start=clock, next_allowed=next_allowed)
+    return simulate(lookups, limits, latency, start=clock, next_allowed=next_allowed)
+
+def build_plan(dates, limits=None):
+    """Execution plan for running the pipeline once per date"""
+    stats = load_stats()
+    extensions = stats.get('extensions') or DEFAULT_EXTENSIONS
+    latency = stats.get('latency') or DEFAULT_LATENCY_SECONDS
+    limits = limits or DEFAULT_RATE_LIMITS
+    
+    days = []
+    totals = {}
+    clock = 0.0
+    next_allowed = {}
+    for date_str in dates:
+        records, source = estimate_records(date_str, stats)
+        requests = day_requests(records, extensions)
+        for group, count in requests:
+            totals[group] = totals.get(group, 0) + count
+        days.append({
+            'date': date_str,
+            'records': records,
+            'source': source,
+            'requests': sum(count for _, count in requests),
+            'seconds': simulate_day(requests, limits, latency)
+        })
+        # Back-to-back runs share the rate budget
+        clock = simulate_day(requests, limits, latency, start=clock, next_allowed=next_allowed)
+    
+    return {
+        'dates': list(dates),
+        'extensions': extensions,
+        'latency': latency,
+        'rate_limits': limits,
+        'days': days,
+        'requests_by_group': totals,
+        'total_requests': sum(totals.values()),
+        'total_seconds': clock
+    }
+
+def date_range(start_str, end_str=None):
+    start = datetime.strptime(start_str, "%Y-%m-%d")
+    end = datetime.strptime(end_str or start_str, "%Y-%m-%d")
+    return [(start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range((end - start).days + 1)]
+
+def format_duration(seconds):
+    if seconds < 90:
+        return f"{seconds:.0f}s"
+    if seconds < 90 * 60:
+        return f"{seconds / 60:.1f} min"
+    return f"{seconds / 3600:.1f} h"
+
+def print_plan(plan):
+    print(f"🧮 API PLAN - {plan['dates'][0]}" + (f" to {plan['dates'][-1]}" if len(plan['dates']) > 1 else ''))
+    print("=" * 60)
+    print(f"   Extensions: {plan['extensions']}, avg request latency: {plan['latency']:.2f}s")
+    print(f"\n   {'Date':<12}{'Records':>9}  {'(estimate)':<16}{'Requests':>9}{'Time':>10}")
+    for day in plan['days']:
+        print(f"   {day['date']:<12}{day['records']:>9}  {day['source']:<16}{day['requests']:>9}{format_duration(day['seconds']):>10}")
+    
+    print(f"\n   Requests by endpoint group:")
+    for group, count in sorted(plan['requests_by_group'].items()):
+        usage_group = USAGE_GROUPS.get(group, 'light')
+        limit = plan['rate_limits'][usage_group]
+        print(f"   • {group:<12}{count:>6}  ({usage_group}: {limit['requests']} per {limit['window']}s)")
+    
+    print(f"\n📊 Expected: {plan['total_requests']} requests, {format_duration(plan['total_seconds'])}")
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if not args:
+        print("Usage: python api_planner.py START_DATE [END_DATE]")
+        sys.exit(1)
+    print_plan(build_plan(date_range(args[0], args[1] if len(args) > 1 else None)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Throughput and peak memory of the report hot paths on synthetic data
+Stages: extract_call_data, extract_fax_data, group_call_records,
+build_fax_records, compute_extension_stats, compute_sender_stats and the
+two report writers. Each stage runs once for wall time and once under
+tracemalloc for peak memory, on data from synthetic_data.py.
+
+Usage:
+    python benchmark.py                                    # 10k records, 200 extensions
+    python benchmark.py --records 1000,100000 --extensions 10,5000
+    python benchmark.py --records 1000000 --no-memory      # Skip the tracemalloc pass
+    python benchmark.py --stages extract_call_data,group_call_records
+    python benchmark.py --repeat 5                         # Best of 5 timed passes
+
+Regression gate:
+    python benchmark.py --save-baseline                    # Write benchmark_baseline.json
+    python benchmark.py --check                            # Compare with it; exit 1 over budget
+
+--check reruns the baseline's sizes and fails when a stage is slower than
+its baseline by more than BENCHMARK_TIME_TOLERANCE (default 30%) or uses
+more peak memory than BENCHMARK_MEMORY_TOLERANCE (default 20%). With
+BENCHMARK_TIME_ADVISORY=1 (set in CI) time overruns are only reported. Baseline
+timings are scaled by a calibration loop, so a baseline recorded on a
+faster or slower machine still compares fairly. Per-stage budgets can be
+set in the baseline file: "budgets": {"fax_report": {"time": 0.5}}.
+
+Results are also written to exports/benchmarks/<timestamp>.json.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+
+import tracing
+import synthetic_data
+import improved_call_logs
+import analyze_fax_senders
+import phone_index
+
+BENCHMARK_DIR = 'exports/benchmarks'
+BASELINE_FILE = os.getenv('BENCHMARK_BASELINE', 'benchmark_baseline.json')
+
+# Allowed growth over the baseline before --check fails
+TIME_TOLERANCE = float(os.getenv('BENCHMARK_TIME_TOLERANCE', '0.3'))
+MEMORY_TOLERANCE = float(os.getenv('BENCHMARK_MEMORY_TOLERANCE', '0.2'))
+# Shared CI runners are too noisy to fail on wall time: with this set, time
+# overruns are reported but only memory (tracemalloc, deterministic) fails
+TIME_ADVISORY = os.getenv('BENCHMARK_TIME_ADVISORY', '').lower() in ('1', 'true', 'yes')
+
+# Differences smaller than these are noise, never a regression
+MIN_SECONDS_DELTA = 0.02
+MIN_MB_DELTA = 0.5
+
+# Timed passes per stage for the baseline and the check (best one counts)
+GATE_REPEAT = 3
+
+# The extract stages keep their rows, as group_call_records() and
+# build_fax_records() do, so the memory pass measures what they produce
+def stage_extract_call_data(data, workdir):
+    directory, phone_map = data['directory'], data['phone_map']
+    rows = [improved_call_logs.extract_call_data(record, directory, phone_map) for record in data['call_log']]
+    return len(rows)
+
+def stage_extract_fax_data(data, workdir):
+    directory = data['directory']
+    rows = [analyze_fax_senders.extract_fax_data(record, directory) for record in data['call_log']]
+    return len(rows)
+
+def stage_group_call_records(data, workdir):
+    grouped, _ = improved_call_logs.group_call_records(data['call_log'], data['directory'], data['phone_map'], data['voice'])
+    data['grouped'] = grouped
+    return len(data['call_log'])
+
+def stage_build_fax_records(data, workdir):
+    data['fax_records'] = analyze_fax_senders.build_fax_records(data['call_log'], data['directory'])
+    return len(data['call_log'])
+
+def stage_compute_extension_stats(data, workdir):
+    # A generator: the rows have to be drawn for the stage to do any work
+    rows = list(improved_call_logs.compute_extension_stats(data['grouped']))
+    data['extension_stats'] = rows
+    return sum(len(records) for records in data['grouped'].values())
+
+def stage_compute_sender_stats(data, workdir):
+    analyze_fax_senders.compute_sender_stats(data['fax_records'])
+    return len(data['fax_records'])
+
+def stage_call_report(data, workdir):
+    if improved_call_logs.EXCEL_AVAILABLE:
+        improved_call_logs.generate_excel_report(data['grouped'], os.path.join(workdir, 'calls.xlsx'), data['date'])
+    else:
+        improved_call_logs.generate_csv_report(data['grouped'], os.path.join(workdir, 'calls.csv'))
+    return sum(len(records) for records in data['grouped'].values())
+
+def stage_fax_report(data, workdir):
+    extension = '.xlsx' if analyze_fax_senders.EXCEL_AVAILABLE else '.csv'
+    analyze_fax_senders.generate_fax_report(data['fax_records'], os.path.join(workdir, f"fax{extension}"), data['date'])
+    return len(data['fax_records'])
+
+# In run order; later stages use what earlier ones leave in `data`
+STAGES = [
+    ('extract_call_data', stage_extract_call_data),
+    ('extract_fax_data', stage_extract_fax_data),
+    ('group_call_records', stage_group_call_records),
+    ('build_fax_records', stage_build_fax_records),
+    ('compute_extension_stats', stage_compute_extension_stats),
+    ('compute_sender_stats', stage_compute_sender_stats),
+    ('call_report', stage_call_report),
+    ('fax_report', stage_fax_report),
+]
+
+def prepare(records, extensions, seed=synthetic_data.DEFAULT_SEED):
+    """Synthetic inputs in the shape the pipeline hands to each stage"""
+    dataset = synthetic_data.generate_dataset(records, extensions, seed=seed)
+    with redirect_stdout(io.StringIO()):
+        voice = {
+            str(r['info']['extensionNumber']): {
+                'inbound': r['counters']['callsByDirection']['values']['inbound'],
+                'outbound': r['counters']['callsByDirection']['values']['outbound'],
+                'total': r['counters']['allCalls']['values']
+            }
+            for r in dataset['analytics']['data']['records']
+        }
+        phone_map = improved_call_logs.build_phone_to_extension_map(
+            dataset['directory'], phone_index.index_from_records(dataset['phone_numbers'])
+        )
+    return {
+        'date': dataset['date'],
+        'directory': dataset['directory'],
+        'call_log': dataset['call_log'],
+        'voice': voice,
+        'phone_map': phone_map
+    }
+
+def measure(func, data, workdir, memory=True, repeat=1):
+    """(items, best seconds, peak bytes or None) for one stage; its prints are swallowed"""
+    with redirect_stdout(io.StringIO()):
+        seconds = None
+        for _ in range(max(repeat, 1)):
+            started = time.perf_counter()
+            items = func(data, workdir)
+            elapsed = time.perf_counter() - started
+            seconds = elapsed if seconds is None else min(seconds, elapsed)
+        
+        peak = None
+        if memory:
+            tracemalloc.start()
+            try:
+                func(data, workdir)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+    return items, seconds, peak
+
+def run_benchmarks(records, extensions, stages=None, memory=True, seed=synthetic_data.DEFAULT_SEED, repeat=1):
+    """Results for one (records, extensions) size: {stage: {items, seconds, per_second, peak_mb}}"""
+    data = prepare(records, extensions, seed)
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, func in STAGES:
+            if stages and name not in stages:
+                # Still run it (untimed) if a later stage needs its output
+                if name in ('group_call_records', 'build_fax_records'):
+                    with redirect_stdout(io.StringIO()):
+                        func(data, workdir)
+                continue
+            items, seconds, peak = measure(func, data, workdir, memory, repeat)
+            results[name] = {
+                'items': items,
+                'seconds': round(seconds, 4),
+                'per_second': round(items / seconds) if seconds > 0 else None,
+                'peak_mb': round(peak / (1024 * 1024), 2) if peak is not None else None
+            }
+    return results
+
+def print_results(records, extensions, results):
+    print(f"\n📏 {records:,} records, {extensions:,} extensions")
+    print(f"   {'Stage':<26}{'Items':>10}{'Seconds':>10}{'Items/s':>12}{'Peak MB':>10}")
+    for name, r in results.items():
+        peak = f"{r['peak_mb']:.1f}" if r['peak_mb'] is not None else '-'
+        per_second = f"{r['per_second']:,}" if r['per_second'] is not None else '-'
+        print(f"   {name:<26}{r['items']:>10,}{r['seconds']:>10.3f}{per_second:>12}{peak:>10}")
+
+def calibrate(rounds=3):
+    """Seconds for a fixed pure-Python workload, to scale timings between machines"""
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        rows = [{'id': str(i), 'name': f"Extension {i}", 'count': i * 7 % 13} for i in range(100000)]
+        rows = json.loads(json.dumps(rows))
+        rows.sort(key=lambda row: (row['count'], row['name']))
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def save_baseline(path, runs, seed, calibration):
+    with open(path, 'w') as f:
+        json.dump({
+            'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': sys.version.split()[0],
+            'seed': seed,
+            'calibration_seconds': round(calibration, 4),
+            'tolerance': {'time': TIME_TOLERANCE, 'memory': MEMORY_TOLERANCE},
+            'budgets': {},
+            'runs': runs
+        }, f, indent=2)
+        f.write('\n')
+
+def _change(before, after):
+    if not before:
+        return '-'
+    return f"{(after - before) / before:+.0%}"
+
+def compare_run(baseline_run, results, scale, tolerance, budgets):
+    """Diff rows for one (records, extensions) size and the stages over budget"""
+    rows, failures = [], []
+    for name, base in baseline_run['stages'].items():
+        now = results.get(name)
+        if not now:
+            continue
+        budget = dict(tolerance)
+        budget.update(budgets.get(name, {}))
+        expected_seconds = base['seconds'] * scale
+        problems = []
+        if (now['seconds'] > expected_seconds * (1 + budget['time'])
+                and now['seconds'] - expected_seconds > MIN_SECONDS_DELTA):
+            problems.append('time')
+        if (base.get('peak_mb') is not None and now.get('peak_mb') is not None
+                and now['peak_mb'] > base['peak_mb'] * (1 + budget['memory'])
+                and now['peak_mb'] - base['peak_mb'] > MIN_MB_DELTA):
+            problems.append('memory')
+        rows.append((name, expected_seconds, now['seconds'], base.get('peak_mb'), now.get('peak_mb'), problems))
+        failing = [problem for problem in problems if not (problem == 'time' and TIME_ADVISORY)]
+        if failing:
+            failures.append(f"{name} ({baseline_run['records']:,} records): {' and '.join(failing)} over budget")
+    return rows, failures
+
+def print_comparison(records, extensions, rows, scale):
+    print(f"\n📏 {records:,} records, {extensions:,} extensions (baseline times x{scale:.2f} for this machine)")
+    print(f"   {'Stage':<26}{'Base s':>9}{'Now s':>9}{'Change':>8}{'Base MB':>9}{'Now MB':>9}{'Change':>8}")
+    for name, base_s, now_s, base_mb, now_mb, problems in rows:
+        if problems == ['time'] and TIME_ADVISORY:
+            status = '⚠️  time (advisory)'
+        else:
+            status = f"❌ {', '.join(problems)}" if problems else '✅'
+        base_mb_text = f"{base_mb:.1f}" if base_mb is not None else '-'
+        now_mb_text = f"{now_mb:.1f}" if now_mb is not None else '-'
+        memory_change = _change(base_mb, now_mb) if base_mb is not None and now_mb is not None else '-'
+        print(f"   {name:<26}{base_s:>9.3f}{now_s:>9.3f}{_change(base_s, now_s):>8}"
+              f"{base_mb_text:>9}{now_mb_text:>9}{memory_change:>8}  {status}")
+
+def check_against_baseline(path, repeat=GATE_REPEAT, memory=True):
+    """Rerun the baseline's sizes and compare; returns (passed, runs)"""
+    with open(path, 'r') as f:
+        baseline = json.load(f)
+    
+    calibration = calibrate()
+    scale = calibration / baseline['calibration_seconds'] if baseline.get('calibration_seconds') else 1.0
+    tolerance = {'time': TIME_TOLERANCE, 'memory': MEMORY_TOLERANCE}
+    if not os.getenv('BENCHMARK_TIME_TOLERANCE'):
+        tolerance['time'] = baseline.get('tolerance', {}).get('time', TIME_TOLERANCE)
+    if not os.getenv('BENCHMARK_MEMORY_TOLERANCE'):
+        tolerance['memory'] = baseline.get('tolerance', {}).get('memory', MEMORY_TOLERANCE)
+    print(f"   Baseline {path} ({baseline.get('created_at', '?')}, Python {baseline.get('python', '?')}), "
+          f"budget +{tolerance['time']:.0%} time{' (advisory)' if TIME_ADVISORY else ''} / +{tolerance['memory']:.0%} memory")
+    
+    runs, failures = [], []
+    for baseline_run in baseline['runs']:
+        results = run_benchmarks(baseline_run['records'], baseline_run['extensions'], list(baseline_run['stages']),
+                                 memory, baseline.get('seed', synthetic_data.DEFAULT_SEED), repeat)
+        rows, run_failures = compare_run(baseline_run, results, scale, tolerance, baseline.get('budgets', {}))
+        print_comparison(baseline_run['records'], baseline_run['extensions'], rows, scale)
+        runs.append({'records': baseline_run['records'], 'extensions': baseline_run['extensions'], 'stages': results})
+        failures += run_failures
+    
+    if failures:
+        print(f"\n❌ {len(failures)} stage(s) over budget:")
+        for failure in failures:
+            print(f"   • {failure}")
+        print("💡 If the slowdown is intended, refresh the baseline: python benchmark.py --save-baseline")
+    else:
+        print("\n✅ All stages within budget")
+    return not failures, runs
+
+def _int_list(value):
+    return [int(v) for v in value.split(',') if v]
+
+def main():
+    args = sys.argv[1:]
+    
+    def option(name, default):
+        if name not in args:
+            return default
+        # --check and --save-baseline take an optional path
+        index = args.index(name) + 1
+        if index < len(args) and not args[index].startswith('--'):
+            return args[index]
+        return default
+    
+    sizes = _int_list(option('--records', '10000'))
+    extension_counts = _int_list(option('--extensions', '200'))
+    stages = option('--stages', '').split(',') if '--stages' in args else None
+    seed = int(option('--seed', str(synthetic_data.DEFAULT_SEED)))
+    memory = '--no-memory' not in args
+    gate = '--check' in args or '--save-baseline' in args
+    repeat = int(option('--repeat', str(GATE_REPEAT if gate else 1)))
+    # Span files would add I/O to the stages being measured
+    tracing.TRACE_DIR = ''
+    
+    print("⏱️  REPORT HOT-PATH BENCHMARKS")
+    print("=" * 60)
+    print(f"   Excel: {'yes' if improved_call_logs.EXCEL_AVAILABLE else 'no (CSV writers)'}, memory pass: {'yes' if memory else 'no'}, seed {seed}")
+    
+    passed = True
+    if '--check' in args:
+        passed, runs = check_against_baseline(option('--check', BASELINE_FILE), repeat, memory)
+    else:
+        runs = []
+        for records in sizes:
+            for extensions in extension_counts:
+                results = run_benchmarks(records, extensions, stages, memory, seed, repeat)
+                print_results(records, extensions, results)
+                runs.append({'records': records, 'extensions': extensions, 'stages': results})
+    
+    if '--save-baseline' in args:
+        path = option('--save-baseline', BASELINE_FILE)
+        save_baseline(path, runs, seed, calibrate())
+        print(f"\n📌 Baseline saved: {path}")
+    
+    os.makedirs(BENCHMARK_DIR, exist_ok=True)
+    path = os.path.join(BENCHMARK_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w') as f:
+        json.dump({'created_at': time.time(), 'seed': seed, 'python': sys.version.split()[0], 'runs': runs}, f, indent=2)
+    print(f"\n💾 Results saved: {path}")
+    
+    if not passed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Fetch Benchmark - Wall time and request count of each call-log fetch strategy
+Starts fake_ringcentral.py in-process, logs in through connect_platform()
+and runs each strategy with a fresh rate budget and retry policy against
+the same synthetic day. Reports wall time, requests, 429s, 5xx responses
+response bytes and how many of the day's fax records the strategy
+actually got.
+
+The production strategy is then rerun with the SDK's own
+connection-per-request client, to show the connections and request
+latency the pooled transport (http_transport.py) saves.
+
+Rate-limit windows are shortened (--rate-window, default 3s instead of
+60s) on both the fake server and the client budget, so the pacing pattern
+is real but a run takes seconds.
+
+Usage:
+    python benchmark_fetch.py
+    python benchmark_fetch.py --records 20000 --extensions 1000 --latency 0.2
+    python benchmark_fetch.py --error-rate 0.05 --throttle-rate 0.05
+    python benchmark_fetch.py --strategies production,pages-1000
+    python benchmark_fetch.py --no-transport              # Skip the transport comparison
+
+Results are also written to exports/benchmarks/fetch-<timestamp>.json.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+from contextlib import redirect_stdout
+
+import tracing
+import call_log_view
+import http_transport
+import synthetic_data
+import fake_ringcentral
+import improved_call_logs
+from retry_policy import RetryPolicy
+
+BENCHMARK_DIR = 'exports/benchmarks'
+
+def strategy_production(platform, date_from, date_to, date_str):
+    """fetch_fax_call_log() as the daily run uses it"""
+    return {'fax_records': improved_call_logs.fetch_fax_call_log(platform, date_from, date_to, date_str)}
+
+def pages(per_page):
+    def strategy(platform, date_from, date_to, date_str):
+        records, _ = improved_call_logs.fetch_fax_pages(platform, date_from, date_to, per_page=per_page)
+        return {'fax_records': records}
+    return strategy
+
+def windows(hours, per_page=improved_call_logs.FAX_WINDOW_PAGE_SIZE):
+    def strategy(platform, date_from, date_to, date_str):
+        return {'fax_records': improved_call_logs.fetch_fax_windows(platform, date_str, hours, per_page)}
+    return strategy
+
+def strategy_detailed_uncompressed(platform, date_from, date_to, date_str):
+    """pages-100 as it was fetched before call_log_view.py: view=Detailed, no gzip, SDK JsonObjects"""
+    records = []
+    page = 1
+    while True:
+        response_data = platform.get(call_log_view.CALL_LOG_PATH, {
+            "view": "Detailed",
+            "dateFrom": date_from,
+            "dateTo": date_to,
+            "type": "Fax",
+            "perPage": 100,
+            "page": page
+        }).json()
+        page_records = improved_call_logs.safe_get_attr(response_data, 'records', [])
+        records.extend(page_records)
+        if len(page_records) < 100 or not improved_call_logs.has_next_page(response_data):
+            break
+        page += 1
+    return {'fax_records': records}
+
+def strategy_sequential(platform, date_from, date_to, date_str):
+    """Directory, Analytics and fax call log one after another"""
+    improved_call_logs.fetch_extensions_directory(platform)
+    improved_call_logs.fetch_voice_calls_from_analytics(platform, date_str, date_str)
+    return {'fax_records': improved_call_logs.fetch_fax_call_log(platform, date_from, date_to, date_str)}
+
+def strategy_prefetch(platform, date_from, date_to, date_str):
+    """prefetch_report_data(): the three fetches concurrently"""
+    _, _, fax_records = improved_call_logs.prefetch_report_data(platform, date_from, date_to, date_str)
+    return {'fax_records': fax_records}
+
+STRATEGIES = [
+    ('production', strategy_production),
+    ('pages-100', pages(100)),
+    ('pages-1000', pages(1000)),
+    ('detailed-raw', strategy_detailed_uncompressed),
+    ('windows-2h', windows(2)),
+    ('windows-1h', windows(1)),
+    ('windows-6h-1000', windows(6, 1000)),
+    ('sequential', strategy_sequential),
+    ('prefetch', strategy_prefetch),
+]
+
+def run_strategy(func, fake, server_url, rate_limits, date_str, deadline_seconds, pooled=True):
+    """Log in, reset the fake's counters, run one strategy and measure it"""
+    date_from = f"{date_str}T00:00:00.000Z"
+    date_to = f"{date_str}T23:59:59.999Z"
+    # A fresh pool per strategy, so none starts with warm connections
+    http_transport.POOL_ENABLED = pooled
+    http_transport.reset()
+    
+    with redirect_stdout(io.StringIO()):
+        platform = improved_call_logs.connect_platform({
+            'name': 'fake',
+            'server_url': server_url,
+            'rate_limits': rate_limits
+        })
+        platform.policy = RetryPolicy(deadline_seconds)
+        fake.reset()
+        
+        started = time.perf_counter()
+        result = func(platform, date_from, date_to, date_str)
+        seconds = time.perf_counter() - started
+    
+    stats = fake.stats
+    unique_ids = {improved_call_logs.safe_get_attr(r, 'id', '') for r in result['fax_records']}
+    expected = fake.fax_record_count(date_str)
+    return {
+        'seconds': round(seconds, 3),
+        'requests': stats['requests'],
+        'bytes': stats['bytes'],
+        'connections': stats['connections'],
+        'mean_request_ms': round(platform.request_seconds / max(platform.requests, 1) * 1000, 2),
+        'rate_limited': stats['statuses'].get('429', 0),
+        'server_errors': sum(count for status, count in stats['statuses'].items() if status.startswith('5')),
+        'fax_records': len(unique_ids),
+        'expected_fax_records': expected,
+        'coverage': round(len(unique_ids) / expected, 4) if expected else 1.0,
+        'partial': list(platform.policy.partial_reasons)
+    }
+
+def print_results(results):
+    print(f"\n   {'Strategy':<18}{'Seconds':>9}{'Requests':>10}{'Conns':>7}{'KB':>9}{'429s':>6}{'5xx':>5}{'Faxes':>13}{'Coverage':>10}")
+    for name, r in results.items():
+        faxes = f"{r['fax_records']:,}/{r['expected_fax_records']:,}"
+        partial = '  ⚠️ partial' if r['partial'] else ''
+        print(f"   {name:<18}{r['seconds']:>9.2f}{r['requests']:>10}{r['connections']:>7}{r['bytes'] / 1024:>9,.0f}{r['rate_limited']:>6}{r['server_errors']:>5}"
+              f"{faxes:>13}{r['coverage']:>10.1%}{partial}")
+
+def print_transport_comparison(pooled, unpooled):
+    print(f"\n🔌 Transport (production strategy):")
+    for label, r in (('SDK client', unpooled), ('pooled', pooled)):
+        print(f"   {label:<12}{r['connections']:>6} connections  {r['mean_request_ms']:>8.1f} ms/request  {r['seconds']:>7.2f}s")
+    saved = unpooled['connections'] - pooled['connections']
+    latency = unpooled['mean_request_ms'] - pooled['mean_request_ms']
+    print(f"   Saved {saved} connection setups, {latency:.1f} ms per request "
+          f"({latency / unpooled['mean_request_ms']:.0%})" if unpooled['mean_request_ms'] else f"   Saved {saved} connection setups")
+
+def main():
+    args = sys.argv[1:]
+    
+    def option(name, default):
+        return args[args.index(name) + 1] if name in args else default
+    
+    rate_window = float(option('--rate-window', '3'))
+    config = {
+        'records': int(option('--records', '2000')),
+        'extensions': int(option('--extensions', '200')),
+        'seed': int(option('--seed', str(synthetic_data.DEFAULT_SEED))),
+        'fax_share': float(option('--fax-share', '0.5')),
+        'latency': float(option('--latency', '0.05')),
+        'jitter': float(option('--jitter', '0.02')),
+        # About three round trips (TCP + TLS 1.2) to a remote API
+        'connect_latency': float(option('--connect-latency', '0.03')),
+        'error_rate': float(option('--error-rate', '0')),
+        'throttle_rate': float(option('--throttle-rate', '0')),
+        'rate_limits': fake_ringcentral.scaled_rate_limits(rate_window),
+    }
+    date_str = option('--date', synthetic_data.DEFAULT_DATE)
+    deadline = float(option('--deadline', '300'))
+    selected = option('--strategies', '').split(',') if '--strategies' in args else None
+    # Span files would add I/O to the fetches being measured
+    tracing.TRACE_DIR = ''
+    
+    print("⏱️  FETCH STRATEGY BENCHMARKS (fake RingCentral)")
+    print("=" * 60)
+    print(f"   {config['records']:,} call-log records, {config['extensions']:,} extensions, "
+          f"latency {config['latency']}s (+{config['connect_latency']}s per connection), rate window {rate_window:g}s, "
+          f"errors {config['error_rate']:.0%}, injected 429s {config['throttle_rate']:.0%}")
+    
+    fake, server, server_url = fake_ringcentral.start_in_thread(config)
+    results = {}
+    try:
+        for name, func in STRATEGIES:
+            if selected and name not in selected:
+                continue
+            print(f"🔄 {name}...")
+            results[name] = run_strategy(func, fake, server_url, config['rate_limits'], date_str, deadline)
+        
+        transport = None
+        if '--no-transport' not in args:
+            print("🔄 production (SDK client)...")
+            unpooled = run_strategy(strategy_production, fake, server_url, config['rate_limits'], date_str, deadline, pooled=False)
+            pooled = results.get('production') or run_strategy(strategy_production, fake, server_url, config['rate_limits'], date_str, deadline)
+            transport = {'sdk_client': unpooled, 'pooled': pooled}
+    finally:
+        server.shutdown()
+        server.server_close()
+    
+    print_results(results)
+    if transport:
+        print_transport_comparison(transport['pooled'], transport['sdk_client'])
+    
+    os.makedirs(BENCHMARK_DIR, exist_ok=True)
+    path = os.path.join(BENCHMARK_DIR, f"fetch-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    saved_config = {key: value for key, value in config.items() if key != 'rate_limits'}
+    saved_config['rate_window'] = rate_window
+    with open(path, 'w') as f:
+        json.dump({'created_at': time.time(), 'date': date_str, 'config': saved_config, 'strategies': results,
+                   'transport': transport}, f, indent=2)
+    print(f"\n💾 Results saved: {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Columnar Export - Parquet copies of the report data for BI tools
+Writes per-extension stats and detailed call/fax logs with real types
+(timestamps, durations, dictionary-encoded strings)
+
+Layout (Hive-style partitions, so readers can prune by date):
+    exports/parquet/<dataset>/report_date=YYYY-MM-DD/part-0.parquet
+
+Rows are written sorted by extension in small row groups, so per-group
+min/max statistics also let readers skip data by extension:
+    pq.read_table('exports/parquet/call_log',
+                  filters=[('report_date', '=', '2025-11-20'), ('extension', '=', '1268')])
+"""
+
+import os
+import importlib.util
+from datetime import datetime
+from functools import lru_cache
+
+# pyarrow takes a noticeable share of startup, so it is only imported when a
+# Parquet file is actually written
+PARQUET_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+PARQUET_DIR = 'exports/parquet'
+
+# Small row groups keep extension pruning effective on large logs
+ROW_GROUP_SIZE = 10000
+
+@lru_cache(maxsize=None)
+def _arrow():
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    return pa, pq
+
+@lru_cache(maxsize=None)
+def schemas():
+    """Arrow schema of each dataset, keyed by dataset name"""
+    pa, _ = _arrow()
+    DICT_STRING = pa.dictionary(pa.int32(), pa.string())
+    TIMESTAMP = pa.timestamp('ms', tz='UTC')
+    SECONDS = pa.duration('s')
+    
+    return {
+        'extension_stats': pa.schema([
+            ('extension', DICT_STRING),
+            ('employee', DICT_STRING),
+            ('fax_sent', pa.int32()),
+            ('fax_received', pa.int32()),
+            ('total_faxes', pa.int32()),
+            ('calls_received', pa.int32()),
+            ('calls_made', pa.int32()),
+            ('total_calls', pa.int32()),
+            ('successful_calls', pa.int32()),
+            ('missed_calls', pa.int32()),
+            ('success_rate', pa.float32()),
+            ('avg_talk_time', SECONDS),
+            ('total_talk_time', SECONDS),
+        ]),
+        'call_log': pa.schema([
+            ('start_time', TIMESTAMP),
+            ('extension', DICT_STRING),
+            ('internal_user', DICT_STRING),
+            ('type', DICT_STRING),
+            ('direction', DICT_STRING),
+            ('result', DICT_STRING),
+            ('duration', SECONDS),
+            ('from_phone', pa.string()),
+            ('to_phone', pa.string()),
+            ('from_name', DICT_STRING),
+            ('to_name', DICT_STRING),
+        ]),
+        'fax_senders': pa.schema([
+            ('employee', DICT_STRING),
+            ('extension', DICT_STRING),
+            ('faxes_sent', pa.int32()),
+            ('faxes_received', pa.int32()),
+            ('total_faxes', pa.int32()),
+            ('pages', pa.int32()),
+        ]),
+        'fax_log': pa.schema([
+            ('timestamp', TIMESTAMP),
+            ('direction', DICT_STRING),
+            ('sender_name', DICT_STRING),
+            ('sender_extension', DICT_STRING),
+            ('recipient', DICT_STRING),
+            ('from_phone', pa.string()),
+            ('to_phone', pa.string()),
+            ('from_ext', DICT_STRING),
+            ('to_ext', DICT_STRING),
+            ('result', DICT_STRING),
+            ('pages', pa.int32()),
+        ]),
+    }
+
+def parse_timestamp(value):
+    """RingCentral ISO-8601 time ('2025-11-20T14:03:22.123Z') -> aware datetime, or None"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+def partition_path(dataset, date_str, parquet_dir=PARQUET_DIR):
+    """Where one day of a dataset lives"""
+    return os.path.join(parquet_dir, dataset, f"report_date={date_str}", "part-0.parquet")
+
+class ParquetStreamWriter:
+    """Write rows to a Parquet file in row groups as they arrive
+    
+    Rows are buffered per column and flushed every ROW_GROUP_SIZE rows, so
+    memory stays bounded no matter how many rows the aggregator yields. The
+    file is written under a temporary name and moved into place on close.
+    """
+    
+    def __init__(self, path, schema):
+        self.path = path
+        self.schema = schema
+        self.rows_written = 0
+        self._columns = {name: [] for name in schema.names}
+        self._buffered = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._tmp_path = f"{path}.tmp"
+        _, pq = _arrow()
+        self._writer = pq.ParquetWriter(self._tmp_path, schema, compression='zstd', use_dictionary=True)
+    
+    def write_row(self, row):
+        for name in self.schema.names:
+            self._columns[name].append(row.get(name))
+        self._buffered += 1
+        if self._buffered >= ROW_GROUP_SIZE:
+            self._flush()
+    
+    def _flush(self):
+        if not self._buffered:
+            return
+        pa, _ = _arrow()
+        arrays = []
+        for field in self.schema:
+            values = self._columns[field.name]
+            if pa.types.is_dictionary(field.type):
+                arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        self._writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self.rows_written += self._buffered
+        self._columns = {name: [] for name in self.schema.names}
+        self._buffered = 0
+    
+    def close(self):
+        self._flush()
+        self._writer.close()
+        os.replace(self._tmp_path, self.path)
+    
+    def abort(self):
+        self._writer.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+def write_extension_stats(stats_rows, date_str, parquet_dir=PARQUET_DIR):
+    """Write per-extension productivity rows (from compute_extension_stats)"""
+    path = partition_path('extension_stats', date_str, parquet_dir)
+    with ParquetStreamWriter(path, schemas()['extension_stats']) as writer:
+        for stats in stats_rows:
+            writer.write_row({
+                'extension': stats['extension_number'],
+                'employee': stats['internal_user'],
+                'fax_sent': stats['fax_sent_count'],
+                'fax_received': stats['fax_received_count'],
+                'total_faxes': stats['total_faxes'],
+                'calls_received': stats['calls_received'],
+                'calls_made': stats['calls_made'],
+                'total_calls': stats['total_calls'],
+                'successful_calls': stats['successful_calls'],
+                'missed_calls': stats['missed_calls'],
+                'success_rate': stats['success_rate'],
+                'avg_talk_time': stats['avg_duration_seconds'],
+                'total_talk_time': stats['total_duration_seconds'],
+            })
+    return path, writer.rows_written
+
+def write_call_log(grouped_records, date_str, parquet_dir=PARQUET_DIR):
+    """Write every real call/fax record, grouped and sorted by extension
+    
+    Synthetic voice rows injected from Analytics counts have no start time
+    and are not written - the stats dataset already carries those totals.
+    """
+    path = partition_path('call_log', date_str, parquet_dir)
+    with ParquetStreamWriter(path, schemas()['call_log']) as writer:
+        for group_key in sorted(grouped_records.keys()):
+            for record in grouped_records[group_key]:
+                if not record['start_time']:
+                    continue
+                writer.write_row({
+                    'start_time': parse_timestamp(record['start_time']),
+                    'extension': record['extension_number'] or None,
+                    'internal_user': record['internal_user'],
+                    'type': record['type'],
+                    'direction': record['direction'],
+                    'result': record['result'],
+                    'duration': record['duration'],
+                    'from_phone': record['from_phone'] or None,
+                    'to_phone': record['to_phone'] or None,
+                    'from_name': record['from_name'] or None,
+                    'to_name': record['to_name'] or None,
+                })
+    return path, writer.rows_written
+
+def write_fax_senders(sender_stats, date_str, parquet_dir=PARQUET_DIR):
+    """Write the 'Faxes by Sender' rows: {name: {'sent', 'received', 'extension', 'pages'}}"""
+    path = partition_path('fax_senders', date_str, parquet_dir)
+    with ParquetStreamWriter(path, schemas()['fax_senders']) as writer:
+        for sender in sorted(sender_stats.keys(), key=lambda s: (sender_stats[s]['extension'] or '~', s)):
+            stats = sender_stats[sender]
+            writer.write_row({
+                'employee': sender,
+                'extension': stats['extension'] or None,
+                'faxes_sent': stats['sent'],
+                'faxes_received': stats['received'],
+                'total_faxes': stats['sent'] + stats['received'],
+                'pages': stats.get('pages', 0),
+            })
+    return path, writer.rows_written
+
+def write_fax_log(fax_records, date_str, parquet_dir=PARQUET_DIR):
+    """Write the detailed fax log, sorted by sender extension then time"""
+    path = partition_path('fax_log', date_str, parquet_dir)
+    with ParquetStreamWriter(path, schemas()['fax_log']) as writer:
+        for record in sorted(fax_records, key=lambda r: (r['sender_extension'] or '~', r['timestamp'])):
+            writer.write_row({
+                'timestamp': parse_timestamp(record['timestamp']),
+                'direction': record['direction'],
+                'sender_name': record['sender_name'],
+                'sender_extension': record['sender_extension'] or None,
+                'recipient': record['recipient'],
+                'from_phone': record['from_phone'] or None,
+                'to_phone': record['to_phone'] or None,
+                'from_ext': record['from_ext'] or None,
+                'to_ext': record['to_ext'] or None,
+                'result': record['result'],
+                'pages': record.get('pages', 0),
+            })
+    return path, writer.rows_written
+
+def export_call_report(grouped_records, stats_rows, date_str, parquet_dir=PARQUET_DIR):
+    """Columnar copies of the call productivity report"""
+    if not PARQUET_AVAILABLE:
+        print("⚠️  pyarrow not available - skipping Parquet export")
+        return []
+    
+    print("🧱 Writing columnar (Parquet) exports...")
+    written = [write_extension_stats(stats_rows, date_str, parquet_dir), write_call_log(grouped_records, date_str, parquet_dir)]
+    for path, rows in written:
+        print(f"✅ Parquet saved: {path} ({rows} rows)")
+    return [path for path, _ in written]
+
+def export_fax_report(sender_stats, fax_records, date_str, parquet_dir=PARQUET_DIR):
+    """Columnar copies of the fax analysis report"""
+    if not PARQUET_AVAILABLE:
+        print("⚠️  pyarrow not available - skipping Parquet export")
+        return []
+    
+    print("🧱 Writing columnar (Parquet) exports...")
+    written = [write_fax_senders(sender_stats, date_str, parquet_dir), write_fax_log(fax_records, date_str, parquet_dir)]
+    for path, rows in written:
+        print(f"✅ Parquet saved: {path} ({rows} rows)")
+    return [path for path, _ in written]
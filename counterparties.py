@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Counterparties - Which outside numbers fax us, and which we fax, the most
+Counts successful faxes per external number in two SpaceSaving sketches:
+senders (inbound faxes) and recipients (outbound faxes). A sketch keeps at
+most COUNTERPARTY_CAPACITY counters however many distinct numbers a day
+has. Every number whose true count is above total / capacity is in it,
+and each count overstates the truth by at most its recorded error.
+
+Each day's sketches are saved next to the other caches. The report merges
+the last COUNTERPARTY_DAYS of them, which is also bounded by the capacity,
+into the "Top Counterparties" sheet of the fax report and the email.
+
+Numbers are normalized to E.164 once per distinct spelling (a cached
+parser), so "(317) 555-0100" and "+13175550100" count together.
+
+Settings (environment):
+    COUNTERPARTY_DAYS=30        # Days merged into the period totals
+    COUNTERPARTY_CAPACITY=200   # Counters per sketch
+    COUNTERPARTY_TOP=25         # Rows per role in the sheet
+
+Usage:
+    from counterparties import update_counterparties
+    top = update_counterparties(fax_records, date_str)   # {'senders': [...], 'recipients': [...]}
+    python counterparties.py 2025-11-20                  # Top counterparties from the saved days
+"""
+
+import os
+import sys
+import json
+import heapq
+from functools import lru_cache
+from datetime import datetime, timedelta
+
+from phone_index import normalize_e164
+
+COUNTERPARTY_DAYS = int(os.getenv('COUNTERPARTY_DAYS', '30'))
+COUNTERPARTY_CAPACITY = int(os.getenv('COUNTERPARTY_CAPACITY', '200'))
+COUNTERPARTY_TOP = int(os.getenv('COUNTERPARTY_TOP', '25'))
+
+ROLES = ('senders', 'recipients')
+
+class SpaceSaving:
+    """Top-k counter over a stream in at most `capacity` counters (Metwally et al.)
+    
+    A new key arriving when every counter is taken replaces the smallest
+    one and inherits its count, which is recorded as the key's error.
+    """
+    
+    def __init__(self, capacity=COUNTERPARTY_CAPACITY, counts=None, errors=None):
+        self.capacity = capacity
+        self.counts = dict(counts or {})
+        self.errors = dict(errors or {})
+        self._rebuild_heap()
+    
+    def _rebuild_heap(self):
+        # Lazy min-heap: entries whose count is out of date are skipped when popped
+        self._heap = [(count, key) for key, count in self.counts.items()]
+        heapq.heapify(self._heap)
+    
+    def _pop_min(self):
+        while True:
+            count, key = heapq.heappop(self._heap)
+            if self.counts.get(key) == count:
+                return count, key
+    
+    def add(self, key, weight=1):
+        if key in self.counts:
+            self.counts[key] += weight
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = weight
+            self.errors[key] = 0
+        else:
+            min_count, min_key = self._pop_min()
+            del self.counts[min_key], self.errors[min_key]
+            self.counts[key] = min_count + weight
+            self.errors[key] = min_count
+        heapq.heappush(self._heap, (self.counts[key], key))
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild_heap()
+    
+    def _floor(self):
+        # What an untracked key may have had: 0 until the sketch ever filled up
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+    
+    def merge(self, other):
+        """A sketch of both streams, still at most `capacity` counters (Agarwal et al.)"""
+        floor, other_floor = self._floor(), other._floor()
+        counts = {}
+        errors = {}
+        for key in set(self.counts) | set(other.counts):
+            counts[key] = self.counts.get(key, floor) + other.counts.get(key, other_floor)
+            errors[key] = self.errors.get(key, floor) + other.errors.get(key, other_floor)
+        kept = sorted(counts, key=lambda key: (-counts[key], key))[:self.capacity]
+        return SpaceSaving(self.capacity, {key: counts[key] for key in kept}, {key: errors[key] for key in kept})
+    
+    def top(self, n):
+        """[(key, count, error)] for the n largest guaranteed counts (count - error)
+        
+        Keys whose whole count may be inherited error are left out; on a
+        stream with no heavy hitters that is most of them.
+        """
+        keys = [key for key in self.counts if self.counts[key] > self.errors[key]]
+        keys.sort(key=lambda key: (self.errors[key] - self.counts[key], -self.counts[key], key))
+        return [(key, self.counts[key], self.errors[key]) for key in keys[:n]]
+    
+    def to_dict(self):
+        return {'capacity': self.capacity, 'counts': self.counts, 'errors': self.errors}
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['capacity'], data['counts'], data['errors'])
+
+@lru_cache(maxsize=65536)
+def canonical_number(number):
+    """E.164 form of a phone number ('' for names and empty values), parsed once per spelling"""
+    if not number or not any(c.isdigit() for c in number):
+        return ''
+    return normalize_e164(number)
+
+def counterparty_sketches(fax_records, capacity=COUNTERPARTY_CAPACITY):
+    """{'senders', 'recipients'} sketches of external numbers in extract_fax_data() rows
+    
+    Faxes between two extensions have no outside party and are skipped.
+    """
+    sketches = {role: SpaceSaving(capacity) for role in ROLES}
+    for record in fax_records:
+        if record['direction'] == 'Inbound':
+            number, internal, role = record['from_phone'], record['from_ext'], 'senders'
+        else:
+            number, internal, role = record['to_phone'], record['to_ext'], 'recipients'
+        number = canonical_number(number)
+        if number and not internal:
+            sketches[role].add(number)
+    return sketches
+
+def sketch_dir(cache_dir):
+    return os.path.join(cache_dir, 'counterparties')
+
+def save_day(sketches, date_str, cache_dir='exports/.cache'):
+    path = os.path.join(sketch_dir(cache_dir), f"{date_str}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({role: sketch.to_dict() for role, sketch in sketches.items()}, f)
+    os.replace(tmp_path, path)
+
+def load_day(date_str, cache_dir='exports/.cache'):
+    """A saved day's sketches, or None"""
+    try:
+        with open(os.path.join(sketch_dir(cache_dir), f"{date_str}.json"), 'r') as f:
+            data = json.load(f)
+        return {role: SpaceSaving.from_dict(data[role]) for role in ROLES}
+    except (OSError, ValueError, KeyError):
+        return None
+
+def merged_period(date_str, days=COUNTERPARTY_DAYS, cache_dir='exports/.cache', capacity=COUNTERPARTY_CAPACITY):
+    """Sketches of the `days` days ending on date_str, merged (days without a saved sketch are skipped)
+    
+    Returns (sketches, number of days found).
+    """
+    end = datetime.strptime(date_str, "%Y-%m-%d")
+    merged = {role: SpaceSaving(capacity) for role in ROLES}
+    found = 0
+    for offset in range(days):
+        day = load_day((end - timedelta(days=offset)).strftime("%Y-%m-%d"), cache_dir)
+        if day:
+            found += 1
+            merged = {role: merged[role].merge(day[role]) for role in ROLES}
+    return merged, found
+
+def top_rows(day, period, n=COUNTERPARTY_TOP):
+    """Rows for the sheet and email: the period's top numbers with the day's counts"""
+    rows = {}
+    for role in ROLES:
+        rows[role] = [
+            {'number': number, 'today': day[role].counts.get(number, 0), 'period': count, 'error': error}
+            for number, count, error in period[role].top(n)
+        ]
+    return rows
+
+def update_counterparties(fax_records, date_str, cache_dir='exports/.cache'):
+    """Save the day's sketches and return the top counterparties of the period ending that day"""
+    day = counterparty_sketches(fax_records)
+    save_day(day, date_str, cache_dir)
+    period, days_found = merged_period(date_str, cache_dir=cache_dir)
+    rows = top_rows(day, period)
+    rows['days'] = days_found
+    return rows
+
+def main():
+    date_str = next((a for a in sys.argv[1:] if not a.startswith('--')), datetime.now().strftime("%Y-%m-%d"))
+    period, days_found = merged_period(date_str)
+    day = load_day(date_str) or {role: SpaceSaving() for role in ROLES}
+    rows = top_rows(day, period, 10)
+    print(f"📇 TOP COUNTERPARTIES - {days_found} day(s) up to {date_str}")
+    for role in ROLES:
+        print(f"\n   {role.title():<18}{'Day':>6}{'Period':>9}{'±':>6}")
+        for row in rows[role]:
+            print(f"   {row['number']:<18}{row['today']:>6}{row['period']:>9}{row['error']:>6}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Email Outbox - Durable spool for report emails
+Messages are written to disk before sending and delivered with retries,
+so a failed send can be retried without regenerating any reports
+
+Usage:
+    python email_outbox.py              # Deliver everything that is due
+    python email_outbox.py --drain 600  # Keep retrying for up to 600 seconds
+    python email_outbox.py --watch      # Run as a background sender
+    python email_outbox.py --status     # Show queued / failed messages
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import shutil
+import threading
+from datetime import datetime
+
+OUTBOX_DIR = os.getenv('EMAIL_OUTBOX_DIR', 'outbox')
+PENDING_DIR = os.path.join(OUTBOX_DIR, 'pending')
+SENT_DIR = os.path.join(OUTBOX_DIR, 'sent')
+FAILED_DIR = os.path.join(OUTBOX_DIR, 'failed')
+
+# Retry schedule: 30s, 60s, 120s, ... capped at 30 minutes, +/- 20% jitter
+BASE_RETRY_DELAY = 30
+MAX_RETRY_DELAY = 30 * 60
+MAX_ATTEMPTS = 10
+
+# A message claimed by a sender that died is released after this long
+STALE_CLAIM_SECONDS = 60 * 60
+
+# Delivery records older than this are deleted (sent/ would grow forever)
+SENT_RETENTION_DAYS = 60
+
+def _write_json_atomic(path, data):
+    """Write JSON so readers never see a half-written file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def enqueue_message(message_path, sender_email, recipients, subject=''):
+    """Move a fully written .eml into the outbox and record its envelope
+    
+    The .eml lands first and the .json metadata last, so a message only
+    counts as queued once both are on disk.
+    """
+    os.makedirs(PENDING_DIR, exist_ok=True)
+    
+    message_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    eml_path = os.path.join(PENDING_DIR, f"{message_id}.eml")
+    shutil.move(message_path, eml_path)
+    
+    _write_json_atomic(os.path.join(PENDING_DIR, f"{message_id}.json"), {
+        'id': message_id,
+        'sender': sender_email,
+        'recipients': list(recipients),
+        'subject': subject,
+        'created_at': time.time(),
+        'attempts': 0,
+        'next_attempt_at': 0,
+        'last_error': ''
+    })
+    
+    print(f"📥 Queued email {message_id} for {len(recipients)} recipient(s)")
+    return message_id
+
+def list_messages(directory, suffix='.json'):
+    """Load message metadata from an outbox folder, oldest first"""
+    if not os.path.isdir(directory):
+        return []
+    
+    messages = []
+    for name in os.listdir(directory):
+        if name.endswith(suffix):
+            try:
+                with open(os.path.join(directory, name), 'r') as f:
+                    messages.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return sorted(messages, key=lambda m: m['created_at'])
+
+def release_stale_claims():
+    """Return messages claimed by a sender that never finished to the queue"""
+    if not os.path.isdir(PENDING_DIR):
+        return
+    
+    now = time.time()
+    for name in os.listdir(PENDING_DIR):
+        if name.endswith('.sending'):
+            path = os.path.join(PENDING_DIR, name)
+            if now - os.path.getmtime(path) > STALE_CLAIM_SECONDS:
+                os.replace(path, path[:-len('.sending')] + '.json')
+
+def prune_sent():
+    """Delete delivery records older than SENT_RETENTION_DAYS"""
+    if not os.path.isdir(SENT_DIR):
+        return
+    
+    cutoff = time.time() - SENT_RETENTION_DAYS * 86400
+    for name in os.listdir(SENT_DIR):
+        path = os.path.join(SENT_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except FileNotFoundError:
+            continue  # Another sender pruned it first
+
+def _claim(message_id):
+    """Take exclusive ownership of a queued message (rename is atomic)"""
+    meta_path = os.path.join(PENDING_DIR, f"{message_id}.json")
+    claim_path = os.path.join(PENDING_DIR, f"{message_id}.sending")
+    try:
+        os.rename(meta_path, claim_path)
+        os.utime(claim_path)
+        return claim_path
+    except FileNotFoundError:
+        return None
+
+def _is_permanent_failure(error):
+    """5xx replies will not succeed on retry; everything else is transient"""
+    import smtplib
+    
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    code = getattr(error, 'smtp_code', None)
+    return isinstance(code, int) and code >= 500
+
+def retry_delay(attempts):
+    """Jittered exponential backoff for the next delivery attempt"""
+    delay = min(BASE_RETRY_DELAY * (2 ** (attempts - 1)), MAX_RETRY_DELAY)
+    return delay * random.uniform(0.8, 1.2)
+
+def deliver_pending(password=None, server=None):
+    """Try every queued message that is due, over one SMTP session
+    
+    An already-open session can be passed in to reuse; it is left open for
+    the caller. Returns (sent, still_pending, failed) counts.
+    """
+    # Imported here so the outbox can be inspected without the SMTP helpers
+    import smtplib
+    from send_complete_reports import load_env, open_smtp_session, close_smtp_session, send_streamed_message
+    
+    load_env()
+    password = password or os.getenv('EMAIL_PASSWORD')
+    release_stale_claims()
+    prune_sent()
+    
+    now = time.time()
+    due = [m for m in list_messages(PENDING_DIR) if m['next_attempt_at'] <= now]
+    sent = failed = 0
+    
+    if due and not password:
+        print("❌ Error: EMAIL_PASSWORD environment variable not set")
+        return 0, len(list_messages(PENDING_DIR)), 0
+    
+    shared_server = server
+    try:
+        for meta in due:
+            claim_path = _claim(meta['id'])
+            if not claim_path:
+                continue  # Another sender has it
+            
+            eml_path = os.path.join(PENDING_DIR, f"{meta['id']}.eml")
+            meta['attempts'] += 1
+            
+            try:
+                if server is None:
+                    server = open_smtp_session(meta['sender'], password)
+                send_streamed_message(server, meta['sender'], meta['recipients'], eml_path)
+                
+                os.makedirs(SENT_DIR, exist_ok=True)
+                meta['sent_at'] = time.time()
+                meta['last_error'] = ''
+                # Only the envelope is kept as a delivery record
+                os.remove(eml_path)
+                _write_json_atomic(os.path.join(SENT_DIR, f"{meta['id']}.json"), meta)
+                os.remove(claim_path)
+                sent += 1
+                print(f"✅ Delivered {meta['id']} (attempt {meta['attempts']})")
+            
+            except Exception as e:
+                meta['last_error'] = str(e)
+                
+                # A dropped or broken session is reopened for the next message
+                if server is not None and not isinstance(e, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)):
+                    if server is not shared_server:
+                        close_smtp_session(server)
+                    server = None
+                
+                if _is_permanent_failure(e) or meta['attempts'] >= MAX_ATTEMPTS:
+                    os.makedirs(FAILED_DIR, exist_ok=True)
+                    os.replace(eml_path, os.path.join(FAILED_DIR, f"{meta['id']}.eml"))
+                    _write_json_atomic(os.path.join(FAILED_DIR, f"{meta['id']}.json"), meta)
+                    os.remove(claim_path)
+                    failed += 1
+                    print(f"❌ Giving up on {meta['id']} after {meta['attempts']} attempt(s): {e}")
+                else:
+                    delay = retry_delay(meta['attempts'])
+                    meta['next_attempt_at'] = time.time() + delay
+                    _write_json_atomic(claim_path, meta)
+                    os.replace(claim_path, os.path.join(PENDING_DIR, f"{meta['id']}.json"))
+                    print(f"⏳ Delivery of {meta['id']} failed ({e}), retrying in {int(delay)}s")
+    finally:
+        if server is not None and server is not shared_server:
+            close_smtp_session(server)
+    
+    return sent, len(list_messages(PENDING_DIR)), failed
+
+def drain_outbox(timeout, password=None):
+    """Keep delivering until the outbox is empty or the timeout passes"""
+    deadline = time.time() + timeout
+    
+    while True:
+        sent, pending, failed = deliver_pending(password)
+        if not pending:
+            return True
+        
+        # Another sender may have taken the rest since deliver_pending() counted it
+        next_due = min((m['next_attempt_at'] for m in list_messages(PENDING_DIR)), default=None)
+        if next_due is None:
+            continue
+        wait = max(1, next_due - time.time())
+        if time.time() + wait > deadline:
+            return False
+        time.sleep(wait)
+
+def start_background_sender(timeout, password=None):
+    """Deliver queued messages on a background thread
+    
+    Returns the thread; join() it to wait for the outbox to drain.
+    """
+    thread = threading.Thread(
+        target=drain_outbox,
+        args=(timeout, password),
+        name='email-outbox-sender',
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+def print_status():
+    """Show what is waiting in the outbox"""
+    pending = list_messages(PENDING_DIR) + list_messages(PENDING_DIR, '.sending')
+    failed = list_messages(FAILED_DIR)
+    
+    print(f"📬 Outbox: {OUTBOX_DIR}")
+    print(f"   Pending: {len(pending)}")
+    for meta in pending:
+        due = datetime.fromtimestamp(meta['next_attempt_at']).strftime('%Y-%m-%d %H:%M:%S') if meta['next_attempt_at'] else 'now'
+        print(f"   • {meta['id']} → {', '.join(meta['recipients'])} (attempts: {meta['attempts']}, next: {due})")
+        if meta['last_error']:
+            print(f"     last error: {meta['last_error']}")
+    print(f"   Failed: {len(failed)}")
+    for meta in failed:
+        print(f"   • {meta['id']} → {', '.join(meta['recipients'])}: {meta['last_error']}")
+
+def main():
+    print("📬 EMAIL OUTBOX SENDER")
+    print("=" * 60)
+    
+    if '--status' in sys.argv:
+        print_status()
+        return
+    
+    if '--watch' in sys.argv:
+        print("👀 Watching outbox for new messages (Ctrl+C to stop)...")
+        try:
+            while True:
+                deliver_pending()
+                time.sleep(15)
+        except KeyboardInterrupt:
+            print("\n👋 Stopped")
+        return
+    
+    if '--drain' in sys.argv:
+        index = sys.argv.index('--drain')
+        timeout = int(sys.argv[index + 1]) if len(sys.argv) > index + 1 else 600
+        if drain_outbox(timeout):
+            print("✅ Outbox is empty - all emails delivered")
+        else:
+            print("⚠️  Some emails are still queued - see: python email_outbox.py --status")
+            sys.exit(1)
+        return
+    
+    sent, pending, failed = deliver_pending()
+    print(f"\n📊 Sent: {sent}, still queued: {pending}, failed: {failed}")
+    if pending or failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
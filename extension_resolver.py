@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Extension Resolver - Names and numbers for extensions missing from the directory
+fetch_extensions_directory() only loads Enabled extensions, so calls and
+faxes of staff who have left (or of disabled devices) come out as
+"Unknown Extension" or "Extension N". This collects the extension ids the
+directory cannot fill in, looks them up with multi-id extension GETs (30
+ids per request) and remembers the answers - found or not found - in a
+cache file, so each id costs one lookup across all runs.
+
+Lookups are coalesced: an id another thread is already fetching (report
+service requests, multi-account workers) is waited for, not fetched again.
+
+Settings (environment):
+    EXTENSION_BATCH_SIZE=30                            # Ids per request (API maximum)
+    EXTENSION_CACHE=exports/.cache/extensions.json     # Empty to turn the cache off
+
+Usage:
+    from extension_resolver import resolve_directory
+    extensions_directory = resolve_directory(platform, records, extensions_directory)
+"""
+
+import os
+import json
+import time
+import threading
+
+from tracing import span
+from retry_policy import BudgetExhausted, CircuitOpen, http_status, policy_for
+
+EXTENSION_PATH = "/restapi/v1.0/account/~/extension/{ids}"
+EXTENSION_BATCH_SIZE = min(int(os.getenv('EXTENSION_BATCH_SIZE', '30')), 30)
+EXTENSION_CACHE_FILE = os.getenv('EXTENSION_CACHE', 'exports/.cache/extensions.json')
+# Found extensions are looked up again after a month (renames); ids the
+# account does not know after a week
+FOUND_TTL_DAYS = 30
+NOT_FOUND_TTL_DAYS = 7
+# How long to wait for another thread's lookup of the same ids
+COALESCE_WAIT_SECONDS = 60
+
+_cache = None
+_inflight = {}  # {extension id: threading.Event set when its lookup finished}
+_lock = threading.Lock()
+
+def _load_cache():
+    global _cache
+    if _cache is None:
+        _cache = {}
+        if EXTENSION_CACHE_FILE and os.path.exists(EXTENSION_CACHE_FILE):
+            try:
+                with open(EXTENSION_CACHE_FILE, 'r') as f:
+                    _cache = json.load(f)
+            except (OSError, ValueError):
+                _cache = {}
+    return _cache
+
+def _save_cache():
+    if not EXTENSION_CACHE_FILE:
+        return
+    os.makedirs(os.path.dirname(EXTENSION_CACHE_FILE) or '.', exist_ok=True)
+    tmp_path = f"{EXTENSION_CACHE_FILE}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(_cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, EXTENSION_CACHE_FILE)
+
+def _is_fresh(entry):
+    ttl_days = FOUND_TTL_DAYS if entry['found'] else NOT_FOUND_TTL_DAYS
+    return time.time() - entry['checked_at'] < ttl_days * 86400
+
+def directory_entry(ext):
+    """{extensionNumber, name} for an extension record, named like fetch_extensions_directory()"""
+    ext_number = str(ext.get('extensionNumber') or '')
+    contact = ext.get('contact') or {}
+    name = f"{contact.get('firstName', '')} {contact.get('lastName', '')}".strip()
+    return {'extensionNumber': ext_number, 'name': name or ext.get('name') or f"Extension {ext_number}"}
+
+def _first_party(value):
+    if isinstance(value, list):
+        value = value[0] if value else {}
+    return value if isinstance(value, dict) else {}
+
+def unresolved_extension_ids(records, extensions_directory):
+    """Extension ids on records whose name or number only the directory could supply, but doesn't
+    
+    Looks at the same from/to parties extract_call_data() and
+    extract_fax_data() read; parties that carry both their name and
+    extension number are left alone.
+    """
+    ext_ids = {}
+    for record in records:
+        for key in ('from_', 'to'):
+            party = _first_party(record.get(key))
+            ext_id = str(party.get('extensionId') or '')
+            if ext_id and ext_id not in extensions_directory and not (party.get('name') and party.get('extensionNumber')):
+                ext_ids[ext_id] = None
+    return list(ext_ids)
+
+def fetch_extensions(platform, ext_ids, found=None, missing=None):
+    """Look up extension ids, EXTENSION_BATCH_SIZE per request
+    
+    Fills found ({id: directory entry}) and missing (ids the account does
+    not have); pass your own to keep the batches that arrived before an error.
+    """
+    found = {} if found is None else found
+    missing = set() if missing is None else missing
+    for start in range(0, len(ext_ids), EXTENSION_BATCH_SIZE):
+        batch = ext_ids[start:start + EXTENSION_BATCH_SIZE]
+        with span('extensions.batch', extensions=len(batch)):
+            try:
+                response = platform.get(EXTENSION_PATH.format(ids=','.join(batch)))
+            except Exception as e:
+                # A single-id GET answers a 404 with an error, not a part
+                if len(batch) == 1 and http_status(e) == 404:
+                    missing.add(batch[0])
+                    continue
+                raise
+            parts = [response] if len(batch) == 1 else response.multipart()
+        
+        for ext_id, part in zip(batch, parts):
+            if part.ok():
+                found[ext_id] = directory_entry(part.json_dict())
+            elif part.response().status_code == 404:
+                missing.add(ext_id)
+    return found, missing
+
+def resolve_extension_ids(platform, ext_ids):
+    """{extension id: {extensionNumber, name}} for the ids the account knows
+    
+    Cached answers are used while fresh; every other id is fetched at most
+    once, however many records or threads ask for it.
+    """
+    resolved = {}
+    to_fetch = []
+    waiting = []
+    
+    with _lock:
+        cache = _load_cache()
+        for ext_id in dict.fromkeys(ext_ids):
+            entry = cache.get(ext_id)
+            if entry and _is_fresh(entry):
+                if entry['found']:
+                    resolved[ext_id] = entry['extension']
+            elif ext_id in _inflight:
+                waiting.append((ext_id, _inflight[ext_id]))
+            else:
+                _inflight[ext_id] = threading.Event()
+                to_fetch.append(ext_id)
+    
+    if to_fetch:
+        print(f"🔎 Looking up {len(to_fetch)} extensions missing from the directory...")
+        found, missing = {}, set()
+        try:
+            fetch_extensions(platform, to_fetch, found, missing)
+        except (BudgetExhausted, CircuitOpen) as e:
+            policy_for(platform).mark_partial(f"extension lookups stopped after {len(found) + len(missing)} of {len(to_fetch)}: {e}")
+        except Exception as e:
+            # Retryable errors were already retried by the platform's retry policy
+            print(f"⚠️  Warning: Could not look up extensions: {e}")
+        finally:
+            with _lock:
+                now = time.time()
+                for ext_id, extension in found.items():
+                    _cache[ext_id] = {'found': True, 'extension': extension, 'checked_at': now}
+                for ext_id in missing:
+                    _cache[ext_id] = {'found': False, 'checked_at': now}
+                if found or missing:
+                    _save_cache()
+                for ext_id in to_fetch:
+                    _inflight.pop(ext_id).set()
+        resolved.update(found)
+        print(f"✅ Resolved {len(found)} extensions ({len(missing)} unknown to the account)")
+    
+    for ext_id, done in waiting:
+        done.wait(COALESCE_WAIT_SECONDS)
+        with _lock:
+            entry = _cache.get(ext_id)
+        if entry and entry['found']:
+            resolved[ext_id] = entry['extension']
+    
+    return resolved
+
+def resolve_directory(platform, records, extensions_directory):
+    """The directory plus every extension the records need that it lacked"""
+    ext_ids = unresolved_extension_ids(records, extensions_directory)
+    if not ext_ids:
+        return extensions_directory
+    return dict(extensions_directory, **resolve_extension_ids(platform, ext_ids))
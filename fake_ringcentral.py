@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""
+Fake RingCentral - A local stand-in for the API endpoints the reports use
+Serves synthetic_data.py payloads for:
+    POST /restapi/oauth/token                             # JWT login (any assertion)
+    GET  /restapi/v1.0/account/~/extension                # Paged directory, ?status=Enabled
+    GET  /restapi/v1.0/account/~/extension/<id>[,<id>...]                      # Batched
+    GET  /restapi/v1.0/account/~/phone-number             # Paged number inventory
+    GET  /restapi/v1.0/account/~/call-log                 # dateFrom/dateTo/type/page/perPage/view
+    GET  /restapi/v1.0/account/~/extension/<id>/message-store/<id>[,<id>...]   # Fax messages, batched
+    POST /analytics/calls/v1/accounts/~/aggregation/fetch
+    POST /analytics/calls/v1/accounts/~/timeline/fetch    # ?interval=Hour|Day
+with configurable volume, latency, usage-plan rate limits (X-Rate-Limit-*
+headers, 429 + Retry-After when a window is used up) and randomly
+injected 429s and 5xx errors. Call-log records come in the Simple or
+Detailed (with legs and billing) shape, multi-id message-store GETs
+answer multipart/mixed like the real API, and responses are gzipped when
+the client accepts it. Requests are counted per endpoint and status,
+along with response bytes as sent and client connections opened.
+
+Usage:
+    python fake_ringcentral.py                              # http://127.0.0.1:8790
+    python fake_ringcentral.py --records 50000 --extensions 2000 --latency 0.2 --connect-latency 0.05
+    python fake_ringcentral.py --error-rate 0.05 --throttle-rate 0.02 --rate-window 6
+    RINGCENTRAL_SERVER_URL=http://127.0.0.1:8790 python improved_call_logs.py
+    
+    curl http://127.0.0.1:8790/_fake/stats                  # Requests served so far
+    curl -X POST http://127.0.0.1:8790/_fake/reset          # Zero the counters and rate windows
+"""
+
+import sys
+import gzip
+import json
+import uuid
+import math
+import time
+import random
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import synthetic_data
+from rate_budget import DEFAULT_RATE_LIMITS, endpoint_group
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8790
+
+DEFAULT_CONFIG = {
+    'records': 2000,          # Call-log records per day (all types)
+    'extensions': 200,
+    'seed': synthetic_data.DEFAULT_SEED,
+    'fax_share': 0.5,
+    'latency': 0.05,          # Seconds added to every API response
+    'jitter': 0.02,           # Plus up to this much at random
+    'connect_latency': 0.0,   # Seconds added to each new connection (TCP + TLS handshake)
+    'error_rate': 0.0,        # Share of API requests answered with a 5xx
+    'throttle_rate': 0.0,     # Share of API requests answered with a 429
+    'rate_limits': DEFAULT_RATE_LIMITS,
+    'enforce_rate_limits': True,
+    'verbose': False,
+}
+
+MAX_PER_PAGE = 1000
+INJECTED_RETRY_AFTER = 1
+# Smaller responses are sent uncompressed
+GZIP_MIN_BYTES = 1024
+
+# Ids one multi-id GET may ask for
+MAX_BATCH_IDS = 30
+
+# Record fields the real API only returns with view=Detailed
+DETAILED_ONLY_FIELDS = ('transport', 'lastModifiedTime')
+
+def scaled_rate_limits(window, limits=DEFAULT_RATE_LIMITS):
+    """The usage-plan limits with every window shortened to `window` seconds
+    
+    Keeps the request counts, so a benchmark sees the same pacing pattern
+    in a fraction of the time. Pass the same limits to the client's
+    RateBudget.
+    """
+    return {group: {'requests': limit['requests'], 'window': window} for group, limit in limits.items()}
+
+def _dates_between(date_from, date_to):
+    """YYYY-MM-DD days touched by a dateFrom/dateTo range"""
+    first = datetime.strptime(date_from[:10], "%Y-%m-%d")
+    last = datetime.strptime(date_to[:10], "%Y-%m-%d")
+    days = []
+    while first <= last and len(days) < 31:
+        days.append(first.strftime("%Y-%m-%d"))
+        first += timedelta(days=1)
+    return days
+
+class FakeRingCentral:
+    """Data, rate-limit windows and request counters behind the fake server"""
+    
+    def __init__(self, config=None):
+        self.config = dict(DEFAULT_CONFIG)
+        self.config.update(config or {})
+        self.extensions = synthetic_data.extension_records(self.config['extensions'], self.config['seed'])
+        self._extensions_by_id = {str(ext['id']): ext for ext in self.extensions}
+        self.phone_numbers = synthetic_data.phone_number_records(self.extensions)
+        self._call_logs = {}
+        self._messages = {}
+        self._lock = threading.Lock()
+        self._rng = random.Random(f"{self.config['seed']}-server")
+        self.reset()
+    
+    def reset(self):
+        with self._lock:
+            self._windows = {group: deque() for group in self.config['rate_limits']}
+            self.stats = {'requests': 0, 'connections': 0, 'bytes': 0, 'endpoints': {}, 'statuses': {}, 'injected': {'429': 0, '5xx': 0}}
+    
+    def call_log(self, date_str):
+        """All call-log records for one day, newest first (generated once)"""
+        with self._lock:
+            if date_str not in self._call_logs:
+                self._call_logs[date_str] = synthetic_data.call_log_records(
+                    self.config['records'], self.extensions, date_str, self.config['seed'], self.config['fax_share']
+                )
+                for record in self._call_logs[date_str]:
+                    if 'message' in record:
+                        self._messages[record['message']['id']] = record
+            return self._call_logs[date_str]
+    
+    def message(self, mailbox, message_id):
+        """The message-store fax message, or None (unknown id or another mailbox)"""
+        # Message ids start with the day's date (see synthetic_data.py)
+        try:
+            self.call_log(datetime.strptime(message_id[:8], "%Y%m%d").strftime("%Y-%m-%d"))
+        except ValueError:
+            return None
+        record = self._messages.get(message_id)
+        if not record:
+            return None
+        message = synthetic_data.fax_message(record, self._extensions_by_id)
+        if mailbox not in ('~', message['uri'].split('/extension/')[1].split('/')[0]):
+            return None
+        return message
+    
+    def fax_record_count(self, date_str):
+        """How many fax records a complete fetch of the day should return"""
+        return sum(1 for record in self.call_log(date_str) if record['type'] == 'Fax')
+    
+    def _count(self, endpoint, status):
+        with self._lock:
+            self.stats['requests'] += 1
+            counts = self.stats['endpoints'].setdefault(endpoint, {})
+            counts[str(status)] = counts.get(str(status), 0) + 1
+            self.stats['statuses'][str(status)] = self.stats['statuses'].get(str(status), 0) + 1
+    
+    def _take_rate_limit(self, usage_group):
+        """(headers, retry_after or None) for one request in a usage group"""
+        limit = self.config['rate_limits'].get(usage_group)
+        if not limit:
+            return {}, None
+        with self._lock:
+            window = self._windows.setdefault(usage_group, deque())
+            now = time.time()
+            while window and window[0] <= now - limit['window']:
+                window.popleft()
+            retry_after = None
+            if self.config['enforce_rate_limits'] and len(window) >= limit['requests']:
+                retry_after = max(1, math.ceil(window[0] + limit['window'] - now))
+            else:
+                window.append(now)
+            headers = {
+                'X-Rate-Limit-Group': usage_group.capitalize(),
+                'X-Rate-Limit-Limit': str(limit['requests']),
+                'X-Rate-Limit-Remaining': str(max(0, limit['requests'] - len(window))),
+                'X-Rate-Limit-Window': str(math.ceil(limit['window']))
+            }
+        return headers, retry_after
+    
+    def count_bytes(self, size):
+        with self._lock:
+            self.stats['bytes'] += size
+    
+    def count_connection(self):
+        with self._lock:
+            self.stats['connections'] += 1
+    
+    def _roll(self):
+        with self._lock:
+            return self._rng.random(), self._rng.random()
+    
+    def handle(self, method, path, query, body, authorization):
+        """(status, payload, headers) for one API request"""
+        group, usage_group = endpoint_group(path)
+        endpoint = f"{method} {group}"
+        
+        if group != 'auth' and not authorization.lower().startswith('bearer '):
+            self._count(endpoint, 401)
+            return 401, {'errorCode': 'AGW-401', 'message': 'Authorization header is not specified'}, {}
+        
+        latency = self.config['latency'] + self._roll()[0] * self.config['jitter']
+        if latency > 0:
+            time.sleep(latency)
+        
+        headers, retry_after = self._take_rate_limit(usage_group)
+        if retry_after is not None:
+            self._count(endpoint, 429)
+            headers['Retry-After'] = str(retry_after)
+            return 429, {'errorCode': 'CMN-301', 'message': 'Request rate exceeded'}, headers
+        
+        if group != 'auth':
+            throttle_roll, error_roll = self._roll()
+            if throttle_roll < self.config['throttle_rate']:
+                with self._lock:
+                    self.stats['injected']['429'] += 1
+                self._count(endpoint, 429)
+                headers['Retry-After'] = str(INJECTED_RETRY_AFTER)
+                return 429, {'errorCode': 'CMN-301', 'message': 'Request rate exceeded'}, headers
+            if error_roll < self.config['error_rate']:
+                with self._lock:
+                    self.stats['injected']['5xx'] += 1
+                    status = self._rng.choice([500, 502, 503])
+                self._count(endpoint, status)
+                return status, {'errorCode': 'CMN-211', 'message': 'Service temporarily unavailable'}, headers
+        
+        try:
+            status, payload = self._route(method, path, query, body)
+        except ValueError as e:
+            status, payload = 400, {'errorCode': 'CMN-101', 'message': str(e)}
+        self._count(endpoint, status)
+        return status, payload, headers
+    
+    def _route(self, method, path, query, body):
+        if method == 'POST' and path == '/restapi/oauth/token':
+            return 200, self._token()
+        if method == 'POST' and path == '/restapi/oauth/revoke':
+            return 200, {}
+        if method == 'GET' and path.endswith('/account/~/extension'):
+            status = query.get('status')
+            extensions = [ext for ext in self.extensions if not status or ext['status'] == status]
+            return 200, self._paged(path, query, extensions, 100)
+        if method == 'GET' and path.endswith('/account/~/phone-number'):
+            return 200, self._paged(path, query, self.phone_numbers, 100)
+        if method == 'GET' and '/message-store/' in path:
+            mailbox = path.split('/extension/')[1].split('/')[0]
+            return self._batch(path, lambda message_id: self.message(mailbox, message_id),
+                               lambda message_id: {'errorCode': 'MSG-333', 'message': f"Message [{message_id}] is not found"})
+        if method == 'GET' and '/account/~/extension/' in path:
+            return self._batch(path, self._extensions_by_id.get,
+                               lambda ext_id: {'errorCode': 'CMN-102', 'message': 'Resource for parameter [extensionId] is not found'})
+        if method == 'GET' and path.endswith('/account/~/call-log'):
+            view = query.get('view', 'Simple')
+            if view not in ('Simple', 'Detailed'):
+                raise ValueError(f"view {view} is not supported (Simple or Detailed)")
+            payload = self._paged(path, query, self._call_log_matching(query), 100)
+            payload['records'] = [call_log_view(record, view) for record in payload['records']]
+            return 200, payload
+        if method == 'POST' and path.endswith('/aggregation/fetch'):
+            payload = synthetic_data.analytics_payload(self.extensions, self._analytics_date(body), self.config['seed'])
+            return 200, self._analytics_page(payload, query)
+        if method == 'POST' and path.endswith('/timeline/fetch'):
+            interval = query.get('interval', 'Hour')
+            if interval not in ('Hour', 'Day'):
+                raise ValueError(f"interval {interval} is not supported here (Hour or Day)")
+            payload = synthetic_data.analytics_timeline_payload(
+                self.extensions, self._analytics_date(body), self.config['seed'], 1 if interval == 'Hour' else 24
+            )
+            return 200, self._analytics_page(payload, query)
+        return 404, {'errorCode': 'CMN-102', 'message': f"Resource not found: {method} {path}"}
+    
+    def _token(self):
+        return {
+            'access_token': f"fake-{self._roll()[0]:.12f}",
+            'token_type': 'bearer',
+            'expires_in': 3600,
+            'refresh_token': 'fake-refresh',
+            'refresh_token_expires_in': 604800,
+            'scope': 'ReadAccounts ReadCallLog Analytics',
+            'owner_id': '63672470031'
+        }
+    
+    def _batch(self, path, lookup, not_found):
+        """One resource for a single id; 207 multipart for a comma-separated list"""
+        ids = [item_id for item_id in path.rsplit('/', 1)[-1].split(',') if item_id]
+        if len(ids) > MAX_BATCH_IDS:
+            raise ValueError(f"at most {MAX_BATCH_IDS} ids per request")
+        
+        parts = []
+        for item_id in ids:
+            item = lookup(item_id)
+            parts.append((200, item) if item else (404, not_found(item_id)))
+        if len(parts) == 1:
+            return parts[0]
+        return 207, BatchResponse(parts)
+    
+    def _call_log_matching(self, query):
+        date_from = query.get('dateFrom') or f"{synthetic_data.DEFAULT_DATE}T00:00:00.000Z"
+        date_to = query.get('dateTo') or f"{date_from[:10]}T23:59:59.999Z"
+        call_type = query.get('type')
+        matching = []
+        for date_str in reversed(_dates_between(date_from, date_to)):
+            for record in self.call_log(date_str):
+                if date_from <= record['startTime'] <= date_to and (not call_type or record['type'] == call_type):
+                    matching.append(record)
+        return matching
+    
+    def _paged(self, path, query, records, default_per_page):
+        page = int(query.get('page', 1))
+        per_page = min(int(query.get('perPage', default_per_page)), MAX_PER_PAGE)
+        if page < 1 or per_page < 1:
+            raise ValueError('page and perPage must be positive')
+        total_pages = max(1, math.ceil(len(records) / per_page))
+        start = (page - 1) * per_page
+        chunk = records[start:start + per_page]
+        
+        def page_uri(number):
+            return {'uri': f"{path}?page={number}&perPage={per_page}"}
+        
+        paging = {'page': page, 'perPage': per_page, 'totalPages': total_pages, 'totalElements': len(records)}
+        if chunk:
+            paging.update({'pageStart': start, 'pageEnd': start + len(chunk) - 1})
+        navigation = {'firstPage': page_uri(1), 'lastPage': page_uri(total_pages)}
+        if page < total_pages:
+            navigation['nextPage'] = page_uri(page + 1)
+        if page > 1:
+            navigation['previousPage'] = page_uri(page - 1)
+        return {'uri': path, 'records': chunk, 'paging': paging, 'navigation': navigation}
+    
+    def _analytics_date(self, body):
+        try:
+            return body['timeSettings']['timeRange']['timeFrom'][:10]
+        except (KeyError, TypeError):
+            raise ValueError('timeSettings.timeRange.timeFrom is required')
+    
+    def _analytics_page(self, payload, query):
+        records = payload['data']['records']
+        page = int(query.get('page', 1))
+        per_page = int(query.get('perPage', 100))
+        total_pages = max(1, math.ceil(len(records) / per_page))
+        payload['data']['records'] = records[(page - 1) * per_page:page * per_page]
+        payload['paging'] = {'page': page, 'perPage': per_page, 'pageCount': len(payload['data']['records']),
+                             'totalPageCount': total_pages, 'totalElementCount': len(records)}
+        return payload
+
+class BatchResponse:
+    """Multi-id GET result, sent as multipart/mixed like the real API
+    
+    The first part lists each id's status, then one JSON part per id.
+    """
+    
+    def __init__(self, parts):
+        self.parts = parts
+    
+    def encode(self):
+        boundary = f"Boundary_{uuid.uuid4().hex}"
+        statuses = {'response': [{'status': status} for status, _ in self.parts]}
+        chunks = []
+        for payload in [statuses] + [payload for _, payload in self.parts]:
+            chunks.append(f"--{boundary}\r\nContent-Type: application/json\r\n\r\n{json.dumps(payload)}\r\n")
+        body = ''.join(chunks) + f"--{boundary}--\r\n"
+        return body.encode('utf-8'), f"multipart/mixed; boundary={boundary}"
+
+def call_log_view(record, view):
+    """A synthetic (Detailed-shaped) record as the API returns it for `view`"""
+    if view != 'Detailed':
+        return {key: value for key, value in record.items() if key not in DETAILED_ONLY_FIELDS}
+    
+    # One leg per record, repeating the call's parties and outcome, as the real API does
+    leg = {key: record[key] for key in ('startTime', 'duration', 'type', 'direction', 'action', 'result', 'from', 'to', 'transport')}
+    internal = record['from'] if record['direction'] == 'Outbound' else record['to']
+    leg['legType'] = 'FaxSending' if record['type'] == 'Fax' and record['direction'] == 'Outbound' else 'Accept'
+    leg['extension'] = {
+        'uri': f"https://platform.ringcentral.com/restapi/v1.0/account/~/extension/{internal.get('extensionId', '')}",
+        'id': internal.get('extensionId', '')
+    }
+    detailed = dict(record)
+    detailed['legs'] = [leg]
+    detailed['billing'] = {'costIncluded': 0.0, 'costPurchased': 0.0}
+    return detailed
+
+def make_handler(fake):
+    """HTTP request handler bound to one FakeRingCentral"""
+    
+    class FakeRequestHandler(BaseHTTPRequestHandler):
+        # Keep-alive, like the real API
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out as separate writes; without TCP_NODELAY a
+        # kept-alive connection waits on delayed ACKs between them
+        disable_nagle_algorithm = True
+        
+        def setup(self):
+            super().setup()
+            fake.count_connection()
+            # Stands in for the handshake round trips a remote HTTPS API costs
+            if fake.config['connect_latency'] > 0:
+                time.sleep(fake.config['connect_latency'])
+        
+        def _send_json(self, status, payload, headers=None):
+            content_type = 'application/json'
+            if isinstance(payload, BatchResponse):
+                body, content_type = payload.encode()
+            else:
+                body = json.dumps(payload).encode('utf-8')
+            compress = len(body) >= GZIP_MIN_BYTES and 'gzip' in (self.headers.get('Accept-Encoding') or '')
+            if compress:
+                body = gzip.compress(body, compresslevel=6)
+            fake.count_bytes(len(body))
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            if compress:
+                self.send_header('Content-Encoding', 'gzip')
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def _dispatch(self, method):
+            url = urlparse(self.path)
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            length = int(self.headers.get('Content-Length') or 0)
+            raw = self.rfile.read(length) if length else b''
+            
+            if url.path == '/_fake/stats':
+                self._send_json(200, fake.stats)
+                return
+            if url.path == '/_fake/reset':
+                fake.reset()
+                self._send_json(200, {'reset': True})
+                return
+            
+            body = None
+            if raw and 'json' in (self.headers.get('Content-Type') or ''):
+                try:
+                    body = json.loads(raw)
+                except ValueError:
+                    self._send_json(400, {'errorCode': 'CMN-101', 'message': 'Malformed JSON body'})
+                    return
+            
+            status, payload, headers = fake.handle(method, url.path, query, body, self.headers.get('Authorization') or '')
+            self._send_json(status, payload, headers)
+        
+        def do_GET(self):
+            self._dispatch('GET')
+        
+        def do_POST(self):
+            self._dispatch('POST')
+        
+        def log_message(self, format, *args):
+            if fake.config['verbose']:
+                print(f"🌐 {format % args}")
+    
+    return FakeRequestHandler
+
+def create_server(fake, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """The HTTP server and its base URL (port 0 picks a free port)"""
+    server = ThreadingHTTPServer((host, port), make_handler(fake))
+    server.daemon_threads = True
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def start_in_thread(config=None, host=DEFAULT_HOST, port=0):
+    """Serve a FakeRingCentral in the background; returns (fake, server, url)"""
+    fake = FakeRingCentral(config)
+    server, url = create_server(fake, host, port)
+    threading.Thread(target=server.serve_forever, name='fake-ringcentral', daemon=True).start()
+    return fake, server, url
+
+def _arg(name, default):
+    if name in sys.argv:
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
+def main():
+    config = {
+        'records': int(_arg('--records', DEFAULT_CONFIG['records'])),
+        'extensions': int(_arg('--extensions', DEFAULT_CONFIG['extensions'])),
+        'seed': int(_arg('--seed', DEFAULT_CONFIG['seed'])),
+        'fax_share': float(_arg('--fax-share', DEFAULT_CONFIG['fax_share'])),
+        'latency': float(_arg('--latency', DEFAULT_CONFIG['latency'])),
+        'jitter': float(_arg('--jitter', DEFAULT_CONFIG['jitter'])),
+        'connect_latency': float(_arg('--connect-latency', DEFAULT_CONFIG['connect_latency'])),
+        'error_rate': float(_arg('--error-rate', DEFAULT_CONFIG['error_rate'])),
+        'throttle_rate': float(_arg('--throttle-rate', DEFAULT_CONFIG['throttle_rate'])),
+        'enforce_rate_limits': '--no-rate-limits' not in sys.argv,
+        'verbose': '--verbose' in sys.argv,
+    }
+    if '--rate-window' in sys.argv:
+        config['rate_limits'] = scaled_rate_limits(float(_arg('--rate-window', 60)))
+    port = int(_arg('--port', DEFAULT_PORT))
+    
+    print("🧪 FAKE RINGCENTRAL API")
+    print("=" * 60)
+    print(f"   {config['records']:,} call-log records/day, {config['extensions']:,} extensions, seed {config['seed']}")
+    print(f"   Latency {config['latency']}s (+{config['jitter']}s), errors {config['error_rate']:.0%}, "
+          f"injected 429s {config['throttle_rate']:.0%}, rate limits {'on' if config['enforce_rate_limits'] else 'off'}")
+    
+    fake = FakeRingCentral(config)
+    server, url = create_server(fake, DEFAULT_HOST, port)
+    print(f"🚀 Serving on {url} (Ctrl+C to stop)")
+    print(f"   RINGCENTRAL_SERVER_URL={url}")
+    
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n👋 Stopped after {fake.stats['requests']} requests")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
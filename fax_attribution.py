@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Fax Attribution - Credit main fax line faxes to the employees who sent them
+The call log only names the main fax line (ext 9) as the sender of faxes
+sent through it, so the fax report used to count them all as "Main Fax".
+The message-store message behind each fax record knows the real sender,
+the page count and the final status. This fetches those messages with
+multi-id GETs (up to 30 ids per request, one mailbox at a time) and
+caches them by message id, so a day's attribution costs a few requests
+and a rerun costs none.
+
+Settings (environment):
+    FAX_MESSAGE_BATCH_SIZE=30                              # Ids per request (API maximum)
+    FAX_MESSAGE_CACHE=exports/.cache/fax_messages.json     # Empty to turn the cache off
+
+Usage:
+    from fax_attribution import attribute_main_line_faxes, apply_fax_attribution
+    attributions = attribute_main_line_faxes(platform, records, extensions_directory)
+    records = apply_fax_attribution(records, attributions)
+"""
+
+import os
+import json
+import time
+import threading
+
+from tracing import span
+from retry_policy import BudgetExhausted, CircuitOpen, policy_for
+
+MAIN_FAX_EXTENSION = '9'
+MESSAGE_STORE_PATH = "/restapi/v1.0/account/~/extension/{mailbox}/message-store/{ids}"
+MESSAGE_BATCH_SIZE = min(int(os.getenv('FAX_MESSAGE_BATCH_SIZE', '30')), 30)
+MESSAGE_CACHE_FILE = os.getenv('FAX_MESSAGE_CACHE', 'exports/.cache/fax_messages.json')
+MESSAGE_CACHE_DAYS = 60
+
+# A message in one of these states will not change any more, so it is cached
+FINAL_STATUSES = frozenset(['Sent', 'Received', 'SendingFailed', 'DeliveryFailed'])
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def _load_cache():
+    global _cache
+    if _cache is None:
+        _cache = {}
+        if MESSAGE_CACHE_FILE and os.path.exists(MESSAGE_CACHE_FILE):
+            try:
+                with open(MESSAGE_CACHE_FILE, 'r') as f:
+                    _cache = json.load(f)
+            except (OSError, ValueError):
+                _cache = {}
+    return _cache
+
+def _save_cache():
+    if not MESSAGE_CACHE_FILE:
+        return
+    # Old messages never come up again
+    cutoff = time.time() - MESSAGE_CACHE_DAYS * 86400
+    for message_id in [message_id for message_id, entry in _cache.items() if entry['cached_at'] < cutoff]:
+        del _cache[message_id]
+    
+    os.makedirs(os.path.dirname(MESSAGE_CACHE_FILE) or '.', exist_ok=True)
+    tmp_path = f"{MESSAGE_CACHE_FILE}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(_cache, f)
+    os.replace(tmp_path, MESSAGE_CACHE_FILE)
+
+def _first_party(value):
+    if isinstance(value, list):
+        value = value[0] if value else {}
+    return value if isinstance(value, dict) else {}
+
+def message_ref(record):
+    """(mailbox extension id, message id) of a fax call-log record, or None"""
+    message = record.get('message') or {}
+    uri = message.get('uri') or ''
+    if not message.get('id') or '/extension/' not in uri:
+        return None
+    return uri.split('/extension/')[1].split('/')[0], str(message['id'])
+
+def main_line_ids(extensions_directory):
+    """Extension ids of the main fax line"""
+    return {ext_id for ext_id, info in extensions_directory.items() if str(info.get('extensionNumber')) == MAIN_FAX_EXTENSION}
+
+def on_main_line(record, line_ids):
+    """True when the main fax line sent or received the fax"""
+    for key in ('from_', 'to'):
+        party = _first_party(record.get(key))
+        if str(party.get('extensionNumber', '')) == MAIN_FAX_EXTENSION or str(party.get('extensionId', '')) in line_ids:
+            return True
+    return False
+
+def _summary(message):
+    """The message fields attribution needs (what gets cached)"""
+    sender = message.get('from') or {}
+    return {
+        'direction': message.get('direction', ''),
+        'status': message.get('messageStatus', ''),
+        'pages': message.get('faxPageCount') or 0,
+        'from': {key: str(sender[key]) for key in ('extensionId', 'extensionNumber', 'name') if sender.get(key)}
+    }
+
+def fetch_messages(platform, mailbox, message_ids, found=None):
+    """{message id: message summary} for ids in one mailbox, MESSAGE_BATCH_SIZE per request
+    
+    A multi-id GET answers multipart/mixed with one part per id; ids the
+    API does not know (deleted messages) are left out. Pass the same found
+    dict to keep the batches that arrived before an error.
+    """
+    found = {} if found is None else found
+    for start in range(0, len(message_ids), MESSAGE_BATCH_SIZE):
+        batch = message_ids[start:start + MESSAGE_BATCH_SIZE]
+        with span('fax_attribution.batch', messages=len(batch)):
+            response = platform.get(MESSAGE_STORE_PATH.format(mailbox=mailbox, ids=','.join(batch)))
+            parts = [response] if len(batch) == 1 else response.multipart()
+        
+        for message_id, part in zip(batch, parts):
+            if part.ok():
+                found[message_id] = _summary(part.json_dict())
+    return found
+
+def _sender(summary, mailbox, extensions_directory, line_ids):
+    """{extensionId, extensionNumber, name} of the employee who sent the fax, or None"""
+    sender = summary['from']
+    ext_id = sender.get('extensionId', '')
+    if not ext_id or ext_id in line_ids:
+        # Otherwise the mailbox the message was filed in is the sender's own
+        ext_id = mailbox if mailbox not in line_ids else ''
+    if not ext_id:
+        return None
+    
+    info = extensions_directory.get(ext_id, {})
+    name = info.get('name') or sender.get('name', '')
+    ext_number = info.get('extensionNumber') or sender.get('extensionNumber', '')
+    if not name and not ext_number:
+        return None
+    return {'extensionId': ext_id, 'extensionNumber': ext_number, 'name': name}
+
+def attribute_main_line_faxes(platform, records, extensions_directory):
+    """{call-log record id: {'sender', 'pages', 'status'}} for faxes on the main fax line
+    
+    'sender' is only set for outbound faxes whose employee could be found.
+    Stops fetching (and marks the run partial) when the rate budget or the
+    run deadline runs out; faxes it could not look up keep the call log's
+    main line sender.
+    """
+    line_ids = main_line_ids(extensions_directory)
+    refs = {}       # {record id: (mailbox, message id)}
+    wanted = {}     # {mailbox: {message ids not cached yet}}, in record order
+    
+    with _cache_lock:
+        cache = _load_cache()
+        for record in records:
+            ref = message_ref(record)
+            if not ref or not on_main_line(record, line_ids):
+                continue
+            refs[str(record.get('id'))] = ref
+            mailbox, message_id = ref
+            if message_id not in cache:
+                wanted.setdefault(mailbox, {})[message_id] = None
+    
+    to_fetch = sum(len(ids) for ids in wanted.values())
+    if not refs:
+        return {}
+    print(f"📠 Attributing {len(refs)} main fax line faxes ({len(refs) - to_fetch} cached, {to_fetch} to look up)...")
+    
+    fetched = {}
+    for mailbox, message_ids in wanted.items():
+        try:
+            fetch_messages(platform, mailbox, list(message_ids), fetched)
+        except (BudgetExhausted, CircuitOpen) as e:
+            policy_for(platform).mark_partial(f"fax attribution stopped after {len(fetched)} messages: {e}")
+            break
+        except Exception as e:
+            # Retryable errors were already retried by the platform's retry policy
+            print(f"⚠️  Warning: Could not look up fax messages in mailbox {mailbox}: {e}")
+    
+    with _cache_lock:
+        cache = _load_cache()
+        now = time.time()
+        for message_id, summary in fetched.items():
+            if summary['status'] in FINAL_STATUSES:
+                cache[message_id] = dict(summary, cached_at=now)
+        if fetched:
+            _save_cache()
+        
+        attributions = {}
+        for record_id, (mailbox, message_id) in refs.items():
+            summary = fetched.get(message_id) or cache.get(message_id)
+            if not summary:
+                continue
+            attribution = {'pages': summary['pages'], 'status': summary['status']}
+            if summary['direction'] == 'Outbound':
+                sender = _sender(summary, mailbox, extensions_directory, line_ids)
+                if sender:
+                    attribution['sender'] = sender
+            attributions[record_id] = attribution
+    
+    senders = sum(1 for attribution in attributions.values() if 'sender' in attribution)
+    print(f"✅ Attributed {senders} outbound main fax line faxes to their senders")
+    return attributions
+
+def apply_fax_attribution(records, attributions):
+    """Copies of the records with main-line senders replaced by the employees
+    
+    The sender keeps the call log's phone number (the main fax number) and
+    faxPageCount is taken from the message.
+    """
+    if not attributions:
+        return records
+    
+    attributed = []
+    for record in records:
+        attribution = attributions.get(str(record.get('id')))
+        if attribution:
+            record = dict(record)
+            if attribution['pages']:
+                record['faxPageCount'] = attribution['pages']
+            sender = attribution.get('sender')
+            if sender and record.get('direction') == 'Outbound':
+                phone = _first_party(record.get('from_')).get('phoneNumber', '')
+                record['from_'] = dict(sender, phoneNumber=phone)
+        attributed.append(record)
+    return attributed
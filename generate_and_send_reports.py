@@ -4,66 +4,33 @@ Master Script - Generate and Send RingCentral Reports
 Runs all report generation and sends comprehensive email
 """
 
-import subprocess
 import sys
 from datetime import datetime
 
-def run_script(script_name, description):
-    """Run a Python script and handle errors"""
-    print(f"\n{'='*60}")
-    print(f"🚀 {description}")
-    print('='*60)
-    
-    try:
-        result = subprocess.run(
-            [sys.executable, script_name],
-            capture_output=False,
-            text=True,
-            check=True
-        )
-        print(f"✅ {description} completed successfully")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"❌ {description} failed with error code {e.returncode}")
-        return False
-    except FileNotFoundError:
-        print(f"❌ Script {script_name} not found")
-        return False
+from pipeline import run_pipeline, report_dates
+from api_planner import build_plan, print_plan
+import profiling
 
 def main():
+    # --profile: per-phase CPU profiles and allocation snapshots (see profiling.py)
+    profiling.enable_from_argv()
     print("\n" + "="*60)
     print("📊 RINGCENTRAL REPORTS - MASTER GENERATOR")
     print("="*60)
     print(f"🕒 Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
-    # Step 1: Generate call productivity report
-    success1 = run_script(
-        'improved_call_logs.py',
-        'Step 1/3: Generating Call Productivity Report'
-    )
-    
-    if not success1:
-        print("\n❌ Failed to generate call report. Stopping.")
-        sys.exit(1)
-    
-    # Step 2: Generate fax analysis report
-    success2 = run_script(
-        'analyze_fax_senders.py',
-        'Step 2/3: Generating Fax Sender Analysis'
-    )
-    
-    if not success2:
-        print("\n❌ Failed to generate fax report. Stopping.")
-        sys.exit(1)
+    # --resume picks up at the first step without a valid checkpoint
+    resume = '--resume' in sys.argv
+    date_from, date_to, date_str = report_dates()
+    print(f"📅 Report date: {date_str}{' (resuming)' if resume else ''}")
     
-    # Step 3: Send comprehensive email
-    success3 = run_script(
-        'send_complete_reports.py',
-        'Step 3/3: Sending Comprehensive Email Report'
-    )
+    if '--dry-run' in sys.argv:
+        # Predict requests and wall time without calling the API
+        print_plan(build_plan([date_str]))
+        return
     
-    if not success3:
-        print("\n❌ Failed to send email.")
+    if not run_pipeline(date_from, date_to, date_str, resume=resume):
+        print("\n❌ Report pipeline stopped. Rerun with --resume to continue where it failed.")
         sys.exit(1)
     
     # Summary
@@ -4,15 +4,19 @@ Generate Reports for Specific Date
 Allows you to generate reports for any specific date
 """
 
-import subprocess
 import sys
-import os
 from datetime import datetime
 
+from pipeline import run_pipeline
+from api_planner import build_plan, print_plan
+import profiling
+
 # ============================================
 # CONFIGURE THE DATE HERE
 # ============================================
 REPORT_DATE = "2025-11-20"  # Format: YYYY-MM-DD
+RESUME = False  # Reuse valid step checkpoints (--resume)
+DRY_RUN = False  # Only print the API plan (--dry-run)
 
 def update_date_in_scripts(target_date):
     """Temporarily update the date in scripts"""
@@ -25,34 +29,9 @@ def update_date_in_scripts(target_date):
     
     return date_from, date_to, target_date
 
-def run_script_with_date(script_name, description, date_from, date_to, date_str):
-    """Run a Python script with specific date parameters"""
-    print(f"\n{'='*60}")
-    print(f"🚀 {description}")
-    print('='*60)
-    
-    # Set environment variables for the date
-    env = os.environ.copy()
-    env['REPORT_DATE_FROM'] = date_from
-    env['REPORT_DATE_TO'] = date_to
-    env['REPORT_DATE_STR'] = date_str
-    
-    try:
-        # Run with date parameters
-        result = subprocess.run(
-            [sys.executable, script_name, date_from, date_to, date_str],
-            capture_output=False,
-            text=True,
-            check=True,
-            env=env
-        )
-        print(f"✅ {description} completed successfully")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"❌ {description} failed with error code {e.returncode}")
-        return False
-
 def main():
+    # --profile: per-phase CPU profiles and allocation snapshots (see profiling.py)
+    profiling.enable_from_argv()
     print("\n" + "="*60)
     print("📊 RINGCENTRAL REPORTS - SPECIFIC DATE GENERATOR")
     print("="*60)
@@ -72,37 +51,15 @@ def main():
     print(f"   • Received faxes with status: 'Received'")
     print(f"   • Unsuccessful attempts (Busy, No Answer, Failed) are excluded")
     
-    # Step 1: Generate call productivity report
-    success1 = run_script_with_date(
-        'improved_call_logs.py',
-        f'Step 1/3: Generating Call Productivity Report for {REPORT_DATE}',
-        date_from, date_to, date_str
-    )
-    
-    if not success1:
-        print("\n❌ Failed to generate call report. Stopping.")
-        sys.exit(1)
-    
-    # Step 2: Generate fax analysis report
-    success2 = run_script_with_date(
-        'analyze_fax_senders.py',
-        f'Step 2/3: Generating Fax Sender Analysis for {REPORT_DATE}',
-        date_from, date_to, date_str
-    )
-    
-    if not success2:
-        print("\n❌ Failed to generate fax report. Stopping.")
-        sys.exit(1)
-    
-    # Step 3: Send comprehensive email
-    success3 = run_script_with_date(
-        'send_complete_reports.py',
-        f'Step 3/3: Sending Comprehensive Email Report for {REPORT_DATE}',
-        date_from, date_to, date_str
-    )
+    if DRY_RUN:
+        # Predict requests and wall time without calling the API
+        print()
+        print_plan(build_plan([date_str]))
+        return
     
-    if not success3:
-        print("\n❌ Failed to send email.")
+    # Fetch, aggregate, render and send as checkpointed steps
+    if not run_pipeline(date_from, date_to, date_str, resume=RESUME):
+        print(f"\n❌ Report pipeline stopped. Rerun with --resume to continue where it failed.")
         sys.exit(1)
     
     # Summary
@@ -126,8 +83,11 @@ def main():
 
 if __name__ == "__main__":
     # Check if date was provided as command line argument
-    if len(sys.argv) > 1:
-        REPORT_DATE = sys.argv[1]
+    RESUME = '--resume' in sys.argv
+    DRY_RUN = '--dry-run' in sys.argv
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if args:
+        REPORT_DATE = args[0]
         print(f"📅 Using date from command line: {REPORT_DATE}")
     
     main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+HTTP Transport - One pooled keep-alive session for every RingCentral request
+The SDK's default client opens a new requests.Session, and so a new TCP +
+TLS connection, for every request and closes it afterwards. A run makes
+hundreds of sequential and windowed calls to the same host, so
+create_platform() gives the SDK platform a client that sends through one
+shared session instead:
+    - keep-alive connections, pooled per host and sized for the concurrent
+      fetchers (prefetch, pipeline waves, multi-account worker slots)
+    - gzip / deflate on every request
+    - connect and read timeouts, so a stalled socket fails into the retry
+      policy instead of hanging the run
+
+Settings (environment):
+    HTTP_POOL_SIZE=8          # Connections kept open per host
+    HTTP_CONNECT_TIMEOUT=10   # Seconds
+    HTTP_READ_TIMEOUT=120     # Seconds
+    HTTP_POOL=0               # Use the SDK's connection-per-request client
+
+Usage:
+    from http_transport import create_platform, connection_stats
+    platform = create_platform(client_id, client_secret, server_url)
+    connection_stats()        # {'requests': 412, 'connections': 3}
+"""
+
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from ringcentral.http import ApiResponse, Client
+from ringcentral.platform import Platform
+
+POOL_ENABLED = os.getenv('HTTP_POOL', '1') != '0'
+# Prefetch runs 3 fetches at once and multi_account.py 4 worker slots;
+# connections beyond the pool size still work but are not kept
+POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '8'))
+CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '10'))
+READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '120'))
+
+ACCEPT_ENCODING = 'gzip, deflate'
+
+class PooledClient(Client):
+    """SDK HTTP client that sends every request through one shared session"""
+    
+    def __init__(self, pool_size=POOL_SIZE, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)):
+        super().__init__()
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Retries belong to retry_policy.py, which knows the run deadline
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._adapter = adapter
+        self._lock = threading.Lock()
+        self.requests = 0
+    
+    def load_response(self, request):
+        # Prepared requests skip the session's default headers, so gzip is set here
+        request.headers.setdefault('Accept-Encoding', ACCEPT_ENCODING)
+        response = self.session.send(request, timeout=self.timeout)
+        with self._lock:
+            self.requests += 1
+        return ApiResponse(request, response)
+    
+    def connections(self):
+        """New connections opened so far, over all hosts"""
+        pools = self._adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+    
+    def close(self):
+        self.session.close()
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+def shared_client():
+    """The process-wide PooledClient (created on first use)"""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = PooledClient()
+        return _shared_client
+
+def create_platform(client_id, client_secret, server_url):
+    """An SDK platform (not yet logged in) on the shared pooled client
+    
+    With HTTP_POOL=0 the SDK's own client is used.
+    """
+    client = shared_client() if POOL_ENABLED else Client()
+    return Platform(client, client_id, client_secret, server_url)
+
+def connection_stats():
+    """Requests sent and connections opened by the shared client"""
+    if _shared_client is None:
+        return {'requests': 0, 'connections': 0}
+    return {'requests': _shared_client.requests, 'connections': _shared_client.connections()}
+
+def reset():
+    """Close the shared client's connections and start counting again"""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is not None:
+            _shared_client.close()
+        _shared_client = None
@@ -0,0 +1,613 @@
+#!/usr/bin/env python3
+"""
+Live Ingest - Push-based updates from RingCentral webhook subscriptions
+Registers a subscription for telephony-session and message-store (fax)
+events, receives them on a local HTTP endpoint and keeps per-extension
+counters and fax records up to date as the day goes on. Fax records are
+kept in this process's own RecordStore, updated in place as their status
+changes; report_service.py runs separately with a store of its own and
+does not see them. Counters and records are saved to
+exports/.live/<date>.json, which is how they reach the reports: a restart
+resumes the day from it, and the daily pipeline uses a fully covered
+day's file instead of re-fetching the day.
+
+Usage:
+    python live_ingest.py                           # Receive events (subscribes if LIVE_WEBHOOK_URL is set)
+    python live_ingest.py --status                  # Today's counters from the saved state
+    python live_ingest.py --replay events.jsonl     # Post captured events to a local endpoint
+    python live_ingest.py --replay events.jsonl --url http://127.0.0.1:8766/webhook --realtime
+
+Every received event is appended to exports/.live/events-<date>.jsonl, so
+a real day can be captured once and replayed against the endpoint later.
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from collections import deque
+from urllib.parse import urlparse, parse_qs
+from datetime import datetime, timedelta, timezone
+
+from report_cache import normalize
+from record_store import RecordStore
+
+LIVE_DIR = 'exports/.live'
+
+LIVE_HOST = os.getenv('LIVE_INGEST_HOST', '127.0.0.1')
+LIVE_PORT = int(os.getenv('LIVE_INGEST_PORT', '8766'))
+# Public URL RingCentral posts to (e.g. a tunnel or reverse proxy to LIVE_PORT)
+WEBHOOK_URL = os.getenv('LIVE_WEBHOOK_URL', '')
+# Sent back by RingCentral in the Verification-Token header of every event
+VERIFICATION_TOKEN = os.getenv('LIVE_WEBHOOK_TOKEN', '')
+
+TELEPHONY_FILTER = '/restapi/v1.0/account/~/telephony/sessions'
+SUBSCRIPTION_TTL_SECONDS = 7 * 24 * 60 * 60
+RENEW_BEFORE_SECONDS = 24 * 60 * 60
+
+# State is written to disk this often; a gap longer than STALE_AFTER means
+# events may have been missed and the day's coverage restarts
+FLUSH_SECONDS = 30
+STALE_AFTER_SECONDS = 5 * 60
+
+# Event uuids remembered for deduplicating RingCentral redeliveries
+SEEN_EVENTS_LIMIT = 50000
+
+def parse_time(value):
+    """ISO-8601 time -> epoch seconds (None if missing)"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+def day_bounds(date_str):
+    start = datetime.strptime(date_str, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    return start.timestamp(), (start + timedelta(days=1)).timestamp()
+
+def empty_counters():
+    return {
+        'calls_received': 0,
+        'calls_made': 0,
+        'answered_calls': 0,
+        'missed_calls': 0,
+        'talk_seconds': 0,
+        'faxes_sent': 0,
+        'faxes_received': 0
+    }
+
+def state_path(date_str):
+    return os.path.join(LIVE_DIR, f"{date_str}.json")
+
+def events_path(date_str):
+    return os.path.join(LIVE_DIR, f"events-{date_str}.jsonl")
+
+def message_to_call_record(message, extension_id, extension_number):
+    """Shape a message-store fax message like a Detailed call-log fax record"""
+    direction = message.get('direction', '')
+    status = message.get('messageStatus', '')
+    from_data = dict(message.get('from') or {})
+    to_data = [dict(t) for t in (message.get('to') or [])]
+    
+    # The owning extension is the sender of outbound and recipient of inbound faxes
+    owner = {'extensionId': str(extension_id), 'extensionNumber': extension_number}
+    if direction == 'Outbound':
+        from_data.update(owner)
+    elif to_data:
+        to_data[0].update(owner)
+    else:
+        to_data = [owner]
+    
+    return {
+        'id': f"msg-{message.get('id')}",
+        'type': 'Fax',
+        'direction': direction,
+        'result': status,
+        'startTime': message.get('creationTime', ''),
+        'duration': 0,
+        'from_': from_data,
+        'to': to_data,
+        'faxPageCount': message.get('faxPageCount', 0)
+    }
+
+def fax_contribution(record):
+    """(extension_number, counter) a fax record counts towards, or None"""
+    if record['direction'] == 'Outbound' and record['result'] == 'Sent':
+        return record['from_'].get('extensionNumber', ''), 'faxes_sent'
+    if record['direction'] == 'Inbound' and record['result'] == 'Received':
+        return record['to'][0].get('extensionNumber', ''), 'faxes_received'
+    return None
+
+class LiveState:
+    """Per-day counters, open call parties and fax records built from events"""
+    
+    def __init__(self, extensions_directory=None, store=None):
+        self._lock = threading.Lock()
+        self.extensions_directory = extensions_directory or {}
+        # Fax records as call-log records, updated in place as their status changes
+        self.store = store if store is not None else RecordStore()
+        self.days = {}
+        self._seen_events = set()
+        self._seen_order = deque()
+    
+    # ---- Per-day state ----
+    
+    def _day(self, date_str):
+        day = self.days.get(date_str)
+        if day is None:
+            day_start, _ = day_bounds(date_str)
+            previous_date = datetime.fromtimestamp(day_start - 1, tz=timezone.utc).strftime("%Y-%m-%d")
+            day = self._load_day(date_str) or {
+                # Rolling over from a covered day means nothing was missed at midnight
+                'covered_from': day_start if previous_date in self.days else time.time(),
+                'updated_at': time.time(),
+                'events': 0,
+                'counters': {},
+                'parties': {},
+                'finished_parties': {},
+                'fax_records': {}
+            }
+            self.days[date_str] = day
+            self.store.add_records(list(day['fax_records'].values()), date_str)
+        return day
+    
+    def _load_day(self, date_str):
+        """Resume a day from disk; a stale file means events were missed"""
+        path = state_path(date_str)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r') as f:
+                day = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        _, day_end = day_bounds(date_str)
+        if day['updated_at'] < day_end and time.time() - day['updated_at'] > STALE_AFTER_SECONDS:
+            print(f"⚠️  Live state for {date_str} is stale - day is no longer fully covered")
+            day['covered_from'] = time.time()
+        return day
+    
+    def flush(self):
+        """Write every day's state to disk atomically
+        
+        Today always gets a state file, so coverage starts counting even
+        before the first event. Days over for more than a day are written
+        one last time and dropped from memory.
+        """
+        os.makedirs(LIVE_DIR, exist_ok=True)
+        with self._lock:
+            now = time.time()
+            self._day(datetime.fromtimestamp(now, tz=timezone.utc).strftime("%Y-%m-%d"))
+            for date_str, day in list(self.days.items()):
+                day['updated_at'] = now
+                tmp_path = f"{state_path(date_str)}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(day, f)
+                os.replace(tmp_path, state_path(date_str))
+                if now - day_bounds(date_str)[1] > 24 * 60 * 60:
+                    del self.days[date_str]
+                    self.store.drop(date_str)
+    
+    def _extension_number(self, extension_id):
+        info = self.extensions_directory.get(str(extension_id))
+        return info['extensionNumber'] if info else ''
+    
+    def _counters(self, day, extension_number):
+        return day['counters'].setdefault(extension_number, empty_counters())
+    
+    # ---- Events ----
+    
+    def handle_event(self, event, fetch_message=None):
+        """Apply one webhook event; returns False for duplicates and unknown events"""
+        event_id = event.get('uuid')
+        event_filter = event.get('event', '')
+        body = event.get('body') or {}
+        
+        with self._lock:
+            if event_id:
+                if event_id in self._seen_events:
+                    return False
+                self._seen_events.add(event_id)
+                self._seen_order.append(event_id)
+                if len(self._seen_order) > SEEN_EVENTS_LIMIT:
+                    self._seen_events.discard(self._seen_order.popleft())
+        
+        if '/telephony/sessions' in event_filter:
+            self._handle_telephony(body, event.get('timestamp'))
+        elif '/message-store' in event_filter:
+            self._handle_message_store(body, fetch_message)
+        else:
+            return False
+        return True
+    
+    def _handle_telephony(self, body, timestamp):
+        """Count each extension party once, when it disconnects"""
+        session_id = body.get('telephonySessionId') or body.get('sessionId', '')
+        event_time = parse_time(body.get('eventTime') or timestamp) or time.time()
+        date_str = str(body.get('creationTime') or body.get('eventTime') or timestamp or '')[:10]
+        if not date_str:
+            return
+        
+        with self._lock:
+            day = self._day(date_str)
+            day['events'] += 1
+            
+            for party in body.get('parties', []):
+                extension_number = self._extension_number(party.get('extensionId', ''))
+                if not extension_number:
+                    continue  # External party
+                
+                party_key = f"{session_id}:{party.get('id', '')}"
+                if party_key in day['finished_parties']:
+                    continue
+                
+                state = day['parties'].setdefault(party_key, {'answered_at': None})
+                status = (party.get('status') or {}).get('code', '')
+                
+                if status == 'Answered' and not state['answered_at']:
+                    state['answered_at'] = event_time
+                
+                if status in ('Disconnected', 'Gone'):
+                    counters = self._counters(day, extension_number)
+                    if party.get('direction') == 'Inbound':
+                        counters['calls_received'] += 1
+                        if not state['answered_at'] or party.get('missedCall'):
+                            counters['missed_calls'] += 1
+                    else:
+                        counters['calls_made'] += 1
+                    if state['answered_at']:
+                        counters['answered_calls'] += 1
+                        counters['talk_seconds'] += int(max(0, event_time - state['answered_at']))
+                    
+                    del day['parties'][party_key]
+                    day['finished_parties'][party_key] = True
+    
+    def _handle_message_store(self, body, fetch_message):
+        """Add or update fax records for the messages named in the event"""
+        extension_id = str(body.get('extensionId', ''))
+        extension_number = self._extension_number(extension_id)
+        
+        # Replayed events may carry the messages inline; live ones are fetched
+        messages = list(body.get('messages', []))
+        if not messages and fetch_message:
+            for change in body.get('changes', []):
+                if change.get('type') != 'Fax':
+                    continue
+                for message_id in change.get('newMessageIds', []) + change.get('updatedMessageIds', []):
+                    try:
+                        messages.append(normalize(fetch_message(extension_id, message_id)))
+                    except Exception as e:
+                        print(f"⚠️  Could not fetch fax message {message_id}: {e}")
+        
+        with self._lock:
+            for message in messages:
+                if message.get('type', 'Fax') != 'Fax':
+                    continue
+                record = message_to_call_record(message, extension_id, extension_number)
+                date_str = record['startTime'][:10]
+                if not date_str:
+                    continue
+                
+                day = self._day(date_str)
+                day['events'] += 1
+                
+                # Status changes (Queued -> Sent) move a fax between counters
+                previous = day['fax_records'].get(record['id'])
+                for contribution, delta in ((fax_contribution(previous) if previous else None, -1),
+                                            (fax_contribution(record), 1)):
+                    if contribution and contribution[0]:
+                        self._counters(day, contribution[0])[contribution[1]] += delta
+                day['fax_records'][record['id']] = record
+                self.store.add_records([record], date_str)
+    
+    # ---- Snapshots ----
+    
+    def snapshot(self, date_str):
+        """Counters (Analytics-shaped voice counts) and fax records for a date
+        
+        Read-only: a day not held in memory is read from its saved state
+        without being resumed. Returns None when there is no state for it.
+        """
+        with self._lock:
+            day = self.days.get(date_str)
+            if day is not None:
+                records = self.store.records(date_str)
+            else:
+                day = self._load_day(date_str)
+                if day is None:
+                    return None
+                records = list(day['fax_records'].values())
+            return {
+                'date': date_str,
+                'covered_from': day['covered_from'],
+                'updated_at': day['updated_at'],
+                'events': day['events'],
+                'counters': json.loads(json.dumps(day['counters'])),
+                'voice': voice_counts(day['counters']),
+                'records': records
+            }
+
+def voice_counts(counters):
+    """Per-extension counters in fetch_voice_calls_from_analytics() format"""
+    return {
+        extension: {
+            'inbound': c['calls_received'],
+            'outbound': c['calls_made'],
+            'total': c['calls_received'] + c['calls_made']
+        }
+        for extension, c in counters.items()
+        if c['calls_received'] or c['calls_made']
+    }
+
+def load_complete_snapshot(date_str):
+    """A day's saved live state, if ingestion covered the whole day
+    
+    Returns {'voice': ..., 'records': ...} or None when the day was not
+    fully covered (ingestion started late, had a gap, or is still running
+    for that day).
+    """
+    path = state_path(date_str)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            day = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    day_start, day_end = day_bounds(date_str)
+    if day['covered_from'] > day_start or day['updated_at'] < day_end:
+        return None
+    
+    return {'voice': voice_counts(day['counters']), 'records': list(day['fax_records'].values())}
+
+# ---- Subscription ----
+
+def message_store_filters(extensions_directory):
+    return [f"/restapi/v1.0/account/~/extension/{ext_id}/message-store" for ext_id in extensions_directory]
+
+def create_subscription(platform, extensions_directory, address):
+    """Register the webhook; returns the subscription id and expiry"""
+    response = platform.post('/restapi/v1.0/subscription', {
+        'eventFilters': [TELEPHONY_FILTER] + message_store_filters(extensions_directory),
+        'deliveryMode': {
+            'transportType': 'WebHook',
+            'address': address,
+            'verificationToken': VERIFICATION_TOKEN or None
+        },
+        'expiresIn': SUBSCRIPTION_TTL_SECONDS
+    })
+    data = normalize(response.json())
+    print(f"📡 Subscribed {data['id']} ({len(data.get('eventFilters', []))} filters), expires {data.get('expirationTime')}")
+    return data['id'], parse_time(data.get('expirationTime')) or time.time() + SUBSCRIPTION_TTL_SECONDS
+
+def keep_subscription_alive(platform, subscription_id, expires_at, extensions_directory, address):
+    """Renew the subscription before it expires; resubscribe if renewal fails"""
+    while True:
+        time.sleep(max(60, expires_at - time.time() - RENEW_BEFORE_SECONDS))
+        try:
+            data = normalize(platform.post(f'/restapi/v1.0/subscription/{subscription_id}/renew').json())
+            expires_at = parse_time(data.get('expirationTime')) or time.time() + SUBSCRIPTION_TTL_SECONDS
+            print(f"🔄 Subscription {subscription_id} renewed")
+        except Exception as e:
+            print(f"⚠️  Renewal failed ({e}), subscribing again")
+            try:
+                subscription_id, expires_at = create_subscription(platform, extensions_directory, address)
+            except Exception as e:
+                print(f"❌ Resubscribe failed: {e}")
+                expires_at = time.time() + RENEW_BEFORE_SECONDS + 300
+
+# ---- Webhook endpoint ----
+
+def make_handler(state, fetch_message=None):
+    """HTTP handler for RingCentral webhook posts and local status queries"""
+    # http.server and urllib.request are only needed by the live service and
+    # the replayer, not by the pipeline reading snapshots
+    from http.server import BaseHTTPRequestHandler
+    
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def _reply(self, status, payload=None, headers=None):
+            body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def do_POST(self):
+            if self.path != '/webhook':
+                self._reply(404, {'error': 'unknown endpoint'})
+                return
+            
+            # Subscription handshake: echo the validation token back
+            validation_token = self.headers.get('Validation-Token')
+            if validation_token:
+                self._reply(200, headers={'Validation-Token': validation_token})
+                return
+            
+            if VERIFICATION_TOKEN and self.headers.get('Verification-Token') != VERIFICATION_TOKEN:
+                self._reply(403, {'error': 'bad verification token'})
+                return
+            
+            raw = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            try:
+                event = json.loads(raw)
+            except ValueError:
+                self._reply(400, {'error': 'invalid JSON'})
+                return
+            
+            # Acknowledge right away: RingCentral retries slow responses
+            self._reply(200, {'accepted': True})
+            capture_event(event)
+            try:
+                state.handle_event(event, fetch_message)
+            except Exception as e:
+                print(f"❌ Could not apply event {event.get('uuid')}: {e}")
+        
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != '/live':
+                self._reply(404, {'error': 'unknown endpoint'})
+                return
+            date_str = parse_qs(url.query).get('date', [datetime.now(timezone.utc).strftime("%Y-%m-%d")])[0]
+            try:
+                datetime.strptime(date_str, "%Y-%m-%d")
+            except ValueError:
+                self._reply(400, {'error': f"invalid date '{date_str}', expected YYYY-MM-DD"})
+                return
+            snapshot = state.snapshot(date_str)
+            if snapshot is None:
+                self._reply(404, {'error': f"no live state for {date_str}"})
+                return
+            snapshot.pop('records')
+            self._reply(200, snapshot)
+        
+        def log_message(self, format, *args):
+            pass  # One line per event would drown the console
+    
+    return WebhookHandler
+
+_capture_lock = threading.Lock()
+
+def capture_event(event):
+    """Append a received event to the day's capture file (for replay)"""
+    date_str = str(event.get('timestamp') or datetime.now(timezone.utc).isoformat())[:10]
+    os.makedirs(LIVE_DIR, exist_ok=True)
+    with _capture_lock:
+        with open(events_path(date_str), 'a') as f:
+            f.write(json.dumps(event) + '\n')
+
+def flush_periodically(state):
+    while True:
+        time.sleep(FLUSH_SECONDS)
+        try:
+            state.flush()
+        except Exception as e:
+            print(f"⚠️  Could not save live state: {e}")
+
+# ---- Replayer ----
+
+def replay_events(path, url, realtime=False):
+    """Post captured events to a webhook endpoint, standing in for RingCentral
+    
+    Sends the subscription handshake first, then every event in file order
+    (paced by the original timestamps with realtime=True).
+    Returns the number of events accepted.
+    """
+    import urllib.request
+    
+    def post(data, headers):
+        request = urllib.request.Request(url, data=data, headers=headers, method='POST')
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, response.headers
+    
+    status, headers = post(b'', {'Validation-Token': 'replay-validation'})
+    if status != 200 or headers.get('Validation-Token') != 'replay-validation':
+        raise RuntimeError(f"endpoint failed the validation handshake (HTTP {status})")
+    
+    accepted = 0
+    previous_time = None
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            
+            event_time = parse_time(event.get('timestamp'))
+            if realtime and previous_time and event_time:
+                time.sleep(max(0, event_time - previous_time))
+            previous_time = event_time or previous_time
+            
+            status, _ = post(json.dumps(event).encode('utf-8'), {
+                'Content-Type': 'application/json',
+                'Verification-Token': VERIFICATION_TOKEN
+            })
+            if status == 200:
+                accepted += 1
+    
+    print(f"✅ Replayed {accepted} events to {url}")
+    return accepted
+
+def print_status(date_str):
+    path = state_path(date_str)
+    if not os.path.exists(path):
+        print(f"📭 No live state for {date_str}")
+        return
+    
+    with open(path, 'r') as f:
+        day = json.load(f)
+    covered = datetime.fromtimestamp(day['covered_from'], tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')
+    print(f"📡 Live state for {date_str}: {day['events']} events, covered since {covered}")
+    print(f"   {'Ext':<8}{'In':>6}{'Out':>6}{'Missed':>8}{'Talk (min)':>12}{'Fax out':>9}{'Fax in':>8}")
+    for extension in sorted(day['counters']):
+        c = day['counters'][extension]
+        print(f"   {extension:<8}{c['calls_received']:>6}{c['calls_made']:>6}{c['missed_calls']:>8}"
+              f"{c['talk_seconds'] / 60:>12.1f}{c['faxes_sent']:>9}{c['faxes_received']:>8}")
+
+def main():
+    print("📡 RINGCENTRAL LIVE INGEST")
+    print("=" * 60)
+    
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    
+    if '--replay' in sys.argv:
+        url = sys.argv[sys.argv.index('--url') + 1] if '--url' in sys.argv else f"http://{LIVE_HOST}:{LIVE_PORT}/webhook"
+        replay_events(sys.argv[sys.argv.index('--replay') + 1], url, realtime='--realtime' in sys.argv)
+        return
+    
+    if '--status' in sys.argv:
+        print_status(args[0] if args else datetime.now(timezone.utc).strftime("%Y-%m-%d"))
+        return
+    
+    extensions_directory = {}
+    fetch_message = None
+    
+    if WEBHOOK_URL:
+        import improved_call_logs
+        from retry_policy import RUN_POLICY
+        RUN_POLICY.start(None)  # Runs indefinitely, so no run deadline
+        platform = improved_call_logs.connect_platform()
+        extensions_directory = improved_call_logs.fetch_extensions_directory(platform)
+        
+        def fetch_message(extension_id, message_id):
+            return platform.get(f"/restapi/v1.0/account/~/extension/{extension_id}/message-store/{message_id}").json()
+    else:
+        print("⚠️  LIVE_WEBHOOK_URL not set - not subscribing (endpoint only, e.g. for --replay)")
+        if os.path.exists('exports/.pipeline'):
+            # Use the newest checkpointed directory so replayed parties resolve
+            for date_dir in sorted(os.listdir('exports/.pipeline'), reverse=True):
+                path = os.path.join('exports/.pipeline', date_dir, 'directory.json')
+                if os.path.exists(path):
+                    with open(path, 'r') as f:
+                        extensions_directory = json.load(f)['result']
+                    break
+    
+    state = LiveState(extensions_directory)
+    from http.server import ThreadingHTTPServer
+    server = ThreadingHTTPServer((LIVE_HOST, LIVE_PORT), make_handler(state, fetch_message))
+    threading.Thread(target=server.serve_forever, name='webhook-server', daemon=True).start()
+    print(f"🚀 Receiving events on http://{LIVE_HOST}:{LIVE_PORT}/webhook")
+    
+    if WEBHOOK_URL:
+        subscription_id, expires_at = create_subscription(platform, extensions_directory, WEBHOOK_URL)
+        threading.Thread(
+            target=keep_subscription_alive,
+            args=(platform, subscription_id, expires_at, extensions_directory, WEBHOOK_URL),
+            name='subscription-renewer',
+            daemon=True
+        ).start()
+    
+    try:
+        flush_periodically(state)
+    except KeyboardInterrupt:
+        state.flush()
+        server.shutdown()
+        print("\n👋 Stopped - live state saved")
+
+if __name__ == "__main__":
+    main()
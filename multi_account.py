@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Multi-Account Runner - Reports for several RingCentral accounts in one run
+Fetches for every account in accounts.json are scheduled on one shared
+worker pool. Each account has its own rate-limit budget, so an account
+waiting out a 429 gives its worker back to the others.
+
+Usage:
+    python multi_account.py                  # Yesterday, every account
+    python multi_account.py 2025-11-20       # A specific date
+    python multi_account.py 2025-11-20 --account "Agency A"
+
+Reports land in exports/accounts/<account>/.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import improved_call_logs
+import analyze_fax_senders
+from pipeline import report_dates
+from rate_budget import WorkerSlots
+from retry_policy import RetryPolicy, write_partial_marker
+from extension_resolver import resolve_directory
+from phone_index import load_phone_numbers
+from api_metrics import RUN_METRICS, export_run_metrics
+import profiling
+
+ACCOUNTS_FILE = os.getenv('ACCOUNTS_FILE', 'accounts.json')
+ACCOUNTS_EXPORT_DIR = 'exports/accounts'
+
+# Fetches doing work at the same time, across all accounts
+ACCOUNT_WORKERS = int(os.getenv('ACCOUNT_WORKERS', '4'))
+
+def load_accounts(path=ACCOUNTS_FILE):
+    """Account configs, with '<key>_env' entries read from the environment
+    
+    [{"name": "Agency A", "client_id": "...", "client_secret_env": "AGENCY_A_SECRET",
+      "jwt_env": "AGENCY_A_JWT", "rate_limits": {"heavy": {"requests": 10, "window": 60}}}]
+    """
+    if not os.path.exists(path):
+        return []
+    
+    with open(path, 'r') as f:
+        configs = json.load(f)
+    
+    accounts = []
+    for config in configs:
+        account = dict(config)
+        for key in ('client_id', 'client_secret', 'jwt', 'server_url'):
+            env_name = config.get(f"{key}_env")
+            if env_name:
+                if not os.getenv(env_name):
+                    raise ValueError(f"{config.get('name', '?')}: environment variable {env_name} is not set")
+                account[key] = os.getenv(env_name)
+        missing = [key for key in ('name', 'client_id', 'client_secret', 'jwt') if not account.get(key)]
+        if missing:
+            raise ValueError(f"account {config.get('name', '?')} is missing {', '.join(missing)}")
+        accounts.append(account)
+    return accounts
+
+def account_slug(name):
+    return re.sub(r'-+', '-', re.sub(r'[^a-z0-9]+', '-', name.lower())).strip('-')
+
+def run_account(account, date_from, date_to, date_str, executor, slots):
+    """Fetch, aggregate and render one account's reports
+    
+    The three fetches run as separate pool tasks so they interleave with
+    other accounts' work; only the budget of this account is ever waited on.
+    """
+    name = account['name']
+    started = time.time()
+    
+    def in_slot(func, *args):
+        with slots.held():
+            return func(*args)
+    
+    # connect_platform() gives each account its own rate budget; waits for
+    # it hand the worker slot back to the shared pool
+    platform = in_slot(improved_call_logs.connect_platform, account)
+    platform.slots = slots
+    # Own deadline, circuit breaker and PARTIAL reasons per account
+    platform.policy = RetryPolicy()
+    
+    directory_future = executor.submit(in_slot, improved_call_logs.fetch_extensions_directory, platform)
+    analytics_future = executor.submit(in_slot, improved_call_logs.fetch_voice_calls_from_analytics, platform, date_str, date_str)
+    fax_future = executor.submit(in_slot, improved_call_logs.fetch_fax_call_log, platform, date_from, date_to, date_str)
+    
+    extensions_directory = directory_future.result()
+    voice_analytics_data = analytics_future.result()
+    all_records = fax_future.result()
+    
+    def aggregate_and_render():
+        export_dir = os.path.join(ACCOUNTS_EXPORT_DIR, account_slug(name))
+        directory = resolve_directory(platform, all_records, extensions_directory)
+        # Built from the resolved directory, as in pipeline.py, so departed staff keep their names
+        phone_to_extension_map = improved_call_logs.build_phone_to_extension_map(directory, load_phone_numbers(platform))
+        grouped_records, _ = improved_call_logs.group_call_records(
+            all_records, directory, phone_to_extension_map, voice_analytics_data
+        )
+        fax_records = analyze_fax_senders.build_fax_records(all_records, directory, platform)
+        partial_reasons = platform.policy.partial_reasons
+        improved_call_logs.render_call_report(grouped_records, date_str, export_dir, partial_reasons)
+        analyze_fax_senders.render_fax_report(fax_records, date_str, export_dir, partial_reasons)
+        write_partial_marker(date_str, partial_reasons, export_dir)
+        return improved_call_logs.call_report_paths(date_str, export_dir) + analyze_fax_senders.fax_report_paths(date_str, export_dir)
+    
+    files = in_slot(aggregate_and_render)
+    return {'account': name, 'files': files, 'records': len(all_records), 'seconds': time.time() - started,
+            'partial': list(platform.policy.partial_reasons)}
+
+def run_accounts(accounts, date_from, date_to, date_str, workers=ACCOUNT_WORKERS):
+    """Run every account on one shared pool; returns (results, failures)"""
+    slots = WorkerSlots(workers)
+    results = []
+    failures = []
+    
+    # Each account needs its own thread plus three fetch threads; threads
+    # waiting for budget hold no slot, so only `workers` do work at once
+    with ThreadPoolExecutor(max_workers=len(accounts) * 4, thread_name_prefix='account') as executor:
+        futures = {
+            executor.submit(run_account, account, date_from, date_to, date_str, executor, slots): account['name']
+            for account in accounts
+        }
+        for future, name in futures.items():
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"❌ {name}: {e}")
+                failures.append(name)
+    
+    return results, failures
+
+def main():
+    # --profile: per-phase CPU profiles and allocation snapshots (see profiling.py)
+    profiling.enable_from_argv()
+    print("🏢 RINGCENTRAL MULTI-ACCOUNT REPORTS")
+    print("=" * 60)
+    
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    date_from, date_to, date_str = report_dates(args[0] if args else None)
+    
+    try:
+        accounts = load_accounts()
+    except (OSError, ValueError) as e:
+        print(f"❌ Could not load {ACCOUNTS_FILE}: {e}")
+        sys.exit(1)
+    
+    if '--account' in sys.argv:
+        wanted = sys.argv[sys.argv.index('--account') + 1]
+        accounts = [a for a in accounts if a['name'] == wanted]
+    
+    if not accounts:
+        print(f"❌ No accounts configured - copy accounts.example.json to {ACCOUNTS_FILE}")
+        sys.exit(1)
+    
+    print(f"📅 Date: {date_str}")
+    print(f"👥 Accounts: {', '.join(a['name'] for a in accounts)} ({ACCOUNT_WORKERS} shared workers)")
+    
+    RUN_METRICS.reset()
+    results, failures = run_accounts(accounts, date_from, date_to, date_str)
+    # Requests are labelled by account in the textfile
+    export_run_metrics(date_str, not failures, [reason for r in results for reason in r['partial']],
+                       extra={'accounts': len(accounts), 'fax_records': sum(r['records'] for r in results)})
+    
+    print(f"\n{'='*60}")
+    for result in results:
+        status = "⚠️  PARTIAL" if result['partial'] else "✅"
+        print(f"{status} {result['account']}: {result['records']} fax records in {result['seconds']:.0f}s")
+        for path in result['files']:
+            print(f"   • {path}")
+    for name in failures:
+        print(f"❌ {name}: failed")
+    
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
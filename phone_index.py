@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Phone Index - Which extension every company phone number belongs to
+Call-log records often name only a phone number for the company side (main
+numbers, desk phones, the fax line). This builds an index of the account's
+whole phone-number inventory, keyed by E.164 number, with the extension
+each number is assigned to, so extract_call_data() resolves a side with
+one dict lookup. Numbers not assigned to an extension (the main company
+number) are still listed, so they are never mistaken for outside callers.
+
+The inventory is one paged GET of /account/~/phone-number (1000 numbers
+per page), cached on disk per account for PHONE_INDEX_TTL_HOURS.
+
+Settings (environment):
+    PHONE_INDEX_TTL_HOURS=24
+    PHONE_INDEX_DIR=exports/.cache      # phone_index[-<account>].json
+
+Usage:
+    from phone_index import load_phone_numbers, lookup_phone
+    phone_numbers = load_phone_numbers(platform)   # {'+13175550100': {'extensionId', 'extensionNumber', 'usageType'}}
+    phone_map = build_phone_to_extension_map(extensions_directory, phone_numbers)
+    lookup_phone(phone_map, '(317) 555-0100')      # Same entry as '+13175550100'
+    
+    python phone_index.py [--refresh]              # Fetch and print the index
+"""
+
+import os
+import re
+import sys
+import json
+import time
+
+from tracing import traced
+
+PHONE_NUMBER_PATH = "/restapi/v1.0/account/~/phone-number"
+PHONE_NUMBER_PAGE_SIZE = 1000
+PHONE_INDEX_TTL_HOURS = float(os.getenv('PHONE_INDEX_TTL_HOURS', '24'))
+PHONE_INDEX_DIR = os.getenv('PHONE_INDEX_DIR', 'exports/.cache')
+
+# Numbers written without a country code are North American
+DEFAULT_COUNTRY_CODE = '1'
+
+_NON_DIGITS = re.compile(r'\D')
+
+def normalize_e164(number):
+    """'+1 (317) 555-0100', '3175550100', '13175550100' -> '+13175550100' ('' if no digits)"""
+    if not number:
+        return ''
+    number = str(number).strip()
+    digits = _NON_DIGITS.sub('', number)
+    if not digits:
+        return ''
+    if number.startswith('+'):
+        return f"+{digits}"
+    if number.startswith('00'):
+        return f"+{digits[2:]}"
+    if len(digits) == 10:
+        return f"+{DEFAULT_COUNTRY_CODE}{digits}"
+    return f"+{digits}"
+
+def lookup_phone(phone_map, number):
+    """The phone map entry for a number, or None
+    
+    Call-log numbers are already E.164, so that is a single dict lookup;
+    other spellings are normalized first.
+    """
+    if not number or not phone_map:
+        return None
+    entry = phone_map.get(number)
+    if entry is None and not number.startswith('+'):
+        entry = phone_map.get(normalize_e164(number))
+    return entry
+
+def index_from_records(records):
+    """{E.164 number: {extensionId, extensionNumber, usageType}} from phone-number records"""
+    index = {}
+    for record in records:
+        number = normalize_e164(record.get('phoneNumber'))
+        if not number:
+            continue
+        extension = record.get('extension') or {}
+        index[number] = {
+            'extensionId': str(extension.get('id') or ''),
+            'extensionNumber': str(extension.get('extensionNumber') or ''),
+            'usageType': record.get('usageType', '')
+        }
+    return index
+
+@traced('phone_numbers')
+def fetch_phone_numbers(platform):
+    """The account's phone-number inventory as an index_from_records() dict"""
+    print("☎️  Fetching account phone numbers...")
+    records = []
+    page = 1
+    while True:
+        response = platform.get(PHONE_NUMBER_PATH, {"perPage": PHONE_NUMBER_PAGE_SIZE, "page": page})
+        data = response.json_dict()
+        page_records = data.get('records') or []
+        records.extend(page_records)
+        if len(page_records) < PHONE_NUMBER_PAGE_SIZE or not (data.get('navigation') or {}).get('nextPage'):
+            break
+        page += 1
+    
+    index = index_from_records(records)
+    assigned = sum(1 for entry in index.values() if entry['extensionId'])
+    print(f"✅ Indexed {len(index)} phone numbers ({assigned} assigned to extensions)")
+    return index
+
+def cache_path(platform):
+    """Phone numbers differ per account, so each has its own cache file"""
+    name = re.sub(r'[^a-z0-9]+', '-', (getattr(platform, 'name', '') or '').lower()).strip('-')
+    return os.path.join(PHONE_INDEX_DIR, f"phone_index-{name}.json" if name else 'phone_index.json')
+
+def _read_cache(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def load_phone_numbers(platform, refresh=False):
+    """The account's phone index, from the cache while it is fresh
+    
+    When the API fails, a stale cache is better than nothing; with neither
+    the index is empty and numbers resolve through the directory only.
+    """
+    path = cache_path(platform)
+    cached = _read_cache(path)
+    if cached and not refresh and time.time() - cached['fetched_at'] < PHONE_INDEX_TTL_HOURS * 3600:
+        return cached['numbers']
+    
+    try:
+        numbers = fetch_phone_numbers(platform)
+    except Exception as e:
+        print(f"⚠️  Warning: Could not fetch phone numbers: {e}")
+        if cached:
+            print(f"   Using the phone index cached {(time.time() - cached['fetched_at']) / 3600:.0f}h ago")
+            return cached['numbers']
+        return {}
+    
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'fetched_at': time.time(), 'numbers': numbers}, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    return numbers
+
+def main():
+    import improved_call_logs
+    platform = improved_call_logs.connect_platform()
+    numbers = load_phone_numbers(platform, refresh='--refresh' in sys.argv)
+    for number, entry in sorted(numbers.items()):
+        print(f"   {number:<16}{entry['extensionNumber'] or '-':>8}  {entry['usageType']}")
+
+if __name__ == "__main__":
+    main()
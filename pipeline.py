@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Report Pipeline - Run the daily reports as a DAG of checkpointed steps
+    
+    auth ─┬─ directory ─────────┬─ extension_resolution ─┐
+          ├─ phone_numbers ─────┼────────────────────────┤
+          ├─ analytics ─────────┼────────────────────────┼─ aggregate ── render ── send
+          └─ fax_fetch ─────────┴─ fax_attribution ──────┘
+
+Steps whose inputs are ready run at the same time, so directory,
+phone_numbers, analytics and fax_fetch cost the slowest of them, not their sum. Once the
+directory and the fax call log are in, fax_attribution looks up who sent
+each main fax line fax (fax_attribution.py) and extension_resolution
+names the extensions the directory lacks (extension_resolver.py).
+
+Every finished step writes a checkpoint to exports/.pipeline/<date>/.
+With --resume, a rerun reuses each step whose checkpoint is still valid
+and restarts at the first step that is missing or stale - e.g. a failed
+email costs only the send step, not another round of rate-limited fetching.
+
+When a fetch gives up (run deadline, failing endpoint) the run still
+renders and sends what it has, labelled PARTIAL; those checkpoints are
+never reused, so --resume fetches that data again.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import improved_call_logs
+import analyze_fax_senders
+import send_complete_reports
+from report_cache import normalize
+from fax_attribution import attribute_main_line_faxes
+from extension_resolver import unresolved_extension_ids, resolve_extension_ids
+from phone_index import load_phone_numbers
+from live_ingest import load_complete_snapshot
+from api_planner import build_plan, print_plan, record_observations
+from retry_policy import RUN_POLICY, write_partial_marker
+from tracing import set_trace_name, span
+from api_metrics import RUN_METRICS, export_run_metrics
+import profiling
+
+PIPELINE_DIR = 'exports/.pipeline'
+
+def step_auth(ctx):
+    return improved_call_logs.connect_platform()
+
+def step_directory(ctx):
+    directory = improved_call_logs.fetch_extensions_directory(require(ctx, 'auth'))
+    record_observations(extensions=len(directory))
+    return directory
+
+def step_phone_numbers(ctx):
+    # Cached on disk for a day, so usually no request
+    return load_phone_numbers(require(ctx, 'auth'))
+
+def live_snapshot(ctx):
+    """Live-ingested state for the day, if ingestion covered all of it"""
+    with ctx['lock']:
+        if 'live_snapshot' not in ctx:
+            ctx['live_snapshot'] = load_complete_snapshot(ctx['date_str'])
+            if ctx['live_snapshot']:
+                print(f"📡 Using live-ingested state for {ctx['date_str']} instead of fetching")
+    return ctx['live_snapshot']
+
+def step_analytics(ctx):
+    snapshot = live_snapshot(ctx)
+    if snapshot:
+        return snapshot['voice']
+    
+    date_str = ctx['date_str']
+    return improved_call_logs.fetch_voice_calls_from_analytics(require(ctx, 'auth'), date_str, date_str)
+
+def step_fax_fetch(ctx):
+    snapshot = live_snapshot(ctx)
+    if snapshot:
+        return snapshot['records']
+    
+    platform = require(ctx, 'auth')
+    records = improved_call_logs.fetch_fax_call_log(platform, ctx['date_from'], ctx['date_to'], ctx['date_str'])
+    # Feeds the API planner's record-density and latency estimates
+    record_observations(ctx['date_str'], len(records), platform=platform)
+    # Plain dicts (keeping the SDK's 'from_' key) so the checkpoint is JSON
+    return [normalize(record) for record in records]
+
+def step_fax_attribution(ctx):
+    records = require(ctx, 'fax_fetch')
+    # Live-ingested records carry no message references; no login needed then
+    if not any(record.get('message') for record in records):
+        return {}
+    return attribute_main_line_faxes(require(ctx, 'auth'), records, require(ctx, 'directory'))
+
+def step_extension_resolution(ctx):
+    ext_ids = unresolved_extension_ids(require(ctx, 'fax_fetch'), require(ctx, 'directory'))
+    if not ext_ids:
+        return {}
+    return resolve_extension_ids(require(ctx, 'auth'), ext_ids)
+
+def step_aggregate(ctx):
+    # Disabled and departed extensions on top of the Enabled-only directory
+    extensions_directory = dict(require(ctx, 'directory'), **require(ctx, 'extension_resolution'))
+    raw_records = require(ctx, 'fax_fetch')
+    
+    phone_to_extension_map = improved_call_logs.build_phone_to_extension_map(extensions_directory, require(ctx, 'phone_numbers'))
+    grouped_records, validation_stats = improved_call_logs.group_call_records(
+        raw_records, extensions_directory, phone_to_extension_map, require(ctx, 'analytics')
+    )
+    fax_records = analyze_fax_senders.build_fax_records(raw_records, extensions_directory,
+                                                        attributions=require(ctx, 'fax_attribution'))
+    
+    return {
+        'grouped_records': dict(grouped_records),
+        'validation_stats': validation_stats,
+        'fax_records': fax_records
+    }
+
+def step_render(ctx):
+    aggregate = require(ctx, 'aggregate')
+    date_str = ctx['date_str']
+    partial_reasons = ctx['partial'].get('aggregate', [])
+    
+    improved_call_logs.render_call_report(aggregate['grouped_records'], date_str, partial_reasons=partial_reasons)
+    analyze_fax_senders.render_fax_report(aggregate['fax_records'], date_str, partial_reasons=partial_reasons)
+    # Read by send_complete_reports for the PARTIAL banner and subject
+    write_partial_marker(date_str, partial_reasons)
+    
+    return improved_call_logs.call_report_paths(date_str) + analyze_fax_senders.fax_report_paths(date_str)
+
+def step_send(ctx):
+    require(ctx, 'render')
+    if not send_complete_reports.send_email_with_reports(ctx['date_str']):
+        raise RuntimeError("email could not be sent or queued")
+    return {'sent_at': time.time()}
+
+# Steps in dependency order. 'persist': False steps are never checkpointed
+# and only run when a downstream step needs them. 'volatile' steps fetched
+# before the report day was over are re-run on resume.
+STEPS = [
+    {'name': 'auth', 'deps': [], 'run': step_auth, 'persist': False},
+    {'name': 'directory', 'deps': ['auth'], 'run': step_directory},
+    {'name': 'phone_numbers', 'deps': ['auth'], 'run': step_phone_numbers},
+    {'name': 'analytics', 'deps': ['auth'], 'run': step_analytics, 'volatile': True},
+    {'name': 'fax_fetch', 'deps': ['auth'], 'run': step_fax_fetch, 'volatile': True},
+    {'name': 'fax_attribution', 'deps': ['auth', 'directory', 'fax_fetch'], 'run': step_fax_attribution},
+    {'name': 'extension_resolution', 'deps': ['auth', 'directory', 'fax_fetch'], 'run': step_extension_resolution},
+    {'name': 'aggregate', 'deps': ['directory', 'phone_numbers', 'analytics', 'fax_fetch', 'fax_attribution', 'extension_resolution'],
+     'run': step_aggregate},
+    {'name': 'render', 'deps': ['aggregate'], 'run': step_render, 'outputs': True},
+    {'name': 'send', 'deps': ['render'], 'run': step_send},
+]
+STEPS_BY_NAME = {step['name']: step for step in STEPS}
+
+def _hash(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def _file_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime]
+
+def checkpoint_path(ctx, name):
+    return os.path.join(ctx['state_dir'], f"{name}.json")
+
+def load_checkpoint(ctx, name):
+    path = checkpoint_path(ctx, name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_checkpoint(ctx, step, fingerprint, result):
+    """Persist a step's result atomically, with enough to validate it later"""
+    checkpoint = {
+        'step': step['name'],
+        'fingerprint': fingerprint,
+        'finished_at': time.time(),
+        'result_hash': _hash(result),
+        'result': result,
+        'partial': ctx['partial'].get(step['name'], [])
+    }
+    if step.get('outputs'):
+        checkpoint['outputs'] = {path: _file_stamp(path) for path in result if os.path.exists(path)}
+    
+    os.makedirs(ctx['state_dir'], exist_ok=True)
+    path = checkpoint_path(ctx, step['name'])
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+    return checkpoint
+
+def step_fingerprint(ctx, step):
+    """Identity of a step's inputs: the date range plus its upstream results"""
+    return _hash({
+        'step': step['name'],
+        'date_from': ctx['date_from'],
+        'date_to': ctx['date_to'],
+        'upstream': [ctx['result_hashes'].get(dep) for dep in step['deps'] if STEPS_BY_NAME[dep].get('persist', True)]
+    })
+
+def checkpoint_is_valid(ctx, step, checkpoint, fingerprint):
+    """Can this checkpoint stand in for running the step again?"""
+    if not checkpoint or checkpoint['fingerprint'] != fingerprint:
+        return False
+    
+    if checkpoint.get('partial'):
+        # Built from incomplete data - fetch again rather than reuse it
+        return False
+    
+    if step.get('volatile'):
+        # Data fetched before the report day ended may be incomplete
+        day_end = datetime.fromisoformat(ctx['date_to'].replace('Z', '+00:00'))
+        if checkpoint['finished_at'] <= day_end.timestamp():
+            return False
+    
+    if step.get('outputs'):
+        for path in checkpoint['result']:
+            if not os.path.exists(path):
+                return False
+            if path in checkpoint.get('outputs', {}) and _file_stamp(path) != checkpoint['outputs'][path]:
+                return False
+    
+    return True
+
+def require(ctx, name):
+    """Result of an upstream step - from this run, its checkpoint, or run now (auth)"""
+    # Concurrent steps share one login
+    with ctx['lock']:
+        if name not in ctx['results']:
+            step = STEPS_BY_NAME[name]
+            if step.get('persist', True):
+                ctx['results'][name] = load_checkpoint(ctx, name)['result']
+            else:
+                ctx['results'][name] = step['run'](ctx)
+        return ctx['results'][name]
+
+def run_step(ctx, step):
+    """Run one step; returns (result, partial reasons, seconds)"""
+    started = time.time()
+    with span(f"step.{step['name']}", date=ctx['date_str']), RUN_POLICY.tracking() as reasons:
+        result = step['run'](ctx)
+    return result, list(reasons), time.time() - started
+
+def run_pipeline(date_from, date_to, date_str, resume=False):
+    """Run every step for a date, resuming from valid checkpoints if asked
+    
+    Returns True when all steps completed.
+    """
+    ctx = {
+        'date_from': date_from,
+        'date_to': date_to,
+        'date_str': date_str,
+        'state_dir': os.path.join(PIPELINE_DIR, date_str),
+        'results': {},
+        'result_hashes': {},
+        'partial': {},
+        'lock': threading.RLock()
+    }
+    
+    # The run deadline and API accounting count from here
+    RUN_POLICY.start()
+    RUN_METRICS.reset()
+    set_trace_name(date_str)
+    
+    if not resume and os.path.isdir(ctx['state_dir']):
+        shutil.rmtree(ctx['state_dir'])
+    
+    success = run_steps(ctx, resume)
+    
+    fax_records = ctx['results'].get('fax_fetch')
+    export_run_metrics(date_str, success, RUN_POLICY.partial_reasons, extra={
+        'resume': resume,
+        'fax_records': len(fax_records) if fax_records is not None else None
+    })
+    return success
+
+def run_steps(ctx, resume):
+    """Run the steps in waves of ready steps; False as soon as a wave has a failure"""
+    pending = [step for step in STEPS if step.get('persist', True)]  # Others run lazily via require()
+    done = set()
+    
+    while pending:
+        # Every step whose upstream steps are finished can go now
+        ready = [step for step in pending
+                 if all(dep in done or not STEPS_BY_NAME[dep].get('persist', True) for dep in step['deps'])]
+        if not ready:
+            raise RuntimeError(f"pipeline steps with unmet dependencies: {', '.join(step['name'] for step in pending)}")
+        pending = [step for step in pending if step not in ready]
+        
+        to_run = []
+        for step in ready:
+            fingerprint = step_fingerprint(ctx, step)
+            checkpoint = load_checkpoint(ctx, step['name']) if resume else None
+            
+            if checkpoint_is_valid(ctx, step, checkpoint, fingerprint):
+                ctx['result_hashes'][step['name']] = checkpoint['result_hash']
+                done.add(step['name'])
+                print(f"⏭️  {step['name']}: checkpoint still valid, skipping")
+            else:
+                to_run.append((step, fingerprint))
+        
+        if not to_run:
+            continue
+        
+        print(f"\n{'='*60}")
+        print(f"🚀 Step{'s' if len(to_run) > 1 else ''}: {', '.join(step['name'] for step, _ in to_run)}")
+        print('='*60)
+        
+        with ThreadPoolExecutor(max_workers=len(to_run), thread_name_prefix='step') as executor:
+            futures = [(step, fingerprint, executor.submit(run_step, ctx, step)) for step, fingerprint in to_run]
+        
+        failed = []
+        for step, fingerprint, future in futures:
+            name = step['name']
+            try:
+                result, partial, seconds = future.result()
+            except Exception as e:
+                print(f"❌ Step '{name}' failed: {e}")
+                failed.append(name)
+                continue
+            
+            # A step is partial if it gave up on something, or was built from a partial step
+            for dep in step['deps']:
+                partial += [r for r in ctx['partial'].get(dep, []) if r not in partial]
+            if partial:
+                ctx['partial'][name] = partial
+            
+            # Steps that did finish keep their checkpoints, even if a sibling failed
+            checkpoint = save_checkpoint(ctx, step, fingerprint, result)
+            ctx['results'][name] = result
+            ctx['result_hashes'][name] = checkpoint['result_hash']
+            done.add(name)
+            if partial:
+                print(f"⚠️  Step '{name}' completed with PARTIAL data in {seconds:.1f}s")
+            else:
+                print(f"✅ Step '{name}' completed in {seconds:.1f}s")
+        
+        if failed:
+            print(f"💡 Fix the problem and rerun with --resume to continue from '{failed[0]}'")
+            return False
+    
+    return True
+
+def report_dates(date_str=None):
+    """(date_from, date_to, date_str) for a YYYY-MM-DD day, env override, or yesterday"""
+    if date_str is None and os.getenv('REPORT_DATE_STR'):
+        return os.getenv('REPORT_DATE_FROM'), os.getenv('REPORT_DATE_TO'), os.getenv('REPORT_DATE_STR')
+    
+    if date_str is None:
+        date_str = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+    
+    date_obj = datetime.strptime(date_str, "%Y-%m-%d")
+    return (
+        date_obj.strftime("%Y-%m-%dT00:00:00.000Z"),
+        date_obj.strftime("%Y-%m-%dT23:59:59.999Z"),
+        date_str
+    )
+
+def print_status(date_str):
+    """Show which steps have a checkpoint for a date"""
+    ctx = {'state_dir': os.path.join(PIPELINE_DIR, date_str)}
+    print(f"📋 Pipeline checkpoints for {date_str}:")
+    for step in STEPS:
+        if not step.get('persist', True):
+            continue
+        checkpoint = load_checkpoint(ctx, step['name'])
+        if checkpoint:
+            finished = datetime.fromtimestamp(checkpoint['finished_at'], tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')
+            if checkpoint.get('partial'):
+                print(f"   ⚠️  {step['name']:<10} finished {finished} (PARTIAL: {'; '.join(checkpoint['partial'])})")
+            else:
+                print(f"   ✅ {step['name']:<10} finished {finished}")
+        else:
+            print(f"   ⬜ {step['name']:<10} not run")
+
+def main():
+    # --profile: per-phase CPU profiles and allocation snapshots (see profiling.py)
+    profiling.enable_from_argv()
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    date_from, date_to, date_str = report_dates(args[0] if args else None)
+    
+    if '--status' in sys.argv:
+        print_status(date_str)
+        return
+    
+    if '--dry-run' in sys.argv:
+        print_plan(build_plan([date_str]))
+        return
+    
+    if not run_pipeline(date_from, date_to, date_str, resume='--resume' in sys.argv):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
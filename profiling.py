@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Profiling - CPU profiles and allocation snapshots per phase, for --profile runs
+With --profile, every top-level tracing span (auth, directory, call_log,
+extract, render.calls, smtp.send, pipeline step.* ...) gets its own cProfile
+profile, and a tracemalloc snapshot is taken when it ends. Time spent
+outside any phase goes to the 'main' profile. Files go to
+exports/.profiles/<timestamp>-<script>/:
+    NN-<phase>.prof        # python -m pstats FILE, snakeviz FILE
+    NN-<phase>.tracemalloc # tracemalloc.Snapshot.load(FILE)
+    summary.txt            # Slowest functions and largest allocations per phase
+
+Spans nested inside a profiled phase are part of that phase's profile.
+
+Usage:
+    python improved_call_logs.py --profile
+    python generate_specific_date_report.py 2025-11-20 --profile
+    python profiling.py exports/.profiles/20251121-070001-pipeline   # Print summary.txt
+"""
+
+import os
+import sys
+import time
+import atexit
+import itertools
+import threading
+from contextlib import contextmanager
+
+import tracing
+
+# cProfile, pstats and tracemalloc are imported by the functions that need
+# them; every entry point imports this module, most runs never profile
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'exports/.profiles')
+
+# Stack depth recorded per allocation
+TRACEMALLOC_FRAMES = 10
+# Lines per phase in summary.txt
+SUMMARY_TOP = 15
+
+_lock = threading.Lock()
+_local = threading.local()
+_run_dir = None
+_main_profiler = None
+_main_thread = None
+_phases = []
+_file_numbers = itertools.count(1)
+
+def enabled():
+    return _run_dir is not None
+
+def enable(name=None):
+    """Start profiling this process; returns the output directory"""
+    import cProfile
+    import tracemalloc
+    global _run_dir, _main_profiler, _main_thread
+    if _run_dir:
+        return _run_dir
+    
+    name = name or os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'python'
+    _run_dir = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}")
+    os.makedirs(_run_dir, exist_ok=True)
+    
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+    tracing.set_phase_hook(phase)
+    _main_thread = threading.current_thread()
+    _main_profiler = cProfile.Profile()
+    _main_profiler.enable()
+    atexit.register(finish)
+    
+    print(f"🔬 Profiling to {_run_dir}/")
+    return _run_dir
+
+def enable_from_argv():
+    """Handle --profile (and take it out of sys.argv so positional dates still parse)"""
+    if '--profile' in sys.argv:
+        sys.argv.remove('--profile')
+        enable()
+
+def _file_base(name):
+    with _lock:
+        index = next(_file_numbers)
+    safe = ''.join(c if c.isalnum() or c in '._-' else '_' for c in name)
+    return os.path.join(_run_dir, f"{index:02d}-{safe}")
+
+def _save(name, profiler, seconds):
+    import tracemalloc
+    base = _file_base(name)
+    profiler.dump_stats(f"{base}.prof")
+    tracemalloc.take_snapshot().dump(f"{base}.tracemalloc")
+    current, peak = tracemalloc.get_traced_memory()
+    with _lock:
+        _phases.append({
+            'name': name,
+            'file': base,
+            'seconds': seconds,
+            'thread': threading.current_thread().name,
+            'traced_mb': current / (1024 * 1024),
+            'peak_mb': peak / (1024 * 1024)
+        })
+
+@contextmanager
+def phase(name):
+    """Profile one phase in this thread (a no-op inside another phase)"""
+    if getattr(_local, 'active', False) or not _run_dir:
+        yield
+        return
+    
+    import cProfile
+    in_main = threading.current_thread() is _main_thread and _main_profiler is not None
+    if in_main:
+        _main_profiler.disable()
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+ allows one active profiler per process, so a phase
+        # running concurrently with another one is left out
+        profiler = None
+    
+    _local.active = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _local.active = False
+        if profiler:
+            profiler.disable()
+            _save(name, profiler, time.perf_counter() - started)
+        if in_main:
+            _main_profiler.enable()
+
+def write_summary(path=None):
+    """Slowest functions (cumulative) and largest allocation sites for each phase"""
+    import cProfile
+    import pstats
+    import tracemalloc
+    path = path or os.path.join(_run_dir, 'summary.txt')
+    with open(path, 'w') as out:
+        out.write(f"Profile of {' '.join(sys.argv)}\n")
+        for entry in _phases:
+            out.write(f"\n{'=' * 78}\n{os.path.basename(entry['file'])}: {entry['seconds']:.2f}s "
+                      f"in {entry['thread']}, {entry['traced_mb']:.1f} MB traced (peak so far {entry['peak_mb']:.1f} MB)\n")
+            stats = pstats.Stats(f"{entry['file']}.prof", stream=out)
+            stats.sort_stats('cumulative').print_stats(SUMMARY_TOP)
+            
+            out.write("Largest allocations still alive at the end of the phase:\n")
+            snapshot = tracemalloc.Snapshot.load(f"{entry['file']}.tracemalloc").filter_traces([
+                tracemalloc.Filter(False, cProfile.__file__),
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__)
+            ])
+            for stat in snapshot.statistics('lineno')[:SUMMARY_TOP // 2]:
+                out.write(f"   {stat}\n")
+    return path
+
+def finish():
+    """Close the main profile and write summary.txt (runs at exit)"""
+    import pstats
+    import tracemalloc
+    global _main_profiler
+    if not _run_dir or _main_profiler is None:
+        return
+    profiler, _main_profiler = _main_profiler, None
+    profiler.disable()
+    # Wall time outside the phases, as measured by the profiler
+    _save('main', profiler, pstats.Stats(profiler).total_tt)
+    tracing.set_phase_hook(None)
+    tracemalloc.stop()
+    
+    summary = write_summary()
+    print(f"\n🔬 Profiles written to {_run_dir}/")
+    for entry in sorted((e for e in _phases if e['name'] != 'main'), key=lambda e: -e['seconds'])[:5]:
+        print(f"   {entry['name']:<24}{entry['seconds']:>8.2f}s  {os.path.basename(entry['file'])}.prof")
+    print(f"   Summary: {summary}")
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if not args:
+        runs = sorted(os.listdir(PROFILE_DIR)) if os.path.isdir(PROFILE_DIR) else []
+        if not runs:
+            print(f"📭 No profiles in {PROFILE_DIR}")
+            sys.exit(1)
+        args = [os.path.join(PROFILE_DIR, runs[-1])]
+    with open(os.path.join(args[0], 'summary.txt'), 'r') as f:
+        print(f.read())
+
+if __name__ == "__main__":
+    main()
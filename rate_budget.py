@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Rate Budget - Per-account request budgets for RingCentral usage-plan groups
+RingCentral limits each account per usage group (Heavy / Medium / Light /
+Auth) over a rolling window. A RateBudget paces one account's requests
+evenly within those limits (the schedule api_planner.py predicts), and
+BudgetedPlatform wraps an SDK platform so every get/post waits for budget
+first and backs off only its own account on 429. Retries, the run deadline
+and the circuit breaker come from retry_policy.py.
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+
+from retry_policy import RUN_POLICY, http_status, response_headers
+from api_metrics import RUN_METRICS, payload_size, response_status
+
+# Requests allowed per usage group per window (seconds), per account
+DEFAULT_RATE_LIMITS = {
+    'heavy': {'requests': 10, 'window': 60},
+    'medium': {'requests': 40, 'window': 60},
+    'light': {'requests': 50, 'window': 60},
+    'auth': {'requests': 5, 'window': 60},
+}
+
+# Endpoint groups used by the reports and the usage group each belongs to
+# (first matching path fragment wins)
+ENDPOINT_GROUPS = [
+    ('/analytics/', 'analytics', 'heavy'),
+    ('/call-log', 'call-log', 'heavy'),
+    ('/message-store', 'message-store', 'light'),
+    ('/phone-number', 'phone-number', 'heavy'),
+    ('/subscription', 'subscription', 'medium'),
+    ('/extension', 'extension', 'medium'),
+    ('/oauth/', 'auth', 'auth'),
+]
+
+def endpoint_group(path):
+    """(endpoint group, usage group) for an API path"""
+    for fragment, group, usage_group in ENDPOINT_GROUPS:
+        if fragment in path:
+            return group, usage_group
+    return 'other', 'light'
+
+class RateBudget:
+    """Request budget for one account: one request per window/limit seconds per group
+    
+    Even pacing never bursts into a 429, and it is what api_planner.py
+    simulates, so the plan and the actual run agree.
+    """
+    
+    def __init__(self, limits=None):
+        self.limits = {group: dict(limit) for group, limit in DEFAULT_RATE_LIMITS.items()}
+        for group, limit in (limits or {}).items():
+            self.limits.setdefault(group, {}).update(limit)
+        self._lock = threading.Lock()
+        self._next_allowed = {group: 0 for group in self.limits}
+        self._blocked_until = {group: 0 for group in self.limits}
+    
+    def interval(self, usage_group):
+        limit = self.limits[usage_group]
+        return limit['window'] / limit['requests']
+    
+    def reserve(self, usage_group):
+        """Take one request from the budget; returns 0, or seconds to wait first"""
+        with self._lock:
+            now = time.time()
+            ready_at = max(self._next_allowed[usage_group], self._blocked_until[usage_group])
+            if now < ready_at:
+                return ready_at - now
+            
+            self._next_allowed[usage_group] = now + self.interval(usage_group)
+            return 0
+    
+    def block(self, usage_group, seconds):
+        """Stop spending a usage group for a while (429 / exhausted window)"""
+        with self._lock:
+            self._blocked_until[usage_group] = max(self._blocked_until[usage_group], time.time() + seconds)
+    
+    def observe(self, usage_group, headers):
+        """Follow the server's own count when it reports the window is used up"""
+        try:
+            remaining = int(headers.get('X-Rate-Limit-Remaining'))
+            window = int(headers.get('X-Rate-Limit-Window', self.limits[usage_group]['window']))
+        except (TypeError, ValueError):
+            return
+        if remaining <= 0:
+            self.block(usage_group, window)
+
+class WorkerSlots:
+    """The shared worker pool: how many fetches may do work at once
+    
+    A fetch holds a slot while it works and gives it back while it waits
+    for rate-limit budget, so a backing-off account never idles the others.
+    """
+    
+    def __init__(self, size):
+        self.size = size
+        self._semaphore = threading.Semaphore(size)
+    
+    @contextmanager
+    def held(self):
+        self._semaphore.acquire()
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+    
+    def wait(self, seconds):
+        """Sleep without occupying a slot (call only while holding one)"""
+        self._semaphore.release()
+        try:
+            time.sleep(seconds)
+        finally:
+            self._semaphore.acquire()
+
+class BudgetedPlatform:
+    """SDK platform wrapper that spends one account's RateBudget per request"""
+    
+    def __init__(self, platform, budget=None, slots=None, name='', policy=None, metrics=None):
+        self._platform = platform
+        self.budget = budget or RateBudget()
+        self.slots = slots
+        self.name = name
+        self.policy = policy or RUN_POLICY
+        self.metrics = metrics or RUN_METRICS
+        # Observed by api_planner.py to calibrate its latency estimate
+        self.requests = 0
+        self.request_seconds = 0.0
+    
+    def _wait(self, seconds):
+        if self.slots:
+            self.slots.wait(seconds)
+        else:
+            time.sleep(seconds)
+    
+    def _request(self, method, path, *args, **kwargs):
+        group, usage_group = endpoint_group(path)
+        label = f"{self.name}: {group}" if self.name else group
+        
+        def wait_for(reason):
+            def wait(seconds):
+                self.metrics.record_wait(group, reason, seconds, account=self.name)
+                self._wait(seconds)
+            return wait
+        
+        def attempt():
+            while True:
+                wait = self.budget.reserve(usage_group)
+                if wait <= 0:
+                    break
+                self.policy.wait(wait, wait_for('rate_budget'), reason=f"{label} rate budget")
+            
+            started = time.time()
+            try:
+                response = getattr(self._platform, method)(path, *args, **kwargs)
+            except Exception as e:
+                self._count(group, http_status(e), time.time() - started)
+                raise
+            self._count(group, response_status(response), time.time() - started, payload_size(response))
+            self.budget.observe(usage_group, response_headers(response))
+            return response
+        
+        # A 429 pauses the whole usage group of this account, not just this call
+        return self.policy.call(
+            attempt, label, sleep=wait_for('backoff'),
+            on_rate_limited=lambda seconds: self.budget.block(usage_group, seconds)
+        )
+    
+    def _count(self, group, status, seconds, size=0):
+        self.requests += 1
+        self.request_seconds += seconds
+        self.metrics.record_request(group, status, seconds, size, account=self.name)
+    
+    def get(self, path, *args, **kwargs):
+        return self._request('get', path, *args, **kwargs)
+    
+    def post(self, path, *args, **kwargs):
+        return self._request('post', path, *args, **kwargs)
+    
+    def __getattr__(self, name):
+        # auth(), refresh(), login() ... go straight to the SDK platform
+        return getattr(self._platform, name)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Record Store - In-memory call-log records per report date
+Records are bucketed by the UTC day of their startTime and deduplicated by
+record id, so overlapping fetches can simply be added again
+"""
+
+import os
+import json
+import threading
+
+from report_cache import normalize
+
+PIPELINE_DIR = 'exports/.pipeline'
+
+def record_date(record):
+    """UTC report date (YYYY-MM-DD) of a call-log record, or '' if unknown"""
+    return str(record.get('startTime') or '')[:10]
+
+class RecordStore:
+    """Thread-safe store of normalized call-log records, keyed by date and id"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._days = {}      # {date_str: {record_id: record}}
+        self._synced = {}    # {date_str: epoch seconds of the last completed sync}
+    
+    def add_records(self, records, date_str=None):
+        """Add (or replace) records; returns how many ids were new"""
+        added = 0
+        with self._lock:
+            for record in records:
+                record = normalize(record)
+                record_id = str(record.get('id') or '')
+                day = date_str or record_date(record)
+                if not record_id or not day:
+                    continue
+                bucket = self._days.setdefault(day, {})
+                if record_id not in bucket:
+                    added += 1
+                bucket[record_id] = record
+        return added
+    
+    def records(self, date_str):
+        """All records for a date, oldest first"""
+        with self._lock:
+            records = list(self._days.get(date_str, {}).values())
+        return sorted(records, key=lambda r: r.get('startTime') or '')
+    
+    def count(self, date_str):
+        with self._lock:
+            return len(self._days.get(date_str, {}))
+    
+    def drop(self, date_str):
+        """Forget a date's records (long-running ingesters let old days go)"""
+        with self._lock:
+            self._days.pop(date_str, None)
+            self._synced.pop(date_str, None)
+    
+    def mark_synced(self, date_str, synced_at):
+        with self._lock:
+            self._synced[date_str] = synced_at
+    
+    def last_synced(self, date_str):
+        with self._lock:
+            return self._synced.get(date_str)
+    
+    def load_pipeline_checkpoint(self, date_str):
+        """Warm a date from a finished pipeline run's fax_fetch checkpoint
+        
+        Returns True when a checkpoint was found.
+        """
+        path = os.path.join(PIPELINE_DIR, date_str, 'fax_fetch.json')
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, 'r') as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return False
+        
+        self.add_records(checkpoint['result'], date_str)
+        self.mark_synced(date_str, checkpoint['finished_at'])
+        return True
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Report Cache - Skip re-rendering reports whose inputs have not changed
+Each artifact is keyed by a hash of its normalized input records, its
+rendering parameters and the source code that renders it
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import time
+
+CACHE_DIR = 'exports/.cache'
+MANIFEST_FILE = os.path.join(CACHE_DIR, 'artifacts.json')
+SUMMARY_DIR = os.path.join(CACHE_DIR, 'summaries')
+
+# Reports render on several threads at once (multi_account.py workers,
+# report_service.py requests); manifest updates are read-modify-write
+_manifest_lock = threading.Lock()
+
+def normalize(obj):
+    """Convert SDK JsonObjects / dicts / lists into plain, JSON-ready values"""
+    if hasattr(obj, '__dict__') and not isinstance(obj, type):
+        obj = obj.__dict__
+    if isinstance(obj, dict):
+        return {str(k): normalize(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [normalize(v) for v in obj]
+    return obj
+
+def _canonical(obj):
+    return json.dumps(normalize(obj), sort_keys=True, separators=(',', ':'), default=str)
+
+def code_version(*source_files):
+    """Hash of the source files that render an artifact"""
+    digest = hashlib.sha256()
+    for path in source_files:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def records_key(records, params, source_files):
+    """Content key for a set of input records plus rendering parameters
+    
+    Record order does not matter: each record is canonicalized and the
+    sorted encodings are hashed. `records` may be a list or a dict of
+    lists (e.g. records grouped by extension).
+    """
+    digest = hashlib.sha256()
+    digest.update(_canonical(params).encode('utf-8'))
+    digest.update(code_version(*source_files).encode('utf-8'))
+    
+    groups = records.items() if isinstance(records, dict) else [('', records)]
+    for group_key, group in sorted(groups, key=lambda item: str(item[0])):
+        digest.update(f"\x00{group_key}\x00".encode('utf-8'))
+        for encoded in sorted(_canonical(r) for r in group):
+            digest.update(encoded.encode('utf-8'))
+            digest.update(b'\n')
+    
+    return digest.hexdigest()
+
+def file_key(path, source_files=()):
+    """Content key for a file (plus the code that reads it)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    if source_files:
+        digest.update(code_version(*source_files).encode('utf-8'))
+    return digest.hexdigest()
+
+def _load_manifest():
+    if not os.path.exists(MANIFEST_FILE):
+        return {}
+    try:
+        with open(MANIFEST_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_json(path, data, **dump_args):
+    """Write JSON atomically through a temp file of its own (concurrent writers never share one)"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, **dump_args)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _save_manifest(manifest):
+    _write_json(MANIFEST_FILE, manifest, indent=2, sort_keys=True)
+
+def _file_stamp(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+def is_fresh(paths, key):
+    """True when every artifact exists, is unmodified, and was built from `key`"""
+    manifest = _load_manifest()
+    for path in paths:
+        entry = manifest.get(path)
+        if not entry or entry['key'] != key or not os.path.exists(path):
+            return False
+        if _file_stamp(path) != entry['stamp']:
+            return False
+    return True
+
+def record_artifacts(paths, key):
+    """Remember which key each freshly rendered artifact was built from"""
+    with _manifest_lock:
+        manifest = _load_manifest()
+        for path in paths:
+            if os.path.exists(path):
+                manifest[path] = {'key': key, 'stamp': _file_stamp(path), 'rendered_at': time.time()}
+        _save_manifest(manifest)
+
+def render_if_changed(paths, key, render):
+    """Call render() only when the artifacts are missing or their inputs changed
+    
+    Returns True when the artifacts were rendered, False when reused.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    
+    if is_fresh(paths, key):
+        for path in paths:
+            print(f"♻️  Inputs unchanged - reusing {path}")
+        return False
+    
+    render()
+    record_artifacts(paths, key)
+    return True
+
+def cached_summary(path, loader, source_files=()):
+    """Load a report summary, reusing the parsed result for identical files"""
+    if not os.path.exists(path):
+        return loader()
+    
+    key = file_key(path, source_files)
+    summary_path = os.path.join(SUMMARY_DIR, f"{key}.json")
+    
+    if os.path.exists(summary_path):
+        try:
+            with open(summary_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    
+    summary = loader()
+    if summary is not None:
+        _write_json(summary_path, summary, default=str)
+    return summary
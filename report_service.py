@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Report Service - Long-running daemon that keeps RingCentral data warm
+One authenticated platform (refreshed in the background), the extension
+directory and a record store stay in memory, so on-demand reports and
+intraday summaries do not pay for a cold start
+
+Usage:
+    python report_service.py            # Serve on http://127.0.0.1:8765
+
+API (JSON):
+    GET /health                         # Token, directory and store status
+    GET /summary                        # Today so far (served from memory)
+    GET /summary?date=2025-11-20        # Any day (fetched once, then cached)
+    GET /report?date=2025-11-20         # Render the Excel/Parquet reports, return paths
+
+Set REPORT_SERVICE_SOCKET=/path/to.sock to listen on a Unix socket instead.
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+import socketserver
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import improved_call_logs
+import analyze_fax_senders
+from record_store import RecordStore
+from call_log_view import fetch_call_log_page
+from extension_resolver import resolve_directory
+from phone_index import load_phone_numbers
+from retry_policy import RUN_POLICY
+
+SERVICE_HOST = os.getenv('REPORT_SERVICE_HOST', '127.0.0.1')
+SERVICE_PORT = int(os.getenv('REPORT_SERVICE_PORT', '8765'))
+SERVICE_SOCKET = os.getenv('REPORT_SERVICE_SOCKET', '')
+
+# How often today's records are pulled in the background
+TODAY_REFRESH_SECONDS = int(os.getenv('TODAY_REFRESH_SECONDS', '120'))
+# How long the extension directory is trusted before refetching
+DIRECTORY_TTL_SECONDS = 60 * 60
+# Token check interval; access tokens are refreshed before they expire
+TOKEN_CHECK_SECONDS = 60
+# Incremental fetches start a little before the last sync to catch late records
+SYNC_OVERLAP_SECONDS = 5 * 60
+
+def iso_utc(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+def day_range(date_str):
+    return f"{date_str}T00:00:00.000Z", f"{date_str}T23:59:59.999Z"
+
+def day_end_timestamp(date_str):
+    day_start = datetime.strptime(date_str, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    return (day_start + timedelta(days=1)).timestamp()
+
+def today_str():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+class ReportService:
+    """Warm state shared by every API request"""
+    
+    def __init__(self):
+        self.store = RecordStore()
+        self._platform = None
+        self._platform_lock = threading.Lock()
+        self._directory = None
+        self._phone_map = None
+        self._directory_fetched_at = 0
+        self._directory_lock = threading.Lock()
+        self._analytics = {}             # {date_str: (voice_by_extension, fetched_at)}
+        self._sync_locks = {}
+        self._sync_locks_guard = threading.Lock()
+        self.started_at = time.time()
+    
+    # ---- Auth ----
+    
+    def platform(self):
+        """The shared authenticated platform, refreshed or re-logged-in as needed"""
+        with self._platform_lock:
+            if self._platform is None:
+                self._platform = improved_call_logs.connect_platform()
+            elif not self._platform.auth().access_token_valid():
+                try:
+                    self._platform.refresh()
+                    print("🔄 Access token refreshed")
+                except Exception as e:
+                    # JWT logins may have no usable refresh token - log in again
+                    print(f"⚠️  Token refresh failed ({e}), logging in again")
+                    self._platform = improved_call_logs.connect_platform()
+            return self._platform
+    
+    # ---- Directory ----
+    
+    def directory(self):
+        """(extensions_directory, phone_to_extension_map), refetched after the TTL"""
+        with self._directory_lock:
+            if self._directory is None or time.time() - self._directory_fetched_at > DIRECTORY_TTL_SECONDS:
+                directory = improved_call_logs.fetch_extensions_directory(self.platform())
+                if directory or self._directory is None:
+                    self._directory = directory
+                    self._phone_map = improved_call_logs.build_phone_to_extension_map(directory, load_phone_numbers(self.platform()))
+                self._directory_fetched_at = time.time()
+            return self._directory, self._phone_map
+    
+    # ---- Records ----
+    
+    def _sync_lock(self, date_str):
+        with self._sync_locks_guard:
+            return self._sync_locks.setdefault(date_str, threading.Lock())
+    
+    def analytics(self, date_str, refresh=False):
+        """Analytics voice counts for a date; finished days are fetched once"""
+        cached = self._analytics.get(date_str)
+        if cached and not refresh:
+            voice_data, fetched_at = cached
+            # Intraday counts are refreshed in the background, so a slightly
+            # stale value is served rather than waiting on the API
+            if fetched_at > day_end_timestamp(date_str) or time.time() - fetched_at <= 2 * TODAY_REFRESH_SECONDS:
+                return voice_data
+        voice_data = improved_call_logs.fetch_voice_calls_from_analytics(self.platform(), date_str, date_str)
+        self._analytics[date_str] = (voice_data, time.time())
+        return voice_data
+    
+    def sync_day(self, date_str):
+        """Make sure the record store holds a date's fax records
+        
+        Finished days are loaded once (from a pipeline checkpoint if one
+        exists); the current day is topped up with an incremental fetch.
+        """
+        with self._sync_lock(date_str):
+            synced_at = self.store.last_synced(date_str)
+            day_end = day_end_timestamp(date_str)
+            
+            if synced_at and synced_at > day_end:
+                return  # Complete - nothing more can arrive for this day
+            
+            if not synced_at and self.store.load_pipeline_checkpoint(date_str):
+                if self.store.last_synced(date_str) > day_end:
+                    print(f"♻️  Loaded {self.store.count(date_str)} records for {date_str} from pipeline checkpoint")
+                    return
+                synced_at = self.store.last_synced(date_str)
+            
+            date_from, date_to = day_range(date_str)
+            sync_started = time.time()
+            platform = self.platform()
+            
+            if synced_at:
+                # Only what arrived since the last sync (plus a small overlap)
+                date_from = iso_utc(synced_at - SYNC_OVERLAP_SECONDS)
+                records = fetch_fax_records_since(platform, date_from, date_to)
+            else:
+                records = improved_call_logs.fetch_fax_call_log(platform, date_from, date_to, date_str)
+            
+            added = self.store.add_records(records, date_str)
+            self.store.mark_synced(date_str, sync_started)
+            print(f"📥 {date_str}: +{added} records ({self.store.count(date_str)} total)")
+    
+    # ---- Reports ----
+    
+    def aggregate(self, date_str):
+        """Grouped call records and fax records for a date from the warm store"""
+        extensions_directory, phone_map = self.directory()
+        is_today = date_str == today_str()
+        
+        if not (is_today and self.store.last_synced(date_str)):
+            self.sync_day(date_str)  # Today is kept fresh by the background refresher
+        
+        records = self.store.records(date_str)
+        voice_data = self.analytics(date_str)
+        # Departed staff are looked up once, then answered from the resolver's cache
+        resolved_directory = resolve_directory(self.platform(), records, extensions_directory)
+        if resolved_directory is not extensions_directory:
+            # The cached map only knows the Enabled directory's names
+            phone_map = improved_call_logs.build_phone_to_extension_map(resolved_directory, load_phone_numbers(self.platform()))
+            extensions_directory = resolved_directory
+        grouped_records, _ = improved_call_logs.group_call_records(records, extensions_directory, phone_map, voice_data)
+        # Main fax line faxes credited to their senders (message lookups are cached)
+        fax_records = analyze_fax_senders.build_fax_records(records, extensions_directory, self.platform())
+        return grouped_records, fax_records
+    
+    def summary(self, date_str):
+        """Per-extension call/fax stats and totals as plain JSON"""
+        grouped_records, fax_records = self.aggregate(date_str)
+        extensions = [
+            stats for stats in improved_call_logs.compute_extension_stats(grouped_records)
+            if stats['extension_number']
+        ]
+        sender_stats = analyze_fax_senders.compute_sender_stats(fax_records)
+        
+        return {
+            'date': date_str,
+            'as_of': self.store.last_synced(date_str),
+            'totals': {
+                'calls': sum(s['total_calls'] for s in extensions),
+                'faxes_sent': sum(1 for r in fax_records if r['direction'] == 'Outbound'),
+                'faxes_received': sum(1 for r in fax_records if r['direction'] != 'Outbound'),
+                'active_extensions': len(extensions)
+            },
+            'extensions': extensions,
+            'fax_senders': dict(sender_stats)
+        }
+    
+    def report(self, date_str):
+        """Render the report files for a date and return their paths"""
+        grouped_records, fax_records = self.aggregate(date_str)
+        improved_call_logs.render_call_report(grouped_records, date_str)
+        analyze_fax_senders.render_fax_report(fax_records, date_str)
+        return improved_call_logs.call_report_paths(date_str) + analyze_fax_senders.fax_report_paths(date_str)
+    
+    def health(self):
+        platform = self._platform
+        return {
+            'status': 'ok',
+            'uptime_seconds': int(time.time() - self.started_at),
+            'authenticated': bool(platform and platform.auth().access_token_valid()),
+            'directory_size': len(self._directory or {}),
+            'today': {'records': self.store.count(today_str()), 'synced_at': self.store.last_synced(today_str())}
+        }
+    
+    # ---- Background work ----
+    
+    def _keep_token_fresh(self):
+        while True:
+            time.sleep(TOKEN_CHECK_SECONDS)
+            try:
+                self.platform()
+            except Exception as e:
+                print(f"⚠️  Token check failed: {e}")
+    
+    def _keep_today_fresh(self):
+        while True:
+            try:
+                date_str = today_str()
+                self.sync_day(date_str)
+                self.analytics(date_str, refresh=True)
+            except Exception as e:
+                print(f"⚠️  Refresh of today's records failed: {e}")
+            time.sleep(TODAY_REFRESH_SECONDS)
+    
+    def start_background_threads(self):
+        for target, name in ((self._keep_token_fresh, 'token-refresher'), (self._keep_today_fresh, 'today-refresher')):
+            threading.Thread(target=target, name=name, daemon=True).start()
+
+def fetch_fax_records_since(platform, date_from, date_to, per_page=1000):
+    """Fax call-log records in a (short) range, following pages"""
+    records = []
+    page = 1
+    while True:
+        response_data = fetch_call_log_page(platform, date_from, date_to, per_page, page)
+        page_records = response_data['records']
+        records.extend(page_records)
+        
+        if len(page_records) < per_page or not improved_call_logs.has_next_page(response_data):
+            break
+        page += 1
+    return records
+
+def make_handler(service):
+    """HTTP request handler bound to one ReportService"""
+    
+    class ReportRequestHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload, default=str).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            date_str = query.get('date', [today_str()])[0]
+            
+            try:
+                datetime.strptime(date_str, "%Y-%m-%d")
+            except ValueError:
+                self._send_json(400, {'error': f"invalid date '{date_str}', expected YYYY-MM-DD"})
+                return
+            
+            try:
+                if url.path == '/health':
+                    self._send_json(200, service.health())
+                elif url.path == '/summary':
+                    self._send_json(200, service.summary(date_str))
+                elif url.path == '/report':
+                    self._send_json(200, {'date': date_str, 'files': service.report(date_str)})
+                else:
+                    self._send_json(404, {'error': f"unknown endpoint {url.path}"})
+            except Exception as e:
+                print(f"❌ {url.path} failed: {e}")
+                self._send_json(500, {'error': str(e)})
+        
+        def address_string(self):
+            # Unix socket clients have no address
+            return self.client_address[0] if self.client_address else 'unix'
+        
+        def log_message(self, format, *args):
+            print(f"🌐 {self.address_string()} - {format % args}")
+    
+    return ReportRequestHandler
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def create_server(service):
+    handler = make_handler(service)
+    if SERVICE_SOCKET:
+        if os.path.exists(SERVICE_SOCKET):
+            os.remove(SERVICE_SOCKET)
+        return ThreadingUnixHTTPServer(SERVICE_SOCKET, handler), f"unix:{SERVICE_SOCKET}"
+    return ThreadingHTTPServer((SERVICE_HOST, SERVICE_PORT), handler), f"http://{SERVICE_HOST}:{SERVICE_PORT}"
+
+def main():
+    print("🛰️  RINGCENTRAL REPORT SERVICE")
+    print("=" * 60)
+    
+    # A service has no run deadline; calls still back off and trip the circuit breaker
+    RUN_POLICY.start(None)
+    
+    service = ReportService()
+    try:
+        service.platform()
+        service.directory()
+    except Exception as e:
+        print(f"❌ Startup failed: {e}")
+        sys.exit(1)
+    
+    service.start_background_threads()
+    server, address = create_server(service)
+    print(f"🚀 Serving on {address} (Ctrl+C to stop)")
+    
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopped")
+    finally:
+        server.server_close()
+        if SERVICE_SOCKET and os.path.exists(SERVICE_SOCKET):
+            os.remove(SERVICE_SOCKET)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Retry Policy - One deadline-aware retry policy for every RingCentral call
+- Jittered exponential backoff for 429s (honouring Retry-After), 5xx and
+  connection errors; other 4xx errors, and exceptions that are not about
+  the transport (bugs in the calling code), are not retried
+- A whole-run deadline: a wait that would overrun it raises BudgetExhausted
+  instead of sleeping
+- A circuit breaker that stops calling an endpoint group after repeated
+  5xx errors, and tries again after a cooldown
+
+When a fetch gives up it calls mark_partial(), and the report for that
+run is written from the data gathered so far and labelled PARTIAL.
+"""
+
+import os
+import json
+import time
+import random
+import threading
+from contextlib import contextmanager
+
+import requests
+
+# Total time a run may spend; the Actions job is given a little more
+RUN_DEADLINE_SECONDS = int(os.getenv('RUN_DEADLINE_SECONDS', str(45 * 60)))
+
+MAX_ATTEMPTS = 6
+BASE_DELAY = 2
+MAX_DELAY = 120
+DEFAULT_RETRY_AFTER = 60
+
+# Circuit breaker: this many 5xx/connection failures in a row opens the
+# circuit for an endpoint group for COOLDOWN seconds
+FAILURE_THRESHOLD = 5
+COOLDOWN_SECONDS = 120
+
+class BudgetExhausted(Exception):
+    """The run deadline does not leave time for another attempt"""
+
+class CircuitOpen(Exception):
+    """An endpoint group keeps failing with server errors"""
+
+def http_status(error):
+    """HTTP status of an SDK ApiException (0 when there is no response)"""
+    try:
+        return error.api_response().response().status_code
+    except Exception:
+        return 0
+
+def response_headers(response_or_error):
+    """Headers of an SDK ApiResponse or ApiException ({} when unavailable)"""
+    try:
+        if hasattr(response_or_error, 'api_response'):
+            response_or_error = response_or_error.api_response()
+        return response_or_error.response().headers or {}
+    except Exception:
+        return {}
+
+def is_transport_error(error):
+    """Whether an error without an HTTP response came from the network
+    
+    The SDK wraps transport failures in an ApiException with no response;
+    the original requests/socket error is its __context__.
+    """
+    while error is not None:
+        if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return True
+        if isinstance(error, OSError) and not isinstance(error, requests.exceptions.RequestException):
+            return True
+        if not hasattr(error, 'api_response'):
+            return False
+        error = error.__cause__ or error.__context__
+    return False
+
+def is_retryable(error):
+    """429s, 5xx and transport errors without any HTTP response (timeouts, resets)"""
+    if isinstance(error, (BudgetExhausted, CircuitOpen)):
+        return False
+    status = http_status(error)
+    if status:
+        return status == 429 or status >= 500
+    return is_transport_error(error)
+
+class RetryPolicy:
+    """Retry state shared by every call in one run"""
+    
+    def __init__(self, deadline_seconds=RUN_DEADLINE_SECONDS):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.start(deadline_seconds)
+    
+    def start(self, deadline_seconds=RUN_DEADLINE_SECONDS):
+        """(Re)start the run clock, e.g. at the beginning of each pipeline run
+        
+        Long-running services pass None: no deadline, only backoff and the
+        circuit breaker.
+        """
+        with self._lock:
+            self.deadline = time.time() + deadline_seconds if deadline_seconds is not None else float('inf')
+            self._failures = {}
+            self._open_until = {}
+            self.partial_reasons = []
+    
+    def remaining(self):
+        return self.deadline - time.time()
+    
+    def backoff(self, attempt, retry_after=None):
+        """Seconds before the next attempt: Retry-After, or full-jitter exponential"""
+        if retry_after is not None:
+            return retry_after + random.uniform(0, 1)
+        return random.uniform(0, min(MAX_DELAY, BASE_DELAY * (2 ** attempt)))
+    
+    def wait(self, seconds, sleep=time.sleep, reason='retry'):
+        """Sleep, unless that would run past the deadline"""
+        if seconds > self.remaining():
+            raise BudgetExhausted(f"{reason}: waiting {seconds:.0f}s would pass the run deadline")
+        if seconds > 0:
+            sleep(seconds)
+    
+    def _check_circuit(self, group, sleep):
+        with self._lock:
+            open_until = self._open_until.get(group, 0)
+        if time.time() < open_until:
+            # Half-open after the cooldown: one trial call decides
+            try:
+                self.wait(open_until - time.time(), sleep, reason=f"{group} circuit open")
+            except BudgetExhausted:
+                raise CircuitOpen(f"{group}: too many server errors, not retrying before the deadline")
+    
+    def _record(self, group, success):
+        with self._lock:
+            if success:
+                self._failures[group] = 0
+                return
+            self._failures[group] = self._failures.get(group, 0) + 1
+            if self._failures[group] >= FAILURE_THRESHOLD:
+                self._open_until[group] = time.time() + COOLDOWN_SECONDS
+                self._failures[group] = 0
+                print(f"   🔌 {group}: {FAILURE_THRESHOLD} server errors in a row, pausing for {COOLDOWN_SECONDS}s")
+    
+    def call(self, func, group='other', sleep=time.sleep, on_rate_limited=None):
+        """Call func() under the policy
+        
+        `sleep` lets callers wait without holding shared resources;
+        `on_rate_limited(seconds)` is told about 429 pauses.
+        """
+        for attempt in range(MAX_ATTEMPTS):
+            self._check_circuit(group, sleep)
+            if self.remaining() <= 0:
+                raise BudgetExhausted("run deadline reached")
+            
+            try:
+                result = func()
+            except (BudgetExhausted, CircuitOpen):
+                # Raised by waits inside func (e.g. the rate budget): out of time, not a failure
+                raise
+            except Exception as e:
+                if not is_retryable(e) or attempt == MAX_ATTEMPTS - 1:
+                    raise
+                
+                status = http_status(e)
+                if status == 429:
+                    retry_after = response_headers(e).get('Retry-After')
+                    seconds = int(retry_after) if str(retry_after or '').isdigit() else DEFAULT_RETRY_AFTER
+                    if on_rate_limited:
+                        on_rate_limited(seconds)
+                    delay = self.backoff(attempt, seconds)
+                    print(f"   ⏳ {group}: rate limited, retrying in {delay:.0f}s (attempt {attempt + 1}/{MAX_ATTEMPTS})")
+                else:
+                    self._record(group, success=False)
+                    delay = self.backoff(attempt)
+                    print(f"   🔁 {group}: {'HTTP ' + str(status) if status else 'connection error'}, retrying in {delay:.0f}s")
+                
+                self.wait(delay, sleep, reason=group)
+                continue
+            
+            self._record(group, success=True)
+            return result
+    
+    def mark_partial(self, reason):
+        """Note that a fetch stopped early; the report will be labelled PARTIAL"""
+        with self._lock:
+            if reason not in self.partial_reasons:
+                self.partial_reasons.append(reason)
+        tracked = getattr(self._local, 'reasons', None)
+        if tracked is not None and reason not in tracked:
+            tracked.append(reason)
+        print(f"⚠️  PARTIAL DATA: {reason}")
+    
+    @contextmanager
+    def tracking(self):
+        """Collect the partial reasons raised by this thread inside the block
+        
+        Lets concurrent pipeline steps tell whose data is incomplete.
+        """
+        self._local.reasons = []
+        try:
+            yield self._local.reasons
+        finally:
+            self._local.reasons = None
+
+# The policy for this process's run
+RUN_POLICY = RetryPolicy()
+
+def policy_for(platform):
+    """The policy a platform's calls run under (multi-account runs give each account its own)"""
+    return getattr(platform, 'policy', None) or RUN_POLICY
+
+def partial_marker_path(date_str, export_dir='exports'):
+    return os.path.join(export_dir, f"{date_str}-PARTIAL.json")
+
+def write_partial_marker(date_str, reasons, export_dir='exports'):
+    """Record (or clear, when reasons is empty) that a date's reports are partial"""
+    path = partial_marker_path(date_str, export_dir)
+    if not reasons:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    os.makedirs(export_dir, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'date': date_str, 'reasons': reasons, 'written_at': time.time()}, f, indent=2)
+
+def read_partial_marker(date_str, export_dir='exports'):
+    """Reasons a date's reports are partial, or [] when they are complete"""
+    path = partial_marker_path(date_str, export_dir)
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, 'r') as f:
+            return json.load(f).get('reasons', [])
+    except (OSError, ValueError):
+        return ['report data may be incomplete']
@@ -6,12 +6,48 @@ Sends call productivity report, fax analysis, and comprehensive summary
 
 import os
 import sys
-import smtplib
+import json
+import uuid
+import base64
+import shutil
+import zipfile
+from html import escape as html_escape
 from datetime import datetime, timedelta
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
+
+from email_outbox import enqueue_message, deliver_pending, start_background_sender
+from report_cache import cached_summary
+from retry_policy import read_partial_marker
+from tracing import span, traced
+import profiling
+
+# Office365 rejects messages above ~35 MB once encoded; stay well below it
+# unless the server advertises its own SIZE limit in EHLO
+DEFAULT_SMTP_MAX_MESSAGE_BYTES = 25 * 1024 * 1024
+
+# Room for envelope headers and MIME part headers on top of body + attachments
+MESSAGE_OVERHEAD_BYTES = 64 * 1024
+
+# 57 raw bytes encode to exactly one 76-character base64 line
+BASE64_LINE_BYTES = 57
+ATTACHMENT_CHUNK_BYTES = BASE64_LINE_BYTES * 1024
+SMTP_SEND_BUFFER_BYTES = 64 * 1024
+
+# Only send the zipped copy when it is at least this much smaller
+MIN_COMPRESSION_SAVINGS = 0.10
+
+# Formats that are already deflate-compressed - zipping them again never helps
+COMPRESSED_EXTENSIONS = ('.xlsx', '.zip', '.parquet')
+
+# Rows per table in the email's top counterparties section (the sheet has more)
+TOP_COUNTERPARTIES_SHOWN = 10
+
+OUTGOING_DIR = 'exports/.outgoing'
+
+ATTACHMENT_MIME_TYPES = {
+    '.xlsx': ('application', 'vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    '.csv': ('text', 'csv'),
+    '.zip': ('application', 'zip'),
+}
 
 def load_env():
     """Load environment variables from .env file"""
@@ -25,6 +61,14 @@ def load_env():
                     os.environ[key.strip()] = value.strip()
 
 def get_fax_summary(date_str):
+    """Get fax summary, reusing the parsed result while the report file is unchanged"""
+    return cached_summary(f'exports/fax_analysis_{date_str}.xlsx', lambda: load_fax_summary(date_str), [__file__])
+
+def get_call_summary(date_str):
+    """Get call summary, reusing the parsed result while the report file is unchanged"""
+    return cached_summary(f'exports/{date_str}-nightangle-calls.xlsx', lambda: load_call_summary(date_str), [__file__])
+
+def load_fax_summary(date_str):
     """Get fax summary from the report"""
     try:
         import openpyxl
@@ -32,6 +76,7 @@ def get_fax_summary(date_str):
         ws = wb['Faxes by Sender']
         
         fax_senders = []
+        by_extension = {}
         total_sent = 0
         total_received = 0
         
@@ -44,6 +89,9 @@ def get_fax_summary(date_str):
             total_sent += sent
             total_received += received
             
+            if ext:
+                by_extension[str(ext)] = {'sent': sent, 'received': received}
+            
             if ext and sent > 0:  # Only internal users who sent faxes
                 fax_senders.append({
                     'name': name,
@@ -53,17 +101,29 @@ def get_fax_summary(date_str):
         
         fax_senders.sort(key=lambda x: x['sent'], reverse=True)
         
-        return {
+        summary = {
             'senders': fax_senders,
+            'by_extension': by_extension,
             'total_sent': total_sent,
             'total_received': total_received,
             'total': total_sent + total_received
         }
+        
+        # Outside numbers that fax us / we fax the most (reports before the sheet existed lack it)
+        if 'Top Counterparties' in wb.sheetnames:
+            rows = list(wb['Top Counterparties'].iter_rows(values_only=True))
+            top = {'period_label': rows[0][4], 'senders': [], 'recipients': []}
+            for role, rank, number, today, period, error in rows[1:]:
+                if rank <= TOP_COUNTERPARTIES_SHOWN:
+                    top['senders' if role == 'Sender' else 'recipients'].append({'number': number, 'today': today, 'period': period})
+            summary['top_counterparties'] = top
+        
+        return summary
     except Exception as e:
         print(f"⚠️  Could not load fax summary: {e}")
         return None
 
-def get_call_summary(date_str):
+def load_call_summary(date_str):
     """Get call summary from the report"""
     try:
         import openpyxl
@@ -112,9 +172,23 @@ def get_call_summary(date_str):
         print(f"⚠️  Could not load call summary: {e}")
         return None
 
-def create_email_body(date_str, call_summary, fax_summary):
+def create_email_body(date_str, call_summary, fax_summary, linked_reports=None, team_name=None, partial_reasons=None):
     """Create HTML email body with comprehensive analysis"""
     
+    scope = f" ({team_name})" if team_name else ""
+    
+    partial_banner = ""
+    if partial_reasons:
+        # Data fetching stopped early (run deadline / failing API) - say so up front
+        reasons = ''.join(f"<li>{html_escape(reason)}</li>" for reason in partial_reasons)
+        partial_banner = f"""
+        <div class="summary-box" style="background-color: #fdecea; border-left: 5px solid #c0392b;">
+            <h2>⚠️ PARTIAL REPORT</h2>
+            <p>Not all data for {date_str} could be fetched, so the numbers below are incomplete:</p>
+            <ul>{reasons}</ul>
+        </div>
+        """
+    
     html = f"""
     <html>
     <head>
@@ -134,11 +208,11 @@ def create_email_body(date_str, call_summary, fax_summary):
         </style>
     </head>
     <body>
-        <h1>📊 RingCentral Activity Report - {date_str}</h1>
-        
+        <h1>📊 RingCentral Activity Report{scope} - {date_str}</h1>
+        {partial_banner}
         <div class="summary-box">
             <h2>📈 Executive Summary</h2>
-            <p>This report provides a comprehensive analysis of all call and fax activity for <strong>{date_str}</strong>.</p>
+            <p>This report provides a comprehensive analysis of {f"{team_name} team" if team_name else "all"} call and fax activity for <strong>{date_str}</strong>.</p>
         </div>
     """
     
@@ -231,21 +305,78 @@ def create_email_body(date_str, call_summary, fax_summary):
             """
         
         html += "</table>"
+        
+        # Company-wide, so team emails (whose summaries lack it) leave it out
+        top_counterparties = fax_summary.get('top_counterparties')
+        if top_counterparties and (top_counterparties['senders'] or top_counterparties['recipients']):
+            html += """
+        <h3>📇 Top Fax Counterparties (Outside Numbers)</h3>
+        """
+            for role, title in (('senders', 'Faxing Us the Most'), ('recipients', 'We Fax the Most')):
+                if not top_counterparties[role]:
+                    continue
+                html += f"""
+        <p><strong>{title}</strong></p>
+        <table>
+            <tr>
+                <th>Rank</th>
+                <th>Number</th>
+                <th>Faxes Today</th>
+                <th>{html_escape(str(top_counterparties['period_label']))}</th>
+            </tr>
+        """
+                for i, entry in enumerate(top_counterparties[role], 1):
+                    html += f"""
+            <tr>
+                <td>{i}</td>
+                <td>{html_escape(str(entry['number']))}</td>
+                <td>{entry['today']}</td>
+                <td><strong>{entry['period']}</strong></td>
+            </tr>
+            """
+                html += "</table>"
+    
+    # Reports too large to attach are linked instead
+    if linked_reports:
+        html += """
+        <h2>🔗 Large Reports (Download)</h2>
+        <p>These reports exceed the email size limit and are available for download instead:</p>
+        <ul>
+        """
+        for report in linked_reports:
+            if report['url']:
+                html += f"""<li><a href="{report['url']}">{report['filename']}</a> ({report['size_mb']} MB)</li>"""
+            else:
+                html += f"""<li><strong>{report['filename']}</strong> ({report['size_mb']} MB) - saved in {report['location']} on the machine that generated this report</li>"""
+        html += "</ul>"
     
     # Footer
-    html += f"""
-        <div class="footer">
+    if team_name:
+        attached_reports = f"""
+            <h3>📋 Attached Reports</h3>
+            <ul>
+                <li><strong>{team_workbook_name(date_str, team_name)}</strong> - Call and fax activity for the {team_name} team only</li>
+            </ul>
+        """
+    else:
+        attached_reports = f"""
             <h3>📋 Attached Reports</h3>
             <ul>
                 <li><strong>{date_str}-nightangle-calls.xlsx</strong> - Complete call productivity report with all metrics</li>
                 <li><strong>fax_analysis_{date_str}.xlsx</strong> - Detailed fax analysis with sender information and timestamps</li>
             </ul>
             
-            <p><strong>Note:</strong> The fax analysis report contains two sheets:</p>
+            <p><strong>Note:</strong> The fax analysis report contains three sheets:</p>
             <ul>
                 <li>Sheet 1: Summary by sender</li>
                 <li>Sheet 2: Complete fax log with timestamps and details</li>
+                <li>Sheet 3: Outside numbers that fax us, or that we fax, the most</li>
             </ul>
+        """
+    
+    html += f"""
+        <div class="footer">
+            {attached_reports}
             
             <p style="margin-top: 20px;">
                 <em>Report generated on {datetime.now().strftime('%Y-%m-%d at %H:%M:%S')}</em><br>
@@ -258,8 +389,466 @@ def create_email_body(date_str, call_summary, fax_summary):
     
     return html
 
+def load_recipient_teams():
+    """Load per-recipient team filters for fan-out mode
+    
+    The file (RECIPIENT_TEAMS_FILE, default recipient_teams.json) maps team
+    names to extension numbers and recipients to the teams they may see.
+    Recipients mapped to "*" or not listed at all get the full report.
+    Returns (teams, recipients), or ({}, {}) when fan-out is not configured.
+    """
+    teams_file = os.getenv('RECIPIENT_TEAMS_FILE', 'recipient_teams.json')
+    if not os.path.exists(teams_file):
+        return {}, {}
+    
+    with open(teams_file, 'r') as f:
+        config = json.load(f)
+    
+    teams = {name: [str(ext) for ext in extensions] for name, extensions in config.get('teams', {}).items()}
+    recipients = {email.lower(): scope for email, scope in config.get('recipients', {}).items()}
+    return teams, recipients
+
+def filter_summaries_for_extensions(call_summary, fax_summary, extensions):
+    """Slice the shared call/fax summaries down to a set of extensions"""
+    team_calls = None
+    if call_summary:
+        callers = [c for c in call_summary['all_callers'] if str(c['ext']) in extensions]
+        total_made = sum(c['calls_made'] for c in callers)
+        total_received = sum(c['calls_received'] for c in callers)
+        team_calls = {
+            'total_made': total_made,
+            'total_received': total_received,
+            'total_calls': total_made + total_received,
+            'total_minutes': sum(c['minutes'] for c in callers),
+            'all_callers': callers
+        }
+    
+    team_faxes = None
+    if fax_summary:
+        senders = [s for s in fax_summary['senders'] if str(s['ext']) in extensions]
+        by_extension = {ext: stats for ext, stats in fax_summary['by_extension'].items() if ext in extensions}
+        total_sent = sum(stats['sent'] for stats in by_extension.values())
+        total_received = sum(stats['received'] for stats in by_extension.values())
+        team_faxes = {
+            'senders': senders,
+            'by_extension': by_extension,
+            'total_sent': total_sent,
+            'total_received': total_received,
+            'total': total_sent + total_received
+        }
+    
+    return team_calls, team_faxes
+
+def team_slug(team_name):
+    """Filesystem-safe form of a team name"""
+    slug = ''.join(c if c.isalnum() else '-' for c in team_name.lower())
+    return '-'.join(part for part in slug.split('-') if part)
+
+def team_workbook_name(date_str, team_name):
+    """Attachment filename for a team's slice of the report"""
+    return f"{date_str}-{team_slug(team_name)}-activity.xlsx"
+
+def write_team_workbook(path, date_str, team_name, call_summary, fax_summary):
+    """Write a small workbook holding only one team's call and fax stats"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill
+    
+    wb = Workbook()
+    ws1 = wb.active
+    ws1.title = "Call Activity"
+    ws2 = wb.create_sheet("Fax Senders")
+    
+    call_rows = [
+        [c['name'], c['ext'], c['calls_made'], c['calls_received'], c['calls'], c['minutes']]
+        for c in (call_summary or {}).get('all_callers', [])
+    ]
+    fax_rows = [[s['name'], s['ext'], s['sent']] for s in (fax_summary or {}).get('senders', [])]
+    
+    for ws, headers, rows in [
+        (ws1, ['Employee Name', 'Extension', 'Calls Made', 'Calls Received', 'Total Calls', 'Total Minutes'], call_rows),
+        (ws2, ['Employee Name', 'Extension', 'Faxes Sent'], fax_rows)
+    ]:
+        for col, header in enumerate(headers, 1):
+            cell = ws.cell(row=1, column=col, value=header)
+            cell.font = Font(bold=True, color='FFFFFF')
+            cell.fill = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
+        for values in rows:
+            ws.append(values)
+    
+    wb.save(path)
+    print(f"✅ {team_name} team workbook saved: {path}")
+    return path
+
+def build_recipient_audiences(date_str, receiver_emails, call_summary, fax_summary):
+    """Group recipients by the slice of the report they should receive
+    
+    Every slice is cut from the summaries loaded once for the run; recipients
+    sharing a slice share one message.
+    """
+    teams, recipient_scopes = load_recipient_teams()
+    
+    full_audience = {
+        'team_name': None,
+        'recipients': [],
+        'call_summary': call_summary,
+        'fax_summary': fax_summary,
+        'reports': [f'exports/{date_str}-nightangle-calls.xlsx', f'exports/fax_analysis_{date_str}.xlsx']
+    }
+    team_audiences = {}
+    
+    for receiver in receiver_emails:
+        scope = recipient_scopes.get(receiver.lower(), '*')
+        if scope == '*':
+            full_audience['recipients'].append(receiver)
+            continue
+        
+        team_names = sorted(scope if isinstance(scope, list) else [scope])
+        key = ' + '.join(team_names)
+        if key not in team_audiences:
+            extensions = set()
+            for team_name in team_names:
+                if team_name not in teams:
+                    print(f"⚠️  Warning: unknown team '{team_name}' for {receiver}")
+                extensions.update(teams.get(team_name, []))
+            
+            team_calls, team_faxes = filter_summaries_for_extensions(call_summary, fax_summary, extensions)
+            os.makedirs(OUTGOING_DIR, exist_ok=True)
+            workbook = os.path.join(OUTGOING_DIR, team_workbook_name(date_str, key))
+            write_team_workbook(workbook, date_str, key, team_calls, team_faxes)
+            
+            team_audiences[key] = {
+                'team_name': key,
+                'recipients': [],
+                'call_summary': team_calls,
+                'fax_summary': team_faxes,
+                'reports': [workbook]
+            }
+        team_audiences[key]['recipients'].append(receiver)
+    
+    audiences = [full_audience] if full_audience['recipients'] else []
+    return audiences + [team_audiences[key] for key in sorted(team_audiences)]
+
+def encoded_attachment_size(raw_size):
+    """Size of a base64 attachment body on the wire (76-char lines + CRLF)"""
+    encoded = 4 * ((raw_size + 2) // 3)
+    lines = (encoded + 75) // 76
+    return encoded + 2 * lines
+
+def prepare_attachment(path):
+    """Describe a report file for sending, zipping it first when that helps"""
+    filename = os.path.basename(path)
+    extension = os.path.splitext(filename)[1].lower()
+    send_path = path
+    raw_size = os.path.getsize(path)
+    
+    if extension not in COMPRESSED_EXTENSIONS:
+        os.makedirs(OUTGOING_DIR, exist_ok=True)
+        zip_path = os.path.join(OUTGOING_DIR, f"{filename}.zip")
+        # ZipFile.write streams the source from disk in chunks
+        with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            zf.write(path, arcname=filename)
+        
+        zip_size = os.path.getsize(zip_path)
+        if zip_size <= raw_size * (1 - MIN_COMPRESSION_SAVINGS):
+            print(f"🗜️  Compressed {filename}: {raw_size:,} → {zip_size:,} bytes")
+            send_path = zip_path
+            filename = f"{filename}.zip"
+            extension = '.zip'
+            raw_size = zip_size
+        else:
+            os.remove(zip_path)
+    
+    maintype, subtype = ATTACHMENT_MIME_TYPES.get(extension, ('application', 'octet-stream'))
+    return {
+        'path': send_path,
+        'filename': filename,
+        'maintype': maintype,
+        'subtype': subtype,
+        'raw_size': raw_size,
+        'encoded_size': encoded_attachment_size(raw_size)
+    }
+
+def plan_report_messages(attachments, max_message_bytes, body_bytes):
+    """Split attachments across as few messages as fit under the size limit
+    
+    Returns (batches, linked): one list of attachments per message, plus the
+    attachments that cannot fit even on their own and must be linked instead.
+    """
+    budget = max_message_bytes - body_bytes - MESSAGE_OVERHEAD_BYTES
+    
+    linked = [a for a in attachments if a['encoded_size'] > budget]
+    fitting = [a for a in attachments if a['encoded_size'] <= budget]
+    
+    # First-fit decreasing keeps the number of messages low
+    batches = []
+    for attachment in sorted(fitting, key=lambda a: a['encoded_size'], reverse=True):
+        for batch in batches:
+            if sum(a['encoded_size'] for a in batch) + attachment['encoded_size'] <= budget:
+                batch.append(attachment)
+                break
+        else:
+            batches.append([attachment])
+    
+    return batches or [[]], linked
+
+def link_out_attachment(attachment):
+    """Publish a report that is too large to attach and return its link info
+    
+    REPORT_LINK_DIR is a shared/synced folder the file is copied into and
+    REPORT_LINK_BASE_URL is where that folder is served from.
+    """
+    link_dir = os.getenv('REPORT_LINK_DIR', '')
+    base_url = os.getenv('REPORT_LINK_BASE_URL', '')
+    
+    if link_dir:
+        os.makedirs(link_dir, exist_ok=True)
+        shutil.copyfile(attachment['path'], os.path.join(link_dir, attachment['filename']))
+    
+    return {
+        'filename': attachment['filename'],
+        'url': f"{base_url.rstrip('/')}/{attachment['filename']}" if base_url else '',
+        # Without a link folder the file stays where it is and must be kept
+        'location': link_dir or os.path.dirname(attachment['path']),
+        'published': bool(link_dir),
+        'size_mb': round(attachment['raw_size'] / (1024 * 1024), 1)
+    }
+
+def write_attachment_part(out, boundary, attachment):
+    """Append one base64 attachment part, encoding the file chunk by chunk"""
+    out.write(f"--{boundary}\r\n".encode())
+    out.write(f"Content-Type: {attachment['maintype']}/{attachment['subtype']}; name=\"{attachment['filename']}\"\r\n".encode())
+    out.write(b"MIME-Version: 1.0\r\n")
+    out.write(b"Content-Transfer-Encoding: base64\r\n")
+    out.write(f"Content-Disposition: attachment; filename=\"{attachment['filename']}\"\r\n\r\n".encode())
+    
+    with open(attachment['path'], 'rb') as f:
+        while True:
+            chunk = f.read(ATTACHMENT_CHUNK_BYTES)
+            if not chunk:
+                break
+            encoded = base64.b64encode(chunk)
+            out.write(b"\r\n".join(encoded[i:i + 76] for i in range(0, len(encoded), 76)))
+            out.write(b"\r\n")
+
+def write_report_message(path, sender_email, receiver_emails, subject, html_body, attachments):
+    """Write a complete MIME message to disk without loading attachments into memory"""
+    # The email and smtplib modules are imported where they are used, which
+    # keeps them off the startup path of scripts that only import helpers
+    import email.policy
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    
+    boundary = f"=_rc_report_{uuid.uuid4().hex}"
+    
+    envelope = MIMEMultipart('mixed', boundary=boundary, policy=email.policy.SMTP)
+    envelope['From'] = sender_email
+    envelope['To'] = ', '.join(receiver_emails)
+    envelope['Subject'] = subject
+    envelope.attach(MIMEText(html_body, 'html', 'utf-8', policy=email.policy.SMTP))
+    
+    # Serialize headers + HTML body, then stream the attachments in before the closing boundary
+    head = envelope.as_bytes()
+    closing = f"--{boundary}--".encode()
+    
+    with open(path, 'wb') as out:
+        out.write(head[:head.rindex(closing)])
+        for attachment in attachments:
+            write_attachment_part(out, boundary, attachment)
+        out.write(closing + b"\r\n")
+    
+    return path
+
+@traced('smtp.connect')
+def open_smtp_session(sender_email, password):
+    """Open one authenticated SMTP session that a whole run sends through
+    
+    SMTP_HOST / SMTP_PORT / SMTP_STARTTLS=0 point it at a local stand-in
+    (e.g. aiosmtpd) for testing.
+    """
+    import smtplib
+    
+    host = os.getenv('SMTP_HOST', 'smtp.office365.com')
+    port = int(os.getenv('SMTP_PORT', '587'))
+    
+    server = smtplib.SMTP(host, port, timeout=120)
+    server.ehlo()
+    if os.getenv('SMTP_STARTTLS', '1') != '0':
+        server.starttls()
+        server.ehlo()
+    if server.has_extn('auth'):
+        server.login(sender_email, password)
+    return server
+
+def close_smtp_session(server):
+    """Close a session, ignoring servers that already hung up"""
+    import smtplib
+    
+    try:
+        server.quit()
+    except smtplib.SMTPException:
+        pass
+
+def get_smtp_message_limit(server=None):
+    """Message size limit: the server's EHLO SIZE, else SMTP_MAX_MESSAGE_BYTES, else the default"""
+    advertised = server.esmtp_features.get('size', '').strip() if server else ''
+    if advertised.isdigit() and int(advertised) > 0:
+        return int(advertised)
+    return int(os.getenv('SMTP_MAX_MESSAGE_BYTES', DEFAULT_SMTP_MAX_MESSAGE_BYTES))
+
+def send_envelope(server, sender_email, receiver_emails, options):
+    """MAIL, RCPT and DATA for one message; returns (mail, [rcpt], data) replies
+    
+    When the server advertises PIPELINING (RFC 2920) the commands go out in
+    one write and the replies are read back in order, so a message costs
+    one round trip before its data instead of two plus one per recipient.
+    """
+    import smtplib
+    
+    if not server.has_extn('pipelining'):
+        mail = server.mail(sender_email, options)
+        if mail[0] != 250:
+            return mail, [], None
+        rcpts = [server.rcpt(receiver) for receiver in receiver_emails]
+        if not any(code in (250, 251) for code, _ in rcpts):
+            return mail, rcpts, None
+        return mail, rcpts, server.docmd('DATA')
+    
+    commands = [f"MAIL FROM:{smtplib.quoteaddr(sender_email)}{''.join(' ' + o for o in options)}"]
+    commands += [f"RCPT TO:{smtplib.quoteaddr(receiver)}" for receiver in receiver_emails]
+    commands.append('DATA')
+    server.send(''.join(f"{command}\r\n" for command in commands))
+    replies = [server.getreply() for _ in commands]
+    return replies[0], replies[1:-1], replies[-1]
+
+def send_streamed_message(server, sender_email, receiver_emails, path):
+    """Send a message file over an open SMTP session, streaming it from disk"""
+    import smtplib
+    
+    size = os.path.getsize(path)
+    with span('smtp.send', bytes=size, recipients=len(receiver_emails)):
+        options = [f"SIZE={size}"] if server.has_extn('size') else []
+        
+        mail, rcpts, data = send_envelope(server, sender_email, receiver_emails, options)
+        refused = {
+            receiver: reply for receiver, reply in zip(receiver_emails, rcpts)
+            if reply[0] not in (250, 251)
+        }
+        if mail[0] != 250 or len(refused) == len(receiver_emails):
+            if data and data[0] == 354:
+                # A pipelined DATA can still be accepted; end it empty
+                server.send(b".\r\n")
+                server.getreply()
+            server.rset()
+            if mail[0] != 250:
+                raise smtplib.SMTPSenderRefused(mail[0], mail[1], sender_email)
+            raise smtplib.SMTPRecipientsRefused(refused)
+        
+        code, resp = data
+        if code != 354:
+            raise smtplib.SMTPDataError(code, resp)
+        
+        buffer = []
+        buffered = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                # Dot-stuffing (RFC 5321 4.5.2)
+                if line.startswith(b'.'):
+                    line = b'.' + line
+                buffer.append(line)
+                buffered += len(line)
+                if buffered >= SMTP_SEND_BUFFER_BYTES:
+                    server.send(b''.join(buffer))
+                    buffer = []
+                    buffered = 0
+        buffer.append(b".\r\n")
+        server.send(b''.join(buffer))
+        
+        code, resp = server.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, resp)
+        return refused
+
+def build_report_messages(date_str, audience, sender_email, max_message_bytes):
+    """Write the message file(s) for one audience, splitting or linking oversized reports"""
+    attachments = []
+    for report in audience['reports']:
+        if os.path.exists(report):
+            attachments.append(prepare_attachment(report))
+            print(f"✅ Attaching: {report}")
+        else:
+            print(f"⚠️  Warning: {report} not found")
+    
+    team_name = audience['team_name']
+    call_summary = audience['call_summary']
+    fax_summary = audience['fax_summary']
+    
+    partial_reasons = read_partial_marker(date_str)
+    html_body = create_email_body(date_str, call_summary, fax_summary, team_name=team_name, partial_reasons=partial_reasons)
+    batches, too_large = plan_report_messages(attachments, max_message_bytes, len(html_body.encode('utf-8')))
+    
+    published = []
+    if too_large:
+        linked_reports = []
+        for attachment in too_large:
+            print(f"🔗 {attachment['filename']} exceeds the {max_message_bytes // (1024 * 1024)} MB limit - linking instead of attaching")
+            link = link_out_attachment(attachment)
+            linked_reports.append(link)
+            if link['published']:
+                published.append(attachment)
+            else:
+                print(f"   REPORT_LINK_DIR is not set - keeping {attachment['path']}")
+        html_body = create_email_body(date_str, call_summary, fax_summary, linked_reports, team_name=team_name, partial_reasons=partial_reasons)
+    
+    if len(batches) > 1:
+        print(f"✂️  Splitting attachments across {len(batches)} emails to stay under the size limit")
+    
+    os.makedirs(OUTGOING_DIR, exist_ok=True)
+    scope = f" ({team_name})" if team_name else ""
+    base_subject = f"📊 RingCentral Complete Activity Report{scope} - {date_str}"
+    if partial_reasons:
+        base_subject = f"[PARTIAL] {base_subject}"
+    slug = f"{date_str}-{team_slug(team_name)}" if team_name else date_str
+    
+    def scratch_files(batch):
+        # Team workbooks and zipped copies only exist to be attached
+        return [a['path'] for a in batch if os.path.dirname(a['path']) == OUTGOING_DIR]
+    
+    messages = []
+    for index, batch in enumerate(batches, 1):
+        if len(batches) == 1:
+            subject = base_subject
+            body = html_body
+        else:
+            subject = f"{base_subject} (Part {index}/{len(batches)})"
+            if index == 1:
+                body = html_body
+            else:
+                names = ''.join(f"<li>{a['filename']}</li>" for a in batch)
+                body = f"<html><body><p>Attachments continued ({index} of {len(batches)}) for {date_str}:</p><ul>{names}</ul></body></html>"
+        
+        message_path = os.path.join(OUTGOING_DIR, f"report-{slug}-part{index}.eml")
+        write_report_message(message_path, sender_email, audience['recipients'], subject, body, batch)
+        messages.append({
+            'path': message_path,
+            'recipients': audience['recipients'],
+            'subject': subject,
+            'scratch_files': scratch_files(batch) + (scratch_files(published) if index == 1 else [])
+        })
+    
+    return messages
+
+def remove_scratch_files(paths):
+    """Delete attachment files a queued message no longer needs (it holds its own copy)"""
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
 def send_email_with_reports(date_str):
     """Send email with both reports and comprehensive analysis"""
+    import smtplib
+    
     print("📧 Preparing to send comprehensive report email...")
     
     load_env()
@@ -289,75 +878,77 @@ def send_email_with_reports(date_str):
         print("❌ Error: EMAIL_PASSWORD environment variable not set")
         return False
     
-    # Get summaries
-    call_summary = get_call_summary(date_str)
-    fax_summary = get_fax_summary(date_str)
+    # Get summaries once - every recipient's slice is cut from these
+    with span('email.summaries'):
+        call_summary = get_call_summary(date_str)
+        fax_summary = get_fax_summary(date_str)
     
     if not call_summary and not fax_summary:
         print("❌ Error: Could not load any report data")
         return False
     
+    server = None
     try:
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['From'] = sender_email
-        msg['To'] = ', '.join(receiver_emails)
-        msg['Subject'] = f"📊 RingCentral Complete Activity Report - {date_str}"
+        with span('email.audiences'):
+            audiences = build_recipient_audiences(date_str, receiver_emails, call_summary, fax_summary)
         
-        # Create HTML body
-        html_body = create_email_body(date_str, call_summary, fax_summary)
-        msg.attach(MIMEText(html_body, 'html'))
+        # Connect first so the server's advertised size limit drives the plan.
+        # If the server is unreachable the messages are still built and queued.
+        print("📤 Connecting to SMTP server...")
+        try:
+            server = open_smtp_session(sender_email, password)
+        except (smtplib.SMTPException, OSError) as e:
+            print(f"⚠️  SMTP server unavailable ({e}) - emails will be queued and retried")
+        max_message_bytes = get_smtp_message_limit(server)
         
-        # Attach call productivity report
-        call_report = f'exports/{date_str}-nightangle-calls.xlsx'
-        if os.path.exists(call_report):
-            with open(call_report, 'rb') as f:
-                part = MIMEBase('application', 'octet-stream')
-                part.set_payload(f.read())
-                encoders.encode_base64(part)
-                part.add_header('Content-Disposition', f'attachment; filename={date_str}-nightangle-calls.xlsx')
-                msg.attach(part)
-                print(f"✅ Attached: {call_report}")
-        else:
-            print(f"⚠️  Warning: {call_report} not found")
+        # Spool every message to the durable outbox before the first send attempt
+        with span('email.build', audiences=len(audiences)):
+            for audience in audiences:
+                for message in build_report_messages(date_str, audience, sender_email, max_message_bytes):
+                    enqueue_message(message['path'], sender_email, message['recipients'], message['subject'])
+                    remove_scratch_files(message['scratch_files'])
         
-        # Attach fax analysis report
-        fax_report = f'exports/fax_analysis_{date_str}.xlsx'
-        if os.path.exists(fax_report):
-            with open(fax_report, 'rb') as f:
-                part = MIMEBase('application', 'octet-stream')
-                part.set_payload(f.read())
-                encoders.encode_base64(part)
-                part.add_header('Content-Disposition', f'attachment; filename=fax_analysis_{date_str}.xlsx')
-                msg.attach(part)
-                print(f"✅ Attached: {fax_report}")
-        else:
-            print(f"⚠️  Warning: {fax_report} not found")
+        # First attempt reuses this run's session; failures are retried with backoff
+        sent, pending, failed = deliver_pending(password, server=server)
+        if pending:
+            flush_seconds = int(os.getenv('OUTBOX_FLUSH_SECONDS', '300'))
+            print(f"⏳ {pending} email(s) queued for retry - retrying in the background for up to {flush_seconds}s...")
+            start_background_sender(flush_seconds, password).join(flush_seconds + 30)
+            _, pending, failed_later = deliver_pending(password)
+            failed += failed_later
         
-        # Send email
-        print("📤 Sending email...")
-        server = smtplib.SMTP('smtp.office365.com', 587)
-        server.starttls()
-        server.login(sender_email, password)
-        server.send_message(msg)
-        server.quit()
+        if failed:
+            print(f"❌ {failed} email(s) were rejected by the server - see: python email_outbox.py --status")
+            return False
+        
+        if pending:
+            print(f"⚠️  {pending} email(s) are still queued in the outbox")
+            print("💡 Resend without regenerating reports: python email_outbox.py --drain 600")
+            return True
         
         print(f"✅ Email sent successfully to:")
-        for email in receiver_emails:
-            print(f"   • {email}")
+        for audience in audiences:
+            for email in audience['recipients']:
+                scope = f" ({audience['team_name']} only)" if audience['team_name'] else ""
+                print(f"   • {email}{scope}")
         print(f"📊 Email includes:")
         print(f"   • Comprehensive HTML analysis")
         print(f"   • Call productivity report (Excel)")
         print(f"   • Fax analysis report (Excel)")
         return True
-        
+    
     except Exception as e:
         print(f"❌ Failed to send email: {str(e)}")
         import traceback
         traceback.print_exc()
         return False
+    finally:
+        if server:
+            close_smtp_session(server)
 
 def main():
+    # --profile: per-phase CPU profiles and allocation snapshots (see profiling.py)
+    profiling.enable_from_argv()
     print("📊 COMPREHENSIVE REPORT EMAIL SENDER")
     print("=" * 60)
     
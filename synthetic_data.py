@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Synthetic Data - Seeded, RingCentral-shaped payloads for benchmarks and the fake server
+Produces extension-list records, the account phone-number inventory,
+call-log records and Analytics
+aggregation and timeline responses shaped like the real API, for any size (1k to 1M
+call-log records, 10 to 5k extensions). The same seed always gives the
+same data.
+
+Usage:
+    python synthetic_data.py --records 100000 --extensions 500
+    python synthetic_data.py --records 1000000 --extensions 5000 --seed 7 --out exports/synthetic
+"""
+
+import os
+import sys
+import json
+import random
+from datetime import datetime, timedelta
+
+DEFAULT_SEED = 42
+DEFAULT_DATE = '2025-11-20'
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+               'Sravani', 'Priya', 'Wei', 'Fatima', 'Carlos', 'Aisha', 'Olga', 'Kenji', 'Amara', 'Luis']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Madati', 'Nguyen',
+              'Patel', 'Kim', 'Okafor', 'Rossi', 'Silva', 'Cohen', 'Muller', 'Tanaka', 'Haddad', 'Lopez']
+
+# The main fax line (ext 9) receives most inbound faxes, as in production,
+# and employees send many outbound faxes through it; the call log then
+# shows the main line as the sender and only the message store knows who
+MAIN_FAX = {'id': '63310910031', 'extensionNumber': '9', 'name': 'Main Fax', 'phoneNumber': '+18668780094'}
+MAIN_FAX_SHARE = 0.4
+
+# Not assigned to an extension; calls to it are answered by whoever is free
+MAIN_NUMBER = '+18663347777'
+
+# Desk-phone records that name the company side only by its number
+PHONE_ONLY_SHARE = 0.05
+
+# Pharmacies, insurers and referring practices that fax (or get faxed) every
+# day: this share of outside parties comes from a fixed pool, the busiest
+# ones much more often, so the top counterparties stand out as in production
+REGULAR_COUNTERPARTIES = 50
+REGULAR_COUNTERPARTY_SHARE = 0.3
+
+# Staff who have left: their extensions are disabled, so the Enabled-only
+# directory does not know them, but their calls are still in the log
+DEPARTED_SHARE = 0.05
+
+FAX_RESULTS = [('Sent', 0.45), ('Received', 0.4), ('Failed', 0.06), ('Busy', 0.04), ('No Answer', 0.05)]
+VOICE_RESULTS = [('Call connected', 0.55), ('Accepted', 0.25), ('Missed', 0.12), ('Voicemail', 0.08)]
+
+def _weighted(rng, choices):
+    roll = rng.random()
+    for value, weight in choices:
+        roll -= weight
+        if roll <= 0:
+            return value
+    return choices[-1][0]
+
+def _external_number(rng):
+    return f"+1{rng.randint(200, 989)}{rng.randint(200, 999)}{rng.randint(0, 9999):04d}"
+
+def regular_counterparties(seed=DEFAULT_SEED):
+    """The pool of outside numbers that come back day after day (the same for every date)"""
+    rng = random.Random(f"{seed}-counterparties")
+    return [_external_number(rng) for _ in range(REGULAR_COUNTERPARTIES)]
+
+def direct_number(ext):
+    """The extension's own (DID) number, derived from its extension number"""
+    if str(ext['extensionNumber']) == MAIN_FAX['extensionNumber']:
+        return MAIN_FAX['phoneNumber']
+    return f"+13175{int(ext['extensionNumber']) % 100000:05d}"
+
+def extension_records(count, seed=DEFAULT_SEED):
+    """Records as returned by GET /account/~/extension (plus the main fax line)"""
+    rng = random.Random(f"{seed}-extensions")
+    records = [{
+        'id': int(MAIN_FAX['id']),
+        'extensionNumber': MAIN_FAX['extensionNumber'],
+        'name': MAIN_FAX['name'],
+        'type': 'User',
+        'status': 'Enabled',
+        'contact': {'firstName': 'Main', 'lastName': 'Fax'}
+    }]
+    numbers = rng.sample(range(1000, 10000 if count < 8000 else 100000), count)
+    for i, number in enumerate(numbers):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        records.append({
+            'id': 63200000031 + i * 1000,
+            'extensionNumber': str(number),
+            'name': f"{first} {last}",
+            'type': 'User',
+            'status': 'Enabled',
+            'contact': {'firstName': first, 'lastName': last, 'email': f"{first}.{last}{i}@example.com".lower()}
+        })
+    # Separate stream, so the other fields are the same as before departures were added
+    status_rng = random.Random(f"{seed}-departed")
+    for record in records[1:]:
+        if status_rng.random() < DEPARTED_SHARE:
+            record['status'] = 'Disabled'
+    return records
+
+def phone_number_records(ext_records):
+    """Records as returned by GET /account/~/phone-number: the main number plus one per extension"""
+    records = [{'id': 1, 'phoneNumber': MAIN_NUMBER, 'usageType': 'MainCompanyNumber', 'type': 'VoiceFax', 'status': 'Normal'}]
+    for i, ext in enumerate(ext_records, 2):
+        is_fax = str(ext['extensionNumber']) == MAIN_FAX['extensionNumber']
+        records.append({
+            'id': i,
+            'phoneNumber': direct_number(ext),
+            'usageType': 'CompanyFaxNumber' if is_fax else 'DirectNumber',
+            'type': 'FaxOnly' if is_fax else 'VoiceFax',
+            'status': 'Normal',
+            'extension': {'id': ext['id'], 'extensionNumber': str(ext['extensionNumber'])}
+        })
+    return records
+
+def directory_from_extensions(ext_records):
+    """The {extensionId: {extensionNumber, name}} map fetch_extensions_directory() builds"""
+    return {
+        str(ext['id']): {'extensionNumber': str(ext['extensionNumber']), 'name': ext['name']}
+        for ext in ext_records
+    }
+
+def iter_call_log_records(count, ext_records, date_str=DEFAULT_DATE, seed=DEFAULT_SEED, fax_share=1.0, sdk_keys=False):
+    """Call-log records (view=Detailed) for one day, newest first
+    
+    sdk_keys=True uses 'from_' like the SDK / pipeline checkpoints;
+    otherwise 'from' as in the raw JSON. Fax records reference their
+    message-store message, which lives in the user's mailbox, or in the
+    shared main fax line mailbox for faxes sent or received on that line.
+    """
+    rng = random.Random(f"{seed}-call-log-{date_str}")
+    # Separate stream, so adding main-line senders left the rest of the data as it was
+    line_rng = random.Random(f"{seed}-main-line-{date_str}")
+    phone_rng = random.Random(f"{seed}-phone-only-{date_str}")
+    counterparty_rng = random.Random(f"{seed}-counterparties-{date_str}")
+    regulars = regular_counterparties(seed)
+    regular_weights = [1.0 / rank for rank in range(1, len(regulars) + 1)]
+    from_key = 'from_' if sdk_keys else 'from'
+    users = [ext for ext in ext_records if ext['extensionNumber'] != MAIN_FAX['extensionNumber']]
+    day_start = datetime.strptime(date_str, "%Y-%m-%d")
+    
+    # Evenly spread, newest first, with jitter so timestamps are not regular
+    step = 86400.0 / max(count, 1)
+    for i in range(count):
+        offset = 86400.0 - (i + rng.random()) * step
+        start = day_start + timedelta(seconds=max(offset, 0))
+        is_fax = rng.random() < fax_share
+        direction = 'Outbound' if rng.random() < 0.5 else 'Inbound'
+        user = rng.choice(users)
+        party = {'extensionId': str(user['id']), 'name': user['name'], 'phoneNumber': direct_number(user)}
+        # Some records carry only the id, so directory enrichment has work to do
+        if rng.random() < 0.7:
+            party['extensionNumber'] = user['extensionNumber']
+        
+        mailbox = party['extensionId']
+        if phone_rng.random() < PHONE_ONLY_SHARE:
+            party = {'phoneNumber': party['phoneNumber']}
+        main_line = {'extensionId': MAIN_FAX['id'], 'extensionNumber': MAIN_FAX['extensionNumber'],
+                     'name': MAIN_FAX['name'], 'phoneNumber': MAIN_FAX['phoneNumber']}
+        if direction == 'Inbound' and is_fax and rng.random() < MAIN_FAX_SHARE:
+            party = main_line
+            mailbox = MAIN_FAX['id']
+        elif direction == 'Outbound' and is_fax and line_rng.random() < MAIN_FAX_SHARE:
+            party = main_line
+            mailbox = MAIN_FAX['id']
+        external = {'phoneNumber': _external_number(rng)}
+        if counterparty_rng.random() < REGULAR_COUNTERPARTY_SHARE:
+            external['phoneNumber'] = counterparty_rng.choices(regulars, regular_weights)[0]
+        if rng.random() < 0.3:
+            external['name'] = f"{rng.choice(LAST_NAMES)} Clinic"
+        
+        record = {
+            'uri': f"https://platform.ringcentral.com/restapi/v1.0/account/~/call-log/rec{seed}x{i}",
+            'id': f"rec{seed}x{i}",
+            'sessionId': str(400000000000 + i),
+            'startTime': start.strftime("%Y-%m-%dT%H:%M:%S.") + f"{start.microsecond // 1000:03d}Z",
+            'duration': rng.randint(20, 600) if is_fax else rng.randint(0, 1800),
+            'type': 'Fax' if is_fax else 'Voice',
+            'direction': direction,
+            'action': 'Outgoing Fax' if is_fax and direction == 'Outbound' else ('Incoming Fax' if is_fax else 'Phone Call'),
+            'result': _weighted(rng, FAX_RESULTS if is_fax else VOICE_RESULTS),
+            from_key: party if direction == 'Outbound' else external,
+            'to': external if direction == 'Outbound' else party,
+            'transport': 'PSTN',
+            'lastModifiedTime': start.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        }
+        if is_fax:
+            record['faxPageCount'] = rng.randint(1, 30)
+            message_id = f"{date_str.replace('-', '')}{i:07d}"
+            record['message'] = {
+                'id': message_id,
+                'type': 'Fax',
+                'uri': f"https://platform.ringcentral.com/restapi/v1.0/account/~/extension/{mailbox}/message-store/{message_id}"
+            }
+        yield record
+
+def fax_message(record, extensions_by_id):
+    """The message-store message a fax call-log record refers to
+    
+    An outbound message names the employee who sent it, even when the call
+    log only shows the main fax line.
+    """
+    message = record['message']
+    mailbox = message['uri'].split('/extension/')[1].split('/')[0]
+    owner = extensions_by_id.get(mailbox, {})
+    call_from = record.get('from') or record.get('from_') or {}
+    outbound = record['direction'] == 'Outbound'
+    sender_id = mailbox
+    
+    if outbound and mailbox == MAIN_FAX['id']:
+        # Same employee for the same message on every call
+        users = sorted((ext for ext in extensions_by_id.values() if ext['extensionNumber'] != MAIN_FAX['extensionNumber']),
+                       key=lambda ext: str(ext['id']))
+        owner = random.Random(message['id']).choice(users)
+        sender_id = str(owner['id'])
+    
+    if outbound:
+        sender = {'extensionId': sender_id, 'extensionNumber': owner.get('extensionNumber', ''),
+                  'name': owner.get('name', ''), 'phoneNumber': call_from.get('phoneNumber', '')}
+        status = 'Sent' if record['result'] == 'Sent' else 'SendingFailed'
+    else:
+        sender = dict(call_from)
+        status = 'Received' if record['result'] == 'Received' else 'DeliveryFailed'
+    
+    return {
+        'uri': message['uri'],
+        'id': message['id'],
+        'type': 'Fax',
+        'direction': record['direction'],
+        'creationTime': record['startTime'],
+        'lastModifiedTime': record['startTime'],
+        'messageStatus': status,
+        'readStatus': 'Read',
+        'availability': 'Alive',
+        'faxPageCount': record.get('faxPageCount', 0),
+        'faxResolution': 'High',
+        'from': sender,
+        'to': [record['to']],
+        'attachments': [{
+            'id': message['id'],
+            'uri': f"{message['uri']}/content/{message['id']}",
+            'type': 'RenderedDocument',
+            'contentType': 'application/pdf'
+        }]
+    }
+
+def call_log_records(count, ext_records, date_str=DEFAULT_DATE, seed=DEFAULT_SEED, fax_share=1.0, sdk_keys=False):
+    return list(iter_call_log_records(count, ext_records, date_str, seed, fax_share, sdk_keys))
+
+def analytics_payload(ext_records, date_str=DEFAULT_DATE, seed=DEFAULT_SEED, calls_per_extension=20):
+    """Response of POST /analytics/calls/v1/accounts/~/aggregation/fetch grouped by Users"""
+    rng = random.Random(f"{seed}-analytics-{date_str}")
+    records = []
+    for ext in ext_records:
+        if ext['extensionNumber'] == MAIN_FAX['extensionNumber']:
+            continue
+        inbound = max(0, int(rng.gauss(calls_per_extension / 2, calls_per_extension / 4)))
+        outbound = max(0, int(rng.gauss(calls_per_extension / 2, calls_per_extension / 4)))
+        records.append({
+            'key': str(ext['id']),
+            'info': {'extensionNumber': ext['extensionNumber'], 'name': ext['name']},
+            'counters': {
+                'allCalls': {'values': inbound + outbound, 'valueType': 'Count'},
+                'callsByDirection': {'values': {'inbound': inbound, 'outbound': outbound}, 'valueType': 'Count'}
+            }
+        })
+    return {
+        'paging': {'page': 1, 'perPage': len(records), 'pageCount': 1, 'totalPageCount': 1},
+        'data': {'groupedBy': 'Users', 'records': records}
+    }
+
+def analytics_timeline_payload(ext_records, date_str=DEFAULT_DATE, seed=DEFAULT_SEED, interval_hours=1, calls_per_extension=20):
+    """Response of POST /analytics/calls/v1/accounts/~/timeline/fetch grouped by Users
+    
+    Each user's aggregation totals spread over the day's intervals.
+    """
+    aggregation = analytics_payload(ext_records, date_str, seed, calls_per_extension)
+    rng = random.Random(f"{seed}-timeline-{date_str}")
+    day_start = datetime.strptime(date_str, "%Y-%m-%d")
+    intervals = [day_start + timedelta(hours=h) for h in range(0, 24, interval_hours)]
+    
+    records = []
+    for record in aggregation['data']['records']:
+        direction = record['counters']['callsByDirection']['values']
+        points = [{'inbound': 0, 'outbound': 0} for _ in intervals]
+        for key in ('inbound', 'outbound'):
+            for _ in range(direction[key]):
+                points[rng.randrange(len(intervals))][key] += 1
+        records.append({
+            'key': record['key'],
+            'info': record['info'],
+            'points': [{
+                'time': start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                'counters': {
+                    'allCalls': {'values': point['inbound'] + point['outbound'], 'valueType': 'Count'},
+                    'callsByDirection': {'values': point, 'valueType': 'Count'}
+                }
+            } for start, point in zip(intervals, points)]
+        })
+    return {
+        'paging': {'page': 1, 'perPage': len(records), 'pageCount': 1, 'totalPageCount': 1},
+        'data': {'groupedBy': 'Users', 'records': records}
+    }
+
+def generate_dataset(records, extensions, date_str=DEFAULT_DATE, seed=DEFAULT_SEED, fax_share=1.0, sdk_keys=True):
+    """Everything one report day needs: extension records, directory, phone numbers, call log, Analytics"""
+    ext_records = extension_records(extensions, seed)
+    return {
+        'date': date_str,
+        'seed': seed,
+        'extensions': ext_records,
+        'directory': directory_from_extensions(ext_records),
+        'phone_numbers': phone_number_records(ext_records),
+        'call_log': call_log_records(records, ext_records, date_str, seed, fax_share, sdk_keys),
+        'analytics': analytics_payload(ext_records, date_str, seed)
+    }
+
+def _arg(name, default):
+    if name in sys.argv:
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
+def main():
+    records = int(_arg('--records', '10000'))
+    extensions = int(_arg('--extensions', '200'))
+    seed = int(_arg('--seed', str(DEFAULT_SEED)))
+    date_str = _arg('--date', DEFAULT_DATE)
+    fax_share = float(_arg('--fax-share', '1.0'))
+    out_dir = _arg('--out', 'exports/synthetic')
+    
+    print(f"🧪 Generating {records} call-log records for {extensions} extensions (seed {seed}, {date_str})")
+    os.makedirs(out_dir, exist_ok=True)
+    ext_records = extension_records(extensions, seed)
+    
+    with open(os.path.join(out_dir, 'extensions.json'), 'w') as f:
+        json.dump(ext_records, f)
+    with open(os.path.join(out_dir, 'phone-numbers.json'), 'w') as f:
+        json.dump(phone_number_records(ext_records), f)
+    with open(os.path.join(out_dir, f"analytics-{date_str}.json"), 'w') as f:
+        json.dump(analytics_payload(ext_records, date_str, seed), f)
+    # JSON lines, written as generated, so 1M records never sit in memory
+    with open(os.path.join(out_dir, f"call-log-{date_str}.jsonl"), 'w') as f:
+        for record in iter_call_log_records(records, ext_records, date_str, seed, fax_share):
+            f.write(json.dumps(record) + '\n')
+    
+    print(f"✅ Written to {out_dir}/")
+
+if __name__ == "__main__":
+    main()
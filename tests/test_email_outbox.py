@@ -0,0 +1,132 @@
+"""Claiming, retrying and giving up on queued emails"""
+
+import os
+import time
+import smtplib
+
+import pytest
+
+import email_outbox
+import send_complete_reports
+
+class FakeSession:
+    """Stands in for an open SMTP session; each send takes the next outcome"""
+    
+    def __init__(self, outcomes=()):
+        self.outcomes = list(outcomes)
+        self.sent = []
+    
+    def send(self, sender, recipients, path):
+        outcome = self.outcomes.pop(0) if self.outcomes else None
+        if isinstance(outcome, Exception):
+            raise outcome
+        with open(path, 'rb') as f:
+            self.sent.append((list(recipients), f.read()))
+        return {}
+
+@pytest.fixture
+def outbox(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('EMAIL_PASSWORD', 'unused')
+    session = FakeSession()
+    monkeypatch.setattr(send_complete_reports, 'send_streamed_message',
+                        lambda server, sender, recipients, path: session.send(sender, recipients, path))
+    monkeypatch.setattr(send_complete_reports, 'open_smtp_session', lambda sender, password: session)
+    monkeypatch.setattr(send_complete_reports, 'close_smtp_session', lambda server: None)
+    monkeypatch.setattr(email_outbox.random, 'uniform', lambda low, high: 1.0)
+    return session
+
+def queue(tmp_path, name='report', recipients=('boss@example.com',)):
+    path = tmp_path / f"{name}.eml"
+    path.write_bytes(b"Subject: report\r\n\r\nbody\r\n")
+    return email_outbox.enqueue_message(str(path), 'reports@example.com', list(recipients), 'report')
+
+def pending_meta(message_id):
+    return {m['id']: m for m in email_outbox.list_messages(email_outbox.PENDING_DIR)}.get(message_id)
+
+def make_due(message_id):
+    meta = pending_meta(message_id)
+    meta['next_attempt_at'] = 0
+    email_outbox._write_json_atomic(os.path.join(email_outbox.PENDING_DIR, f"{message_id}.json"), meta)
+
+def test_delivery_keeps_only_the_envelope(outbox, tmp_path):
+    message_id = queue(tmp_path)
+    
+    assert email_outbox.deliver_pending() == (1, 0, 0)
+    assert outbox.sent == [(['boss@example.com'], b"Subject: report\r\n\r\nbody\r\n")]
+    assert os.listdir(email_outbox.PENDING_DIR) == []
+    assert os.listdir(email_outbox.SENT_DIR) == [f"{message_id}.json"]
+
+def test_a_claimed_message_is_left_to_its_sender(outbox, tmp_path):
+    message_id = queue(tmp_path)
+    assert email_outbox._claim(message_id)
+    assert email_outbox._claim(message_id) is None
+    
+    assert email_outbox.deliver_pending() == (0, 0, 0)
+    assert outbox.sent == []
+
+def test_a_stale_claim_is_released(outbox, tmp_path):
+    message_id = queue(tmp_path)
+    claim_path = email_outbox._claim(message_id)
+    old = time.time() - email_outbox.STALE_CLAIM_SECONDS - 1
+    os.utime(claim_path, (old, old))
+    
+    assert email_outbox.deliver_pending() == (1, 0, 0)
+
+def test_a_transient_failure_is_retried_later(outbox, tmp_path):
+    message_id = queue(tmp_path)
+    outbox.outcomes = [smtplib.SMTPServerDisconnected('connection dropped')]
+    
+    assert email_outbox.deliver_pending() == (0, 1, 0)
+    meta = pending_meta(message_id)
+    assert meta['attempts'] == 1
+    assert meta['last_error'] == 'connection dropped'
+    assert meta['next_attempt_at'] >= time.time() + email_outbox.BASE_RETRY_DELAY - 1
+    
+    # Not due yet, so the next pass leaves it alone
+    assert email_outbox.deliver_pending() == (0, 1, 0)
+    assert outbox.sent == []
+    
+    make_due(message_id)
+    assert email_outbox.deliver_pending() == (1, 0, 0)
+    assert len(outbox.sent) == 1
+
+def test_a_permanent_failure_is_not_retried(outbox, tmp_path):
+    message_id = queue(tmp_path)
+    outbox.outcomes = [smtplib.SMTPDataError(554, b'message rejected')]
+    
+    assert email_outbox.deliver_pending() == (0, 0, 1)
+    assert sorted(os.listdir(email_outbox.FAILED_DIR)) == [f"{message_id}.eml", f"{message_id}.json"]
+    assert os.listdir(email_outbox.PENDING_DIR) == []
+
+def test_giving_up_after_max_attempts(outbox, tmp_path):
+    message_id = queue(tmp_path)
+    outbox.outcomes = [smtplib.SMTPServerDisconnected('down')] * email_outbox.MAX_ATTEMPTS
+    
+    for attempt in range(1, email_outbox.MAX_ATTEMPTS):
+        assert email_outbox.deliver_pending() == (0, 1, 0)
+        assert pending_meta(message_id)['attempts'] == attempt
+        make_due(message_id)
+    
+    assert email_outbox.deliver_pending() == (0, 0, 1)
+    assert os.path.exists(os.path.join(email_outbox.FAILED_DIR, f"{message_id}.eml"))
+
+def test_retry_delays_grow_and_are_capped():
+    delays = [email_outbox.retry_delay(attempts) for attempts in range(1, 12)]
+    assert delays[:3] == pytest.approx([30, 60, 120], rel=0.2)
+    assert max(delays) <= email_outbox.MAX_RETRY_DELAY * 1.2
+
+def test_old_delivery_records_are_pruned(outbox, tmp_path):
+    old_id, new_id = queue(tmp_path, 'old'), queue(tmp_path, 'new')
+    email_outbox.deliver_pending()
+    old_record = os.path.join(email_outbox.SENT_DIR, f"{old_id}.json")
+    old = time.time() - (email_outbox.SENT_RETENTION_DAYS + 1) * 86400
+    os.utime(old_record, (old, old))
+    
+    email_outbox.prune_sent()
+    assert os.listdir(email_outbox.SENT_DIR) == [f"{new_id}.json"]
+
+def test_drain_returns_once_the_outbox_is_empty(outbox, tmp_path):
+    queue(tmp_path)
+    assert email_outbox.drain_outbox(5)
+    assert email_outbox.drain_outbox(5)
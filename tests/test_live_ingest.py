@@ -0,0 +1,117 @@
+"""Replaying a captured event file into a local webhook endpoint"""
+
+import os
+import json
+import time
+import threading
+from http.server import HTTPServer
+from urllib.request import urlopen
+from urllib.error import HTTPError
+
+import pytest
+
+import live_ingest
+
+DATE = '2025-11-20'
+DIRECTORY = {'111': {'extensionNumber': '101', 'name': 'Ana Front'}, '222': {'extensionNumber': '102', 'name': 'Ivan Intake'}}
+
+def telephony(uuid, session, party_id, extension_id, direction, status, event_time):
+    return {
+        'uuid': uuid,
+        'event': '/restapi/v1.0/account/~/telephony/sessions',
+        'timestamp': event_time,
+        'body': {
+            'telephonySessionId': session,
+            'creationTime': f"{DATE}T09:00:00Z",
+            'eventTime': event_time,
+            'parties': [{'id': party_id, 'extensionId': extension_id, 'direction': direction, 'status': {'code': status}}]
+        }
+    }
+
+def fax(uuid, status, event_time):
+    return {
+        'uuid': uuid,
+        'event': '/restapi/v1.0/account/~/extension/111/message-store',
+        'timestamp': event_time,
+        'body': {
+            'extensionId': '111',
+            'messages': [{
+                'id': 'm1', 'type': 'Fax', 'direction': 'Outbound', 'messageStatus': status,
+                'creationTime': f"{DATE}T10:00:00Z", 'faxPageCount': 3,
+                'from': {'phoneNumber': '+13175550101'}, 'to': [{'phoneNumber': '+13175559999'}]
+            }]
+        }
+    }
+
+CAPTURED = [
+    telephony('e1', 's1', 'p1', '111', 'Inbound', 'Proceeding', f"{DATE}T09:00:00Z"),
+    telephony('e2', 's1', 'p1', '111', 'Inbound', 'Answered', f"{DATE}T09:00:05Z"),
+    telephony('e3', 's1', 'p1', '111', 'Inbound', 'Disconnected', f"{DATE}T09:00:35Z"),
+    telephony('e3', 's1', 'p1', '111', 'Inbound', 'Disconnected', f"{DATE}T09:00:35Z"),  # Redelivered
+    telephony('e4', 's2', 'p2', '222', 'Outbound', 'Disconnected', f"{DATE}T09:30:00Z"),
+    fax('e5', 'Queued', f"{DATE}T10:00:00Z"),
+    fax('e6', 'Sent', f"{DATE}T10:01:00Z"),
+]
+
+@pytest.fixture
+def endpoint(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(live_ingest, 'VERIFICATION_TOKEN', '')
+    state = live_ingest.LiveState(DIRECTORY)
+    # Single-threaded, so each event is applied before the next one is read
+    # (the endpoint acknowledges first, then applies)
+    server = HTTPServer(('127.0.0.1', 0), live_ingest.make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield state, f"http://127.0.0.1:{server.server_address[1]}/webhook"
+    server.shutdown()
+    server.server_close()
+
+def wait_for_events(state, count, timeout=5):
+    # The last event may still be being applied when the replayer returns
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        snapshot = state.snapshot(DATE)
+        if snapshot and snapshot['events'] >= count:
+            return
+        time.sleep(0.02)
+
+def test_replayed_events_update_counters_and_record_store(endpoint, tmp_path):
+    state, url = endpoint
+    capture = tmp_path / 'events.jsonl'
+    capture.write_text(''.join(json.dumps(event) + '\n' for event in CAPTURED))
+    
+    assert live_ingest.replay_events(str(capture), url) == len(CAPTURED)
+    wait_for_events(state, 6)  # 4 telephony + 2 fax updates; the redelivery is dropped
+    
+    counters = state.snapshot(DATE)['counters']
+    assert counters['101']['calls_received'] == 1
+    assert counters['101']['answered_calls'] == 1
+    assert counters['101']['talk_seconds'] == 30
+    assert counters['101']['missed_calls'] == 0
+    assert counters['102']['calls_made'] == 1
+    # Queued -> Sent counts the fax once
+    assert counters['101']['faxes_sent'] == 1
+    
+    # The fax lands in the record store once, with its latest status
+    records = state.store.records(DATE)
+    assert [(r['id'], r['result'], r['from_']['extensionNumber']) for r in records] == [('msg-m1', 'Sent', '101')]
+    assert state.snapshot(DATE)['records'] == records
+
+def get_status(url):
+    try:
+        with urlopen(url) as response:
+            return response.status
+    except HTTPError as e:
+        return e.code
+
+def test_live_queries_validate_dates_and_do_not_create_days(endpoint):
+    state, url = endpoint
+    live_url = url.replace('/webhook', '/live')
+    
+    assert get_status(f"{live_url}?date=foo") == 400
+    assert get_status(f"{live_url}?date=2025-13-45") == 400
+    assert get_status(f"{live_url}?date=2024-01-01") == 404
+    assert state.days == {}
+    
+    state.flush()
+    assert not os.path.exists(live_ingest.state_path('2024-01-01'))
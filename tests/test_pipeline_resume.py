@@ -0,0 +1,79 @@
+"""Which pipeline steps a --resume run reuses and which it runs again"""
+
+import pytest
+
+import tracing
+import pipeline
+from retry_policy import RUN_POLICY
+
+DATE = '2025-11-20'
+
+@pytest.fixture
+def steps(tmp_path, monkeypatch):
+    """Replace every step with a fake that records its runs; returns the run log"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(tracing, 'TRACE_DIR', '')
+    runs = []
+    behaviour = {}  # step name -> 'fail' / 'partial'
+    
+    def fake(name):
+        def run(ctx):
+            runs.append(name)
+            if behaviour.get(name) == 'fail':
+                raise RuntimeError(f"{name} broke")
+            if behaviour.get(name) == 'partial':
+                RUN_POLICY.mark_partial(f"{name} gave up early")
+            if name == 'render':
+                path = tmp_path / 'report.xlsx'
+                path.write_text('rendered')
+                return [str(path)]
+            return {'step': name}
+        return run
+    
+    for step in pipeline.STEPS:
+        monkeypatch.setitem(step, 'run', fake(step['name']))
+    return runs, behaviour
+
+def run(resume):
+    date_from, date_to, date_str = pipeline.report_dates(DATE)
+    return pipeline.run_pipeline(date_from, date_to, date_str, resume=resume)
+
+PERSISTED = [step['name'] for step in pipeline.STEPS if step.get('persist', True)]
+
+def test_resume_restarts_at_the_failed_step(steps):
+    runs, behaviour = steps
+    behaviour['send'] = 'fail'
+    assert not run(resume=False)
+    assert sorted(runs) == sorted(PERSISTED)
+    
+    runs.clear()
+    behaviour.clear()
+    assert run(resume=True)
+    assert runs == ['send']
+
+def test_without_resume_every_step_runs_again(steps):
+    runs, _ = steps
+    assert run(resume=False)
+    runs.clear()
+    assert run(resume=False)
+    assert sorted(runs) == sorted(PERSISTED)
+
+def test_partial_steps_and_their_dependents_are_fetched_again(steps):
+    runs, behaviour = steps
+    behaviour['fax_fetch'] = 'partial'
+    assert run(resume=False)
+    
+    runs.clear()
+    behaviour.clear()
+    assert run(resume=True)
+    assert sorted(runs) == sorted(['fax_fetch', 'fax_attribution', 'extension_resolution', 'aggregate', 'render', 'send'])
+
+def test_an_edited_report_is_rendered_again(steps, tmp_path):
+    runs, _ = steps
+    assert run(resume=False)
+    (tmp_path / 'report.xlsx').write_text('edited by hand')
+    
+    runs.clear()
+    assert run(resume=True)
+    # Same inputs render the same report, which was already sent
+    assert runs == ['render']
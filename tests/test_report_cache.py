@@ -0,0 +1,105 @@
+"""When rendered reports and parsed summaries are reused"""
+
+import os
+import json
+import threading
+
+import pytest
+
+import report_cache
+
+RECORDS = [{'id': '1', 'type': 'Voice', 'duration': 30}, {'id': '2', 'type': 'Fax', 'duration': 0}]
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'render.py').write_text("# renderer v1\n")
+    return tmp_path
+
+def test_records_key_ignores_order_but_not_content(workdir):
+    key = report_cache.records_key(RECORDS, {'date': '2025-11-20'}, ['render.py'])
+    assert report_cache.records_key(list(reversed(RECORDS)), {'date': '2025-11-20'}, ['render.py']) == key
+    
+    changed = [dict(RECORDS[0], duration=31), RECORDS[1]]
+    assert report_cache.records_key(changed, {'date': '2025-11-20'}, ['render.py']) != key
+    assert report_cache.records_key(RECORDS, {'date': '2025-11-21'}, ['render.py']) != key
+    
+    (workdir / 'render.py').write_text("# renderer v2\n")
+    assert report_cache.records_key(RECORDS, {'date': '2025-11-20'}, ['render.py']) != key
+
+def test_render_if_changed_reuses_unchanged_artifacts(workdir):
+    renders = []
+    
+    def render():
+        renders.append(1)
+        with open('report.xlsx', 'w') as f:
+            f.write(f"render {len(renders)}")
+    
+    key = report_cache.records_key(RECORDS, {}, ['render.py'])
+    assert report_cache.render_if_changed('report.xlsx', key, render)
+    assert not report_cache.render_if_changed('report.xlsx', key, render)
+    assert len(renders) == 1
+    
+    # New inputs render again
+    other_key = report_cache.records_key(RECORDS[:1], {}, ['render.py'])
+    assert report_cache.render_if_changed('report.xlsx', other_key, render)
+    assert len(renders) == 2
+
+def test_an_edited_or_missing_artifact_is_rendered_again(workdir):
+    renders = []
+    
+    def render():
+        renders.append(1)
+        with open('report.xlsx', 'w') as f:
+            f.write('rendered')
+    
+    key = report_cache.records_key(RECORDS, {}, ['render.py'])
+    report_cache.render_if_changed('report.xlsx', key, render)
+    
+    with open('report.xlsx', 'a') as f:
+        f.write(' and edited by hand')
+    assert report_cache.render_if_changed('report.xlsx', key, render)
+    
+    os.remove('report.xlsx')
+    assert report_cache.render_if_changed('report.xlsx', key, render)
+    assert len(renders) == 3
+
+def test_cached_summary_parses_each_file_once(workdir):
+    (workdir / 'report.xlsx').write_text('contents')
+    loads = []
+    
+    def loader():
+        loads.append(1)
+        return {'total': 3}
+    
+    assert report_cache.cached_summary('report.xlsx', loader) == {'total': 3}
+    assert report_cache.cached_summary('report.xlsx', loader) == {'total': 3}
+    assert len(loads) == 1
+    
+    (workdir / 'report.xlsx').write_text('new contents')
+    report_cache.cached_summary('report.xlsx', loader)
+    assert len(loads) == 2
+
+def test_concurrent_manifest_updates_keep_every_entry(workdir):
+    paths = [f"report-{i}.xlsx" for i in range(40)]
+    for path in paths:
+        (workdir / path).write_text(path)
+    errors = []
+    
+    def worker(chunk):
+        try:
+            for path in chunk:
+                report_cache.record_artifacts([path], f"key-{path}")
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=worker, args=(paths[i::4],)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert errors == []
+    with open(report_cache.MANIFEST_FILE) as f:
+        assert sorted(json.load(f)) == sorted(paths)
+    assert not [name for name in os.listdir(report_cache.CACHE_DIR) if name.endswith('.tmp')]
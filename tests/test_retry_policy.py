@@ -0,0 +1,122 @@
+"""What the retry policy retries, and how the run deadline stops it"""
+
+import time
+
+import pytest
+import requests
+from ringcentral.http import Client
+
+import retry_policy
+from retry_policy import BudgetExhausted, CircuitOpen, RetryPolicy, is_retryable
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+    
+    def response(self):
+        return self
+
+class HttpError(Exception):
+    """Shaped like the SDK's ApiException for a request that got a response"""
+    
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self._response = FakeResponse(status_code, headers)
+    
+    def api_response(self):
+        return self._response
+
+def sdk_connection_error():
+    """The ApiException the SDK raises when nothing is listening"""
+    request = requests.Request('GET', 'http://127.0.0.1:9/restapi/v1.0/account/~')
+    with pytest.raises(Exception) as caught:
+        Client().send(request)
+    return caught.value
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(retry_policy.random, 'uniform', lambda low, high: 0)
+    return lambda seconds: None
+
+def failing(errors):
+    """func for RetryPolicy.call() that raises each error in turn, then returns 'ok'"""
+    calls = []
+    
+    def func():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return 'ok'
+    return func, calls
+
+@pytest.mark.parametrize('status, retryable', [(429, True), (500, True), (503, True), (400, False), (404, False)])
+def test_http_statuses(status, retryable):
+    assert is_retryable(HttpError(status)) is retryable
+
+def test_transport_errors_are_retried():
+    assert is_retryable(requests.exceptions.ConnectionError())
+    assert is_retryable(requests.exceptions.Timeout())
+    assert is_retryable(ConnectionResetError())
+    assert is_retryable(sdk_connection_error())
+
+def test_bugs_and_deadline_errors_are_not_retried():
+    assert not is_retryable(KeyError('id'))
+    assert not is_retryable(TypeError())
+    assert not is_retryable(requests.exceptions.MissingSchema())
+    assert not is_retryable(BudgetExhausted())
+    assert not is_retryable(CircuitOpen())
+
+def test_server_errors_are_retried_until_success(no_sleep):
+    policy = RetryPolicy()
+    func, calls = failing([HttpError(503), requests.exceptions.ConnectionError()])
+    assert policy.call(func, sleep=no_sleep) == 'ok'
+    assert len(calls) == 3
+
+def test_a_bug_is_raised_at_once_and_not_counted_by_the_breaker(no_sleep):
+    policy = RetryPolicy()
+    for _ in range(retry_policy.FAILURE_THRESHOLD):
+        func, calls = failing([KeyError('id')])
+        with pytest.raises(KeyError):
+            policy.call(func, 'calls', sleep=no_sleep)
+        assert len(calls) == 1
+    assert policy._open_until == {}
+
+def test_budget_exhausted_inside_func_is_not_retried(no_sleep):
+    policy = RetryPolicy()
+    func, calls = failing([BudgetExhausted('rate budget')])
+    with pytest.raises(BudgetExhausted):
+        policy.call(func, sleep=no_sleep)
+    assert len(calls) == 1
+
+def test_rate_limits_honour_retry_after():
+    policy = RetryPolicy()
+    waits, blocked = [], []
+    func, calls = failing([HttpError(429, {'Retry-After': '7'})])
+    assert policy.call(func, sleep=waits.append, on_rate_limited=blocked.append) == 'ok'
+    assert blocked == [7]
+    assert 7 <= waits[0] <= 8
+
+def test_a_wait_past_the_deadline_raises_instead_of_sleeping():
+    policy = RetryPolicy(deadline_seconds=5)
+    waits = []
+    func, calls = failing([HttpError(429, {'Retry-After': '60'})])
+    with pytest.raises(BudgetExhausted):
+        policy.call(func, sleep=waits.append)
+    assert waits == []
+    assert len(calls) == 1
+
+def test_no_attempt_after_the_deadline():
+    policy = RetryPolicy(deadline_seconds=0)
+    time.sleep(0.01)
+    func, calls = failing([])
+    with pytest.raises(BudgetExhausted):
+        policy.call(func)
+    assert calls == []
+
+def test_repeated_server_errors_open_the_circuit_until_the_deadline(no_sleep):
+    policy = RetryPolicy(deadline_seconds=60)
+    func, calls = failing([HttpError(500)] * retry_policy.FAILURE_THRESHOLD)
+    with pytest.raises(CircuitOpen):
+        policy.call(func, 'calls', sleep=no_sleep)
+    assert len(calls) == retry_policy.FAILURE_THRESHOLD
@@ -0,0 +1,173 @@
+"""Team fan-out against a local SMTP stand-in (aiosmtpd)"""
+
+import io
+import json
+import email
+import socket
+import smtplib
+
+import pytest
+
+aiosmtpd_controller = pytest.importorskip('aiosmtpd.controller')
+openpyxl = pytest.importorskip('openpyxl')
+
+import tracing
+import send_complete_reports
+
+DATE = '2025-11-20'
+
+CALL_SUMMARY = {
+    'total_made': 9, 'total_received': 6, 'total_calls': 15, 'total_minutes': 40,
+    'all_callers': [
+        {'name': 'Ana Front', 'ext': '5001', 'calls_made': 4, 'calls_received': 2, 'calls': 6, 'minutes': 15},
+        {'name': 'Ivan Intake', 'ext': '1268', 'calls_made': 3, 'calls_received': 3, 'calls': 6, 'minutes': 20},
+        {'name': 'Bea Billing', 'ext': '3003', 'calls_made': 2, 'calls_received': 1, 'calls': 3, 'minutes': 5},
+    ]
+}
+FAX_SUMMARY = {
+    'senders': [
+        {'name': 'Ana Front', 'ext': '5001', 'sent': 2},
+        {'name': 'Bea Billing', 'ext': '3003', 'sent': 1},
+    ],
+    'by_extension': {'5001': {'sent': 2, 'received': 1}, '3003': {'sent': 1, 'received': 0}},
+    'total_sent': 3, 'total_received': 1, 'total': 4
+}
+
+class RecordingHandler:
+    def __init__(self, pipelining=False):
+        self.pipelining = pipelining
+        self.messages = []  # (session id, recipients, raw message)
+    
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        session.host_name = hostname
+        if self.pipelining:
+            responses.insert(1, '250-PIPELINING')
+        return responses
+    
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith('nobody@'):
+            return '550 No such user'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+    
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((id(session), list(envelope.rcpt_tos), envelope.content))
+        return '250 OK'
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+@pytest.fixture(params=[False, True], ids=['plain', 'pipelined'])
+def smtp_server(request, tmp_path, monkeypatch):
+    handler = RecordingHandler(pipelining=request.param)
+    port = _free_port()
+    controller = aiosmtpd_controller.Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+    
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(tracing, 'TRACE_DIR', '')
+    monkeypatch.setenv('SMTP_HOST', '127.0.0.1')
+    monkeypatch.setenv('SMTP_PORT', str(port))
+    monkeypatch.setenv('SMTP_STARTTLS', '0')
+    monkeypatch.setenv('EMAIL_PASSWORD', 'unused')
+    monkeypatch.setenv('SENDER_EMAIL', 'reports@example.com')
+    monkeypatch.setenv('RECIPIENT_EMAILS', 'boss@example.com,intake@example.com,desk@example.com')
+    (tmp_path / 'recipient_teams.json').write_text(json.dumps({
+        'teams': {'Reception': ['5001', '5002'], 'Intake': ['1268']},
+        'recipients': {
+            'boss@example.com': '*',
+            'intake@example.com': ['Intake'],
+            'desk@example.com': ['Reception', 'Intake']
+        }
+    }))
+    # The summaries normally come from the rendered reports
+    monkeypatch.setattr(send_complete_reports, 'get_call_summary', lambda date_str: CALL_SUMMARY)
+    monkeypatch.setattr(send_complete_reports, 'get_fax_summary', lambda date_str: FAX_SUMMARY)
+    yield handler
+    controller.stop()
+
+def _attached_callers(raw):
+    """Employee names in the Call Activity sheet of each attached team workbook"""
+    names = {}
+    for part in email.message_from_bytes(raw).walk():
+        filename = part.get_filename()
+        if filename and filename.endswith('-activity.xlsx'):
+            wb = openpyxl.load_workbook(io.BytesIO(part.get_payload(decode=True)))
+            names[filename] = {row[0] for row in wb['Call Activity'].iter_rows(min_row=2, values_only=True)}
+    return names
+
+def _html_body(raw):
+    for part in email.message_from_bytes(raw).walk():
+        if part.get_content_type() == 'text/html':
+            return part.get_payload(decode=True).decode('utf-8')
+    return ''
+
+def test_each_recipient_gets_only_their_slice_over_one_session(smtp_server, tmp_path):
+    assert send_complete_reports.send_email_with_reports(DATE)
+    
+    by_recipients = {tuple(rcpts): raw for _, rcpts, raw in smtp_server.messages}
+    assert set(by_recipients) == {('boss@example.com',), ('intake@example.com',), ('desk@example.com',)}
+    # One SMTP session carried the whole fan-out
+    assert len({session for session, _, _ in smtp_server.messages}) == 1
+    
+    assert _attached_callers(by_recipients[('intake@example.com',)]) == {
+        f"{DATE}-intake-activity.xlsx": {'Ivan Intake'}
+    }
+    assert _attached_callers(by_recipients[('desk@example.com',)]) == {
+        f"{DATE}-intake-reception-activity.xlsx": {'Ana Front', 'Ivan Intake'}
+    }
+    # The full report recipient gets no team slice, and no team sees other staff
+    assert _attached_callers(by_recipients[('boss@example.com',)]) == {}
+    assert 'Bea Billing' in _html_body(by_recipients[('boss@example.com',)])
+    for team_recipient in (('intake@example.com',), ('desk@example.com',)):
+        assert 'Bea Billing' not in _html_body(by_recipients[team_recipient])
+    
+    # Team workbooks are not left behind once their messages are queued
+    assert not list((tmp_path / 'exports' / '.outgoing').glob('*.xlsx'))
+
+def test_refused_recipients_are_reported_and_the_rest_delivered(smtp_server, tmp_path):
+    message = tmp_path / 'message.eml'
+    message.write_bytes(b"Subject: test\r\n\r\n.leading dot\r\nbody\r\n")
+    server = send_complete_reports.open_smtp_session('reports@example.com', 'unused')
+    try:
+        assert bool(server.has_extn('pipelining')) is smtp_server.pipelining
+        refused = send_complete_reports.send_streamed_message(
+            server, 'reports@example.com', ['boss@example.com', 'nobody@example.com'], str(message))
+        assert list(refused) == ['nobody@example.com']
+        
+        with pytest.raises(smtplib.SMTPRecipientsRefused):
+            send_complete_reports.send_streamed_message(server, 'reports@example.com', ['nobody@example.com'], str(message))
+        
+        # The session is still usable after a refused message
+        send_complete_reports.send_streamed_message(server, 'reports@example.com', ['desk@example.com'], str(message))
+    finally:
+        send_complete_reports.close_smtp_session(server)
+    
+    assert [rcpts for _, rcpts, _ in smtp_server.messages] == [['boss@example.com'], ['desk@example.com']]
+    assert b"\r\n.leading dot\r\n" in smtp_server.messages[0][2]
+
+@pytest.mark.parametrize('link_dir', [False, True], ids=['no-link-dir', 'link-dir'])
+def test_oversized_team_workbooks_are_kept_unless_published(smtp_server, tmp_path, monkeypatch, link_dir):
+    if link_dir:
+        monkeypatch.setenv('REPORT_LINK_DIR', str(tmp_path / 'shared'))
+    else:
+        monkeypatch.delenv('REPORT_LINK_DIR', raising=False)
+    # Too small for any workbook, so every team workbook is linked out
+    monkeypatch.setattr(send_complete_reports, 'get_smtp_message_limit', lambda server=None: 64 * 1024)
+    
+    assert send_complete_reports.send_email_with_reports(DATE)
+    
+    intake_body = next(_html_body(raw) for _, rcpts, raw in smtp_server.messages if rcpts == ['intake@example.com'])
+    kept = sorted(p.name for p in (tmp_path / 'exports' / '.outgoing').glob('*.xlsx'))
+    if link_dir:
+        assert kept == []
+        assert sorted(p.name for p in (tmp_path / 'shared').glob('*.xlsx')) == [
+            f"{DATE}-intake-activity.xlsx", f"{DATE}-intake-reception-activity.xlsx"
+        ]
+        assert 'shared' in intake_body
+    else:
+        # Nothing else holds a copy, so the workbooks stay where the email says they are
+        assert kept == [f"{DATE}-intake-activity.xlsx", f"{DATE}-intake-reception-activity.xlsx"]
+        assert 'exports/.outgoing' in intake_body
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Tracing - Phase-level spans and throttled progress output
+Every phase of a run (auth, directory, each call-log page and window,
+extract, aggregate, render, SMTP) is recorded as a span with its duration
+and counts, one JSON line per span, in exports/.traces/<date>.jsonl.
+Spans from one process share a trace id and nest via 'parent'.
+
+Usage:
+    python tracing.py                                   # Newest trace file
+    python tracing.py exports/.traces/2025-11-20.jsonl  # Where the time went
+
+Set TRACE_DIR= (empty) to turn tracing off.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import functools
+import threading
+from contextlib import contextmanager, nullcontext
+
+TRACE_DIR = os.getenv('TRACE_DIR', 'exports/.traces')
+
+# Progress lines are redrawn at most this often
+PROGRESS_INTERVAL_SECONDS = 0.25
+
+TRACE_ID = uuid.uuid4().hex[:12]
+
+_lock = threading.Lock()
+_local = threading.local()
+_trace_name = None
+_phase_hook = None
+
+def set_trace_name(name):
+    """Name of the trace file for this run (normally the report date)"""
+    global _trace_name
+    _trace_name = name
+
+def set_phase_hook(hook):
+    """hook(name) -> context manager wrapped around every span (profiling.py), or None"""
+    global _phase_hook
+    _phase_hook = hook
+
+def trace_path(name=None):
+    return os.path.join(TRACE_DIR, f"{name or _trace_name or time.strftime('%Y-%m-%d')}.jsonl")
+
+def _write(entry):
+    if not TRACE_DIR:
+        return
+    with _lock:
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        with open(trace_path(), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, default=str) + '\n')
+
+class Span:
+    """One timed phase; attributes set on it end up in its JSON line"""
+    
+    def __init__(self, name, parent=None, **attributes):
+        self.name = name
+        self.id = uuid.uuid4().hex[:8]
+        self.parent = parent
+        self.attributes = attributes
+        self.started = time.time()
+    
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+    
+    def add(self, key, amount=1):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+@contextmanager
+def span(name, **attributes):
+    """Time a phase; nested spans in the same thread record it as their parent"""
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    current = Span(name, parent=stack[-1].id if stack else None, **attributes)
+    stack.append(current)
+    error = None
+    try:
+        with _phase_hook(name) if _phase_hook else nullcontext():
+            yield current
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        stack.pop()
+        entry = {
+            'trace': TRACE_ID,
+            'span': current.id,
+            'parent': current.parent,
+            'name': name,
+            'start': round(current.started, 3),
+            'seconds': round(time.time() - current.started, 4),
+            'thread': threading.current_thread().name
+        }
+        entry.update(current.attributes)
+        if error:
+            entry['error'] = error
+        _write(entry)
+
+def traced(name):
+    """Decorator form of span() for a function that is one whole phase"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+class Progress:
+    """A '\\r' progress line redrawn a few times a second instead of per item"""
+    
+    def __init__(self, label, total, interval=PROGRESS_INTERVAL_SECONDS):
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self._last = 0.0
+        self._shown = False
+    
+    def __enter__(self):
+        return self
+    
+    def update(self, done):
+        now = time.monotonic()
+        if now - self._last >= self.interval or done == self.total:
+            self._last = now
+            self._shown = True
+            print(f"{self.label} {done}/{self.total}...", end='\r', flush=True)
+    
+    def __exit__(self, *exc):
+        if self._shown:
+            print()
+        return False
+
+def load_spans(path):
+    spans = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                spans.append(json.loads(line))
+            except ValueError:
+                continue
+    return spans
+
+def print_summary(path):
+    """Total time per phase for the newest trace id in a file"""
+    spans = load_spans(path)
+    if not spans:
+        print(f"📭 No spans in {path}")
+        return
+    
+    trace_id = spans[-1]['trace']
+    spans = [s for s in spans if s['trace'] == trace_id]
+    run_seconds = max(s['start'] + s['seconds'] for s in spans) - min(s['start'] for s in spans)
+    
+    phases = {}
+    for s in spans:
+        phase = phases.setdefault(s['name'], {'count': 0, 'seconds': 0.0, 'errors': 0})
+        phase['count'] += 1
+        phase['seconds'] += s['seconds']
+        phase['errors'] += 1 if s.get('error') else 0
+    
+    print(f"⏱️  TRACE {trace_id} - {path}")
+    print("=" * 60)
+    print(f"   {'Phase':<28}{'Count':>7}{'Total':>10}{'Avg':>9}")
+    for name, phase in sorted(phases.items(), key=lambda item: -item[1]['seconds']):
+        errors = f"  ({phase['errors']} failed)" if phase['errors'] else ''
+        print(f"   {name:<28}{phase['count']:>7}{phase['seconds']:>9.1f}s{phase['seconds'] / phase['count']:>8.2f}s{errors}")
+    print(f"\n📊 Wall clock: {run_seconds:.1f}s (concurrent phases overlap)")
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if args:
+        path = args[0]
+    else:
+        files = sorted(
+            (os.path.join(TRACE_DIR, f) for f in os.listdir(TRACE_DIR) if f.endswith('.jsonl')),
+            key=os.path.getmtime
+        ) if TRACE_DIR and os.path.isdir(TRACE_DIR) else []
+        if not files:
+            print(f"📭 No traces in {TRACE_DIR or '(tracing disabled)'}")
+            sys.exit(1)
+        path = files[-1]
+    print_summary(path)
+
+if __name__ == "__main__":
+    main()